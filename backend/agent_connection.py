@@ -0,0 +1,258 @@
+"""Deepgram agent connection management for Marlene smart home assistant."""
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Optional, Union
+import websockets
+from websockets.protocol import State
+from .config import settings
+from .tracing import tracer
+
+logger = logging.getLogger(__name__)
+
+# Messages buffered from an idle session before it is handed over (e.g. greeting audio)
+MAX_PENDING_MESSAGES = 500
+
+
+class AgentSession:
+    """A Deepgram agent websocket that has already had its Settings applied."""
+
+    def __init__(self, websocket, handshake_seconds: float, settings_message: dict = None):
+        self.websocket = websocket
+        self.handshake_seconds = handshake_seconds
+        # Settings the session was configured with
+        self.settings_message = settings_message or {}
+        self.opened_at = time.monotonic()
+        self.pending_messages: list = []
+
+    @property
+    def age(self) -> float:
+        """Seconds since the session finished its handshake."""
+        return time.monotonic() - self.opened_at
+
+    @property
+    def is_open(self) -> bool:
+        """Whether the websocket is still usable."""
+        return self.websocket.state is State.OPEN
+
+
+class _StandbySession:
+    """Agent session opened ahead of time and kept alive until it is needed."""
+
+    def __init__(self, manager: "AgentConnectionManager", ttl: float, speculative: bool):
+        self.speculative = speculative
+        self.session: Optional[AgentSession] = None
+        self._manager = manager
+        self._ttl = ttl
+        self._handoff = asyncio.Event()
+        self.task = asyncio.create_task(self._run())
+
+    async def take(self) -> Optional[AgentSession]:
+        """
+        Wait for the standby session to be ready and take ownership of it.
+
+        Returns:
+            The ready session, or None if it failed to open or was closed
+        """
+        self._handoff.set()
+        await self.task
+        if self.session and self.session.is_open:
+            return self.session
+        return None
+
+    async def _run(self):
+        """Open the session, then keep it alive until handover or expiry."""
+        try:
+            self.session = await self._manager.open_session()
+        except Exception as e:
+            logger.warning(f"Could not pre-open agent session: {e}")
+            return
+
+        session = self.session
+        handoff = asyncio.create_task(self._handoff.wait())
+        try:
+            while not self._handoff.is_set() and session.age < self._ttl:
+                timeout = min(settings.agent_keepalive_interval, self._ttl - session.age)
+                receive = asyncio.create_task(session.websocket.recv())
+                done, _ = await asyncio.wait(
+                    {receive, handoff},
+                    timeout=timeout,
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+                if receive in done:
+                    message = receive.result()
+                    if len(session.pending_messages) < MAX_PENDING_MESSAGES:
+                        session.pending_messages.append(message)
+                    continue
+
+                # Cancelling recv() is safe, no message is lost
+                receive.cancel()
+                await asyncio.gather(receive, return_exceptions=True)
+                if not self._handoff.is_set():
+                    await session.websocket.send(json.dumps({"type": "KeepAlive"}))
+        except websockets.exceptions.ConnectionClosed:
+            logger.info("Standby agent session closed by server")
+            return
+        finally:
+            handoff.cancel()
+
+        # Expired without being used
+        if not self._handoff.is_set():
+            await session.websocket.close()
+            self._manager.standby_expired(self)
+
+
+class AgentConnectionManager:
+    """
+    Hands out Deepgram agent sessions that are ready to accept audio.
+
+    Modes (agent_connection_mode):
+        on_demand: connect when a session starts (original behaviour)
+        prewarm: always keep one configured session open, refreshing it
+            before it gets stale
+        speculative: open a session when local voice activity starts, so a
+            wake word that follows can take it over
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        settings_message: Union[dict, Callable[[], dict]],
+        mode: str = None
+    ):
+        """
+        Initialize the connection manager.
+
+        Args:
+            url: Deepgram agent websocket URL
+            api_key: Deepgram API key
+            settings_message: Settings message sent after the Welcome message, or a
+                function that builds it for each new session
+            mode: Connection mode (defaults to config)
+        """
+        self.url = url
+        self.mode = mode or settings.agent_connection_mode
+        self._headers = {"Authorization": f"Token {api_key}"}
+        self._settings_message = settings_message
+        self._standby: Optional[_StandbySession] = None
+        self._in_use = False
+
+        # Handover statistics
+        self.handoffs = 0
+        self.saved_seconds = 0.0
+        self.wasted_speculations = 0
+
+    async def start(self):
+        """Start keeping a session warm if the mode asks for it."""
+        if self.mode == "prewarm" and not self._standby and not self._in_use:
+            self._standby = _StandbySession(self, settings.agent_session_max_age, speculative=False)
+            logger.info("Pre-warming Deepgram agent session")
+
+    def speculate(self):
+        """Open a session ahead of a likely wake word (speculative mode only)."""
+        if self.mode != "speculative" or self._standby or self._in_use:
+            return
+        logger.debug("Voice activity detected, speculatively opening agent session")
+        self._standby = _StandbySession(self, settings.agent_speculative_ttl, speculative=True)
+
+    async def open_session(self) -> AgentSession:
+        """
+        Connect, wait for Welcome, send Settings and wait for SettingsApplied.
+
+        Returns:
+            A session that is ready to receive audio
+        """
+        started = time.monotonic()
+        settings_message = self._settings_message
+        if callable(settings_message):
+            settings_message = settings_message()
+        tracer.mark("connect_started")
+        websocket = await websockets.connect(self.url, additional_headers=self._headers)
+        tracer.mark("websocket_connected")
+        session = AgentSession(websocket, handshake_seconds=0.0, settings_message=settings_message)
+        try:
+            while True:
+                message = await websocket.recv()
+                if isinstance(message, bytes):
+                    session.pending_messages.append(message)
+                    continue
+                msg_type = json.loads(message).get("type")
+                if msg_type == "Welcome":
+                    tracer.mark("welcome")
+                    await websocket.send(json.dumps(settings_message))
+                    logger.debug("SETTINGS sent successfully")
+                elif msg_type == "SettingsApplied":
+                    tracer.mark("settings_applied")
+                    break
+                elif msg_type == "Error":
+                    raise RuntimeError(f"Agent rejected settings: {message}")
+                else:
+                    session.pending_messages.append(message)
+        except BaseException:
+            await websocket.close()
+            raise
+
+        session.handshake_seconds = time.monotonic() - started
+        session.opened_at = time.monotonic()
+        logger.debug(f"Agent session ready in {session.handshake_seconds * 1000:.0f}ms")
+        return session
+
+    async def acquire(self) -> AgentSession:
+        """
+        Get a configured session, preferring one that is already open.
+
+        Returns:
+            A session that is ready to receive audio
+        """
+        started = time.monotonic()
+        standby, self._standby = self._standby, None
+        self._in_use = True
+
+        if standby:
+            session = await standby.take()
+            if session:
+                waited = time.monotonic() - started
+                saved = max(0.0, session.handshake_seconds - waited)
+                self.handoffs += 1
+                self.saved_seconds += saved
+                kind = "speculative" if standby.speculative else "pre-warmed"
+                logger.info(
+                    f"Using {kind} agent session, saved {saved * 1000:.0f}ms of handshake "
+                    f"({self.saved_seconds:.1f}s over {self.handoffs} sessions)"
+                )
+                return session
+
+        try:
+            return await self.open_session()
+        except BaseException:
+            self._in_use = False
+            raise
+
+    async def release(self, session: AgentSession):
+        """Close a session that is no longer needed and warm up the next one."""
+        if session.is_open:
+            await session.websocket.close()
+        self._in_use = False
+        await self.start()
+
+    def standby_expired(self, standby: _StandbySession):
+        """Replace or drop a standby session that was never used."""
+        if self._standby is not standby:
+            return
+        self._standby = None
+        if standby.speculative:
+            self.wasted_speculations += 1
+            logger.debug("Speculative agent session expired unused")
+        else:
+            logger.debug("Refreshing pre-warmed agent session")
+            asyncio.create_task(self.start())
+
+    async def close(self):
+        """Close any standby session."""
+        standby, self._standby = self._standby, None
+        if standby:
+            session = await standby.take()
+            if session:
+                await session.websocket.close()
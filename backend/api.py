@@ -2,13 +2,17 @@
 import logging
 from fastapi import FastAPI, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import Optional
 import asyncio
+from backend.audio_manager import AudioManager
 from backend.config import settings
+from backend.startup import warm_up
+from backend.tracing import tracer
 from backend.wake_word_detector import WakeWordDetector
 from backend.voice_agent import VoiceAgent
+from backend.voice_agent_config.device_state import device_states
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +30,7 @@ app.add_middleware(
 
 # Global state
 wake_word_detector: Optional[WakeWordDetector] = None
+wake_word_task: Optional[asyncio.Task] = None
 voice_agent: Optional[VoiceAgent] = None
 status = {
     "listening": False,
@@ -56,26 +61,26 @@ async def get_status():
     return JSONResponse(status)
 
 
+async def on_wake_word_detected():
+    """Callback when wake word is detected, runs on the event loop."""
+    status["processing"] = True
+    try:
+        await voice_agent.listen(start_position=wake_word_detector.last_detection_position)
+    finally:
+        status["processing"] = False
+
+
 @app.post("/start-listening")
 async def start_listening():
     """Start wake word detection."""
-    global wake_word_detector
+    global wake_word_task
     
     if status["listening"]:
         return JSONResponse({"message": "Already listening"}, status_code=400)
     
     try:
-        def on_wake_word_detected():
-            """Callback when wake word is detected."""
-            status["processing"] = True
-            # Trigger voice command processing
-            voice_agent.process_voice_command_sync(duration_seconds=5)
-            status["processing"] = False
-        
-        wake_word_detector = WakeWordDetector(on_wake_word=on_wake_word_detected)
-        
-        # Start in background
-        asyncio.create_task(asyncio.to_thread(wake_word_detector.start))
+        # Start in background; detection itself runs on the detector's worker thread
+        wake_word_task = asyncio.create_task(wake_word_detector.start())
         status["listening"] = True
         
         return JSONResponse({"message": "Wake word detection started"})
@@ -86,14 +91,14 @@ async def start_listening():
 @app.post("/stop-listening")
 async def stop_listening():
     """Stop wake word detection."""
-    global wake_word_detector
+    global wake_word_task
     
     if not status["listening"]:
         return JSONResponse({"message": "Not currently listening"}, status_code=400)
     
-    if wake_word_detector:
-        wake_word_detector.stop()
-        wake_word_detector = None
+    # Porcupine stays loaded for the next /start-listening
+    wake_word_detector.stop()
+    wake_word_task = None
     
     status["listening"] = False
     return JSONResponse({"message": "Wake word detection stopped"})
@@ -116,6 +121,32 @@ async def process_command(request: CommandRequest):
         return JSONResponse({"error": str(e)}, status_code=500)
 
 
+@app.get("/metrics")
+async def get_metrics():
+    """Pipeline stage histograms, outbound latencies and error counts in Prometheus text format."""
+    return PlainTextResponse(tracer.render_prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/devices/state")
+async def get_device_state():
+    """Last known state of each smart home device and how many triggers were skipped."""
+    return JSONResponse(device_states.snapshot())
+
+
+@app.post("/refresh-audio-devices")
+async def refresh_audio_devices():
+    """Re-probe audio devices, e.g. after plugging in a USB mic or speaker."""
+    audio_manager = AudioManager()
+    await asyncio.to_thread(audio_manager.refresh_devices)
+    input_index = await asyncio.to_thread(
+        audio_manager.get_device_index, settings.prefer_usb_audio
+    )
+    output_index = await asyncio.to_thread(
+        audio_manager.get_output_device_index, settings.prefer_usb_audio
+    )
+    return JSONResponse({"input_device": input_index, "output_device": output_index})
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """WebSocket endpoint for real-time updates."""
@@ -133,8 +164,15 @@ async def websocket_endpoint(websocket: WebSocket):
 @app.on_event("startup")
 async def startup_event():
     """Initialize components on startup."""
-    global voice_agent
+    global voice_agent, wake_word_detector
     voice_agent = VoiceAgent()
+    # Local voice activity only matters when it opens agent sessions speculatively
+    speculative = settings.agent_connection_mode == "speculative"
+    wake_word_detector = WakeWordDetector(
+        on_wake_word=on_wake_word_detected,
+        on_voice_activity=voice_agent.on_voice_activity if speculative else None
+    )
+    await warm_up(voice_agent, wake_word_detector)
     logger.info(f"Marlene API Server starting on {settings.api_host}:{settings.api_port}")
     logger.info(f"API Docs: http://{settings.api_host}:{settings.api_port}/docs")
 
@@ -145,7 +183,7 @@ async def shutdown_event():
     global wake_word_detector, voice_agent
     
     if wake_word_detector:
-        wake_word_detector.stop()
+        wake_word_detector.close()
     
     if voice_agent:
-        voice_agent.cleanup()
+        await voice_agent.shutdown()
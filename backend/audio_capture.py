@@ -0,0 +1,536 @@
+"""Shared microphone capture for Marlene smart home assistant."""
+import asyncio
+import logging
+import threading
+from typing import Callable, Optional
+import numpy as np
+from .config import settings
+from .resampler import PolyphaseResampler
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_WIDTH = 2  # 16-bit PCM
+
+
+class RingBuffer:
+    """
+    Fixed-size byte ring addressed by absolute stream positions.
+
+    Positions count every byte ever written, so readers can keep their own
+    cursor and tell how far behind the writer they are.
+    """
+
+    def __init__(self, capacity: int):
+        """
+        Initialize the ring buffer.
+
+        Args:
+            capacity: Number of bytes retained before old audio is overwritten
+        """
+        self.capacity = capacity
+        self.write_position = 0
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+
+    @property
+    def oldest_position(self) -> int:
+        """Oldest absolute position still held in the buffer."""
+        return max(0, self.write_position - self.capacity)
+
+    def write(self, data) -> None:
+        """Append bytes, overwriting the oldest audio once the ring is full."""
+        data = memoryview(data).cast("B")
+        if len(data) > self.capacity:
+            # Only the newest audio fits, but positions still count every byte
+            self.write_position += len(data) - self.capacity
+            data = data[-self.capacity:]
+        start = self.write_position % self.capacity
+        first = min(len(data), self.capacity - start)
+        self._view[start:start + first] = data[:first]
+        if first < len(data):
+            self._view[:len(data) - first] = data[first:]
+        self.write_position += len(data)
+
+    def read_into(self, position: int, out: memoryview) -> None:
+        """
+        Copy len(out) bytes starting at an absolute position into out.
+
+        The caller must make sure the range is still held in the buffer.
+        """
+        size = len(out)
+        start = position % self.capacity
+        first = min(size, self.capacity - start)
+        out[:first] = self._view[start:start + first]
+        if first < size:
+            out[first:] = self._view[:size - first]
+
+
+class CaptureConsumer:
+    """
+    Independent reader of the shared capture stream.
+
+    Each consumer keeps its own cursor into the capture ring buffer, so the
+    wake word detector and the voice agent can read the same microphone
+    audio at their own pace.
+    """
+
+    def __init__(self, capture: "AudioCapture", position: int):
+        self._capture = capture
+        self.position = position
+        self.overrun_bytes = 0
+        self._closed = False
+
+    @property
+    def closed(self) -> bool:
+        """Whether this consumer has been closed or its capture stopped."""
+        return self._closed or not self._capture.is_running
+
+    def read(self, num_frames: int, timeout: Optional[float] = None) -> Optional[bytes]:
+        """
+        Read the next num_frames frames, blocking until they are captured.
+
+        Args:
+            num_frames: Number of 16-bit mono frames to read
+            timeout: Seconds to wait for audio, or None to wait indefinitely
+
+        Returns:
+            PCM bytes, or None if the consumer was closed or the wait timed out
+        """
+        out = bytearray(num_frames * SAMPLE_WIDTH)
+        if not self.read_into(memoryview(out), timeout):
+            return None
+        return bytes(out)
+
+    def read_into(self, out: memoryview, timeout: Optional[float] = None) -> bool:
+        """
+        Fill a caller-owned buffer with the next len(out) bytes of audio.
+
+        Lets hot loops reuse one preallocated buffer instead of receiving
+        a new bytes object per read.
+
+        Args:
+            out: Writable byte view to fill
+            timeout: Seconds to wait for audio, or None to wait indefinitely
+
+        Returns:
+            True if out was filled, False if the consumer was closed or the wait timed out
+        """
+        num_bytes = len(out)
+        capture = self._capture
+        with capture.condition:
+            ready = capture.condition.wait_for(
+                lambda: self.closed or capture.ring.write_position - self.position >= num_bytes,
+                timeout=timeout
+            )
+            if not ready or self.closed:
+                return False
+            self._skip_overrun()
+            capture.ring.read_into(self.position, out)
+            self.position += num_bytes
+        return True
+
+    @property
+    def available_frames(self) -> int:
+        """Number of frames captured but not yet read by this consumer."""
+        with self._capture.condition:
+            self._skip_overrun()
+            return max(0, self._capture.ring.write_position - self.position) // SAMPLE_WIDTH
+
+    def limit_backlog(self, max_frames: int) -> int:
+        """
+        Drop unread audio older than the newest max_frames frames.
+
+        Args:
+            max_frames: Maximum number of unread frames to keep
+
+        Returns:
+            Number of frames skipped
+        """
+        with self._capture.condition:
+            newest_allowed = self._capture.ring.write_position - max_frames * SAMPLE_WIDTH
+            skipped = max(0, newest_allowed - self.position)
+            self.position += skipped
+        return skipped // SAMPLE_WIDTH
+
+    def seek_to_latest(self) -> None:
+        """Move the cursor to the newest captured audio, skipping the backlog."""
+        with self._capture.condition:
+            self.position = self._capture.ring.write_position
+
+    def skip_to(self, position: int) -> None:
+        """
+        Move the cursor forward to an absolute position, even one not captured yet.
+
+        Used to leave out audio the microphone picked up from the speaker.
+        """
+        with self._capture.condition:
+            self.position = max(self.position, position)
+
+    def backlog_rms(self) -> float:
+        """Root mean square level of the audio captured but not yet read (0 if none)."""
+        with self._capture.condition:
+            self._skip_overrun()
+            size = max(0, self._capture.ring.write_position - self.position)
+            out = bytearray(size - size % SAMPLE_WIDTH)
+            self._capture.ring.read_into(self.position, memoryview(out))
+        if not out:
+            return 0.0
+        samples = np.frombuffer(out, dtype=np.int16).astype(np.float32)
+        return float(np.sqrt(np.dot(samples, samples) / len(samples)))
+
+    def close(self) -> None:
+        """Stop reading and wake any blocked reader."""
+        self._closed = True
+        self._capture.unsubscribe(self)
+
+    def _skip_overrun(self) -> None:
+        """Jump past audio that was overwritten before this consumer read it."""
+        oldest = self._capture.ring.oldest_position
+        if self.position < oldest:
+            skipped = oldest - self.position
+            self.overrun_bytes += skipped
+            self.position = oldest
+            logger.warning(f"Capture consumer fell behind, skipped {skipped} bytes")
+
+
+class AsyncCaptureConsumer(CaptureConsumer):
+    """
+    Capture consumer that receives frames on an asyncio event loop.
+
+    The capture thread pushes each chunk into a bounded asyncio.Queue via
+    loop.call_soon_threadsafe, so reading costs no thread hop. When the
+    queue overflows the oldest chunk is dropped and counted; the missing
+    audio is recovered from the ring buffer on the next get().
+    """
+
+    def __init__(
+        self,
+        capture: "AudioCapture",
+        position: int,
+        loop: asyncio.AbstractEventLoop,
+        max_queue: int,
+        transform: Optional[Callable[[bytes], bytes]] = None
+    ):
+        super().__init__(capture, position)
+        self.loop = loop
+        self.transform = transform
+        self.overflows = 0
+        self.recoveries = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+
+    async def get(self) -> Optional[bytes]:
+        """
+        Wait for the next chunk of audio after the cursor.
+
+        Returns:
+            Audio bytes (passed through transform), or None once the
+            consumer is closed or the capture stops
+        """
+        while True:
+            item = await self._queue.get()
+            if item is None:
+                return None
+            start, end, data, payload = item
+            if end <= self.position:
+                # Already read through read() (e.g. during a pre-roll flush)
+                continue
+            if start == self.position:
+                self.position = end
+                return payload
+
+            # Chunks were dropped, or the cursor sits mid-chunk: rebuild from the ring
+            self.recoveries += 1
+            data = self._read_range(end)
+            if self.transform and data:
+                data = self.transform(data)
+            return data
+
+    def publish(self, start: int, end: int, data: bytes):
+        """Hand a captured chunk to the event loop (called on the capture thread)."""
+        payload = self.transform(data) if self.transform else data
+        try:
+            self.loop.call_soon_threadsafe(self._push, (start, end, data, payload))
+        except RuntimeError:
+            # Event loop already closed
+            self._closed = True
+
+    def close(self) -> None:
+        """Stop reading and wake any pending get()."""
+        super().close()
+        try:
+            self.loop.call_soon_threadsafe(self._push, None)
+        except RuntimeError:
+            pass
+
+    def _push(self, item):
+        """Queue an item on the event loop thread, dropping the oldest if full."""
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.overflows += 1
+        self._queue.put_nowait(item)
+
+    def _read_range(self, end: int) -> bytes:
+        """Copy audio from the cursor up to an absolute end position out of the ring."""
+        with self._capture.condition:
+            self._skip_overrun()
+            size = max(0, end - self.position)
+            out = bytearray(size)
+            self._capture.ring.read_into(self.position, memoryview(out))
+            self.position += size
+        return bytes(out)
+
+
+class AudioCapture:
+    """
+    Always-on microphone capture shared by every audio consumer.
+
+    A single input stream is read continuously on a background thread into
+    a ring buffer. Consumers subscribe with their own read cursor, so
+    handing the microphone from the wake word detector to the voice agent
+    needs no stream teardown and drops no audio.
+    
+    The device can be captured at its native rate; audio is then resampled
+    to sample_rate on the capture thread before it reaches the ring buffer.
+    """
+
+    def __init__(
+        self,
+        audio_manager,
+        sample_rate: int = None,
+        chunk_size: int = None,
+        buffer_seconds: float = None
+    ):
+        """
+        Initialize the capture engine.
+
+        Args:
+            audio_manager: AudioManager used to open the input stream
+            sample_rate: Sample rate delivered to consumers in Hz (defaults to config)
+            chunk_size: Frames read from the device per iteration (defaults to config)
+            buffer_seconds: Seconds of audio retained in the ring buffer (defaults to config)
+        """
+        self.sample_rate = sample_rate or settings.audio_rate
+        self.chunk_size = chunk_size or settings.audio_chunk_size
+        buffer_seconds = buffer_seconds or settings.audio_capture_buffer_seconds
+        # The ring must hold at least the pre-roll handed to new voice sessions
+        buffer_seconds = max(buffer_seconds, settings.audio_preroll_seconds + 1.0)
+
+        self._audio_manager = audio_manager
+        self.ring = RingBuffer(int(self.sample_rate * buffer_seconds) * SAMPLE_WIDTH)
+        self.condition = threading.Condition()
+        self._consumers: list[CaptureConsumer] = []
+        self._async_consumers: list[AsyncCaptureConsumer] = []
+        self._stream = None
+        self._resampler: Optional[PolyphaseResampler] = None
+        self._thread: Optional[threading.Thread] = None
+        self.is_running = False
+        # Set while reopen() swaps the stream; consumers keep waiting meanwhile
+        self._reopening = False
+        self.device_rate = self.sample_rate
+
+    @property
+    def position(self) -> int:
+        """Absolute position of the newest captured byte."""
+        return self.ring.write_position
+
+    def start(self):
+        """Open the input stream and start the capture thread."""
+        if self.is_running:
+            return
+        # The loop may have ended on a read error and left its stream open
+        self.stop()
+
+        try:
+            self._open_stream()
+        except OSError as e:
+            # The cached device may have been unplugged; re-probe and retry once
+            logger.warning(f"Could not open input device ({e}), re-probing audio devices")
+            self._audio_manager.refresh_devices()
+            self._open_stream()
+
+        self.is_running = True
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+        logger.info(
+            f"Audio capture started (device rate={self.device_rate}Hz, "
+            f"output rate={self.sample_rate}Hz, chunk={self.chunk_size})"
+        )
+
+    def _open_stream(self):
+        """Select the input device, set up resampling and open the stream."""
+        device_index = self._audio_manager.get_device_index(prefer_usb=settings.prefer_usb_audio)
+        if settings.audio_capture_native_rate:
+            self.device_rate = self._audio_manager.get_device_sample_rate(device_index)
+
+        # Read the same duration per chunk regardless of the device rate
+        self._device_chunk_size = round(self.chunk_size * self.device_rate / self.sample_rate)
+        self._resampler = None
+        if self.device_rate != self.sample_rate:
+            self._resampler = PolyphaseResampler(
+                self.device_rate,
+                self.sample_rate,
+                max_input_frames=self._device_chunk_size
+            )
+
+        self._stream = self._audio_manager.open_input_stream(
+            device_index=device_index,
+            rate=self.device_rate,
+            chunk_size=self._device_chunk_size,
+            channels=1
+        )
+
+    def reopen(self, before_open: Optional[Callable[[], None]] = None):
+        """
+        Close the input stream and open it again on the currently selected device.
+
+        Consumers stay subscribed and keep their cursors; they only see a
+        short gap in the audio. Used after audio devices were plugged or
+        unplugged.
+
+        Args:
+            before_open: Called once the old stream is closed, e.g. to
+                re-initialize PortAudio
+
+        Raises:
+            OSError: If no input stream can be opened; the capture is then stopped
+        """
+        with self.condition:
+            if not self.is_running:
+                return
+            self._reopening = True
+        try:
+            if self._thread:
+                self._thread.join(timeout=1.0)
+                self._thread = None
+            if self._stream:
+                self._audio_manager.close_stream(self._stream)
+                self._stream = None
+            if before_open:
+                before_open()
+            self._open_stream()
+        except Exception:
+            self._reopening = False
+            self._end()
+            raise
+        self._reopening = False
+        self._thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self._thread.start()
+        logger.info(f"Audio capture reopened (device rate={self.device_rate}Hz)")
+
+    def _capture_loop(self):
+        """Background thread loop that reads the microphone into the ring buffer."""
+        while self.is_running and not self._reopening:
+            try:
+                data = self._stream.read(self._device_chunk_size, exception_on_overflow=False)
+                if self._resampler:
+                    data = self._resampler.process(data)
+            except Exception as e:
+                logger.error(f"Audio capture error: {e}")
+                break
+
+            with self.condition:
+                start = self.ring.write_position
+                self.ring.write(data)
+                end = self.ring.write_position
+                self.condition.notify_all()
+                async_consumers = list(self._async_consumers)
+
+            if async_consumers:
+                # data may point into the resampler's buffer, so take one copy
+                chunk = bytes(data)
+                for consumer in async_consumers:
+                    consumer.publish(start, end, chunk)
+
+        if not self._reopening:
+            self._end()
+
+    def _end(self):
+        """Mark the capture stopped and wake or close every consumer."""
+        with self.condition:
+            self.is_running = False
+            self.condition.notify_all()
+            async_consumers = list(self._async_consumers)
+        for consumer in async_consumers:
+            consumer.close()
+
+    def subscribe(self, position: Optional[int] = None) -> CaptureConsumer:
+        """
+        Register a new consumer of the capture stream.
+
+        Args:
+            position: Absolute position to start reading from (defaults to the newest audio)
+
+        Returns:
+            CaptureConsumer with its own read cursor
+        """
+        with self.condition:
+            if position is None:
+                position = self.ring.write_position
+            consumer = CaptureConsumer(self, max(position, self.ring.oldest_position))
+            self._consumers.append(consumer)
+        return consumer
+
+    def subscribe_async(
+        self,
+        position: Optional[int] = None,
+        transform: Optional[Callable[[bytes], bytes]] = None,
+        max_queue: int = None
+    ) -> AsyncCaptureConsumer:
+        """
+        Register a consumer that receives chunks on the running event loop.
+
+        Args:
+            position: Absolute position to start reading from (defaults to the newest audio)
+            transform: Optional function applied to each chunk on the capture thread
+            max_queue: Chunks buffered before the oldest is dropped (defaults to config)
+
+        Returns:
+            AsyncCaptureConsumer bound to the current event loop
+        """
+        loop = asyncio.get_running_loop()
+        max_queue = max_queue or settings.audio_capture_queue_depth
+        with self.condition:
+            if position is None:
+                position = self.ring.write_position
+            consumer = AsyncCaptureConsumer(
+                self,
+                max(position, self.ring.oldest_position),
+                loop,
+                max_queue,
+                transform
+            )
+            self._consumers.append(consumer)
+            self._async_consumers.append(consumer)
+        return consumer
+
+    def unsubscribe(self, consumer: CaptureConsumer):
+        """Remove a consumer and wake it if it is blocked in read()."""
+        with self.condition:
+            if consumer in self._consumers:
+                self._consumers.remove(consumer)
+            if consumer in self._async_consumers:
+                self._async_consumers.remove(consumer)
+            self.condition.notify_all()
+
+    def stop(self):
+        """
+        Stop the capture thread and close the input stream.
+
+        Also closes the stream of a capture loop that already ended on a
+        read error.
+        """
+        with self.condition:
+            was_running = self.is_running
+            self.is_running = False
+            self.condition.notify_all()
+
+        if self._thread and self._thread.is_alive():
+            self._thread.join(timeout=1.0)
+        self._thread = None
+
+        if self._stream:
+            self._audio_manager.close_stream(self._stream)
+            self._stream = None
+
+        if was_running:
+            logger.info("Audio capture stopped")
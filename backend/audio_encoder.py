@@ -0,0 +1,144 @@
+"""Upstream audio encoding for Marlene smart home assistant."""
+import logging
+import threading
+import time
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+def _mulaw_table() -> np.ndarray:
+    """Build the G.711 mu-law code for every 16-bit sample, indexed as uint16."""
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 2
+    mask = np.where(pcm < 0, 0x7F, 0xFF)
+    magnitude = np.minimum(np.abs(pcm), 8159) + 33
+    segment = np.searchsorted([0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF, 0x1FFF], magnitude)
+    code = (segment << 4) | ((magnitude >> (segment + 1)) & 0x0F)
+    code = np.where(segment >= 8, 0x7F, code)
+    return (code ^ mask).astype(np.uint8)
+
+
+def _alaw_table() -> np.ndarray:
+    """Build the G.711 A-law code for every 16-bit sample, indexed as uint16."""
+    pcm = np.arange(65536, dtype=np.uint16).view(np.int16).astype(np.int32) >> 3
+    mask = np.where(pcm >= 0, 0xD5, 0x55)
+    magnitude = np.where(pcm >= 0, pcm, -pcm - 1)
+    segment = np.searchsorted([0x1F, 0x3F, 0x7F, 0xFF, 0x1FF, 0x3FF, 0x7FF, 0xFFF], magnitude)
+    shift = np.where(segment < 2, 1, segment)
+    code = (segment << 4) | ((magnitude >> shift) & 0x0F)
+    code = np.where(segment >= 8, 0x7F, code)
+    return (code ^ mask).astype(np.uint8)
+
+
+class AudioEncoder:
+    """
+    Encodes microphone PCM before it is sent to Deepgram.
+
+    The base class passes linear16 audio through unchanged. Subclasses
+    compress it; every encoder tracks bytes saved and time spent encoding.
+    """
+
+    encoding = "linear16"
+
+    def __init__(self, sample_rate: int):
+        """
+        Initialize the encoder.
+
+        Args:
+            sample_rate: Sample rate of the PCM passed to encode()
+        """
+        self.sample_rate = sample_rate
+        self.frames = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.encode_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def encode(self, pcm: bytes) -> bytes:
+        """
+        Encode one chunk of 16-bit mono PCM.
+
+        This is CPU work, so call it from a worker thread rather than the
+        event loop. Safe to call from several threads.
+        """
+        with self._lock:
+            started = time.perf_counter()
+            encoded = self._encode(pcm)
+            self.encode_seconds += time.perf_counter() - started
+            self.frames += 1
+            self.bytes_in += len(pcm)
+            self.bytes_out += len(encoded)
+        return encoded
+
+    def _encode(self, pcm: bytes) -> bytes:
+        return pcm
+
+    def stats(self) -> dict:
+        """Summarize bandwidth savings and per-frame encode latency."""
+        audio_seconds = self.bytes_in / (2 * self.sample_rate) if self.sample_rate else 0.0
+        saved_per_second = (self.bytes_in - self.bytes_out) / audio_seconds if audio_seconds else 0.0
+        return {
+            "encoding": self.encoding,
+            "frames": self.frames,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "bytes_per_second_saved": saved_per_second,
+            "encode_ms_per_frame": self.encode_seconds / self.frames * 1000 if self.frames else 0.0,
+        }
+
+
+class _G711Encoder(AudioEncoder):
+    """Table-driven G.711 companding, 2:1 over linear16."""
+
+    _table: np.ndarray = None
+
+    def __init__(self, sample_rate: int):
+        super().__init__(sample_rate)
+        self._buffer = np.empty(0, dtype=np.uint8)
+
+    def _encode(self, pcm: bytes) -> bytes:
+        samples = np.frombuffer(pcm, dtype=np.uint16)
+        if len(samples) > len(self._buffer):
+            self._buffer = np.empty(len(samples), dtype=np.uint8)
+        encoded = self._buffer[:len(samples)]
+        np.take(self._table, samples, out=encoded)
+        return encoded.tobytes()
+
+
+class MulawEncoder(_G711Encoder):
+    """G.711 mu-law encoder."""
+
+    encoding = "mulaw"
+    _table = _mulaw_table()
+
+
+class AlawEncoder(_G711Encoder):
+    """G.711 A-law encoder."""
+
+    encoding = "alaw"
+    _table = _alaw_table()
+
+
+ENCODERS = {
+    encoder.encoding: encoder
+    for encoder in (AudioEncoder, MulawEncoder, AlawEncoder)
+}
+
+
+def create_encoder(encoding: str, sample_rate: int) -> AudioEncoder:
+    """
+    Create the encoder for a Deepgram input encoding name.
+
+    Args:
+        encoding: One of "linear16", "mulaw" or "alaw"
+        sample_rate: Sample rate of the PCM that will be encoded
+
+    Returns:
+        AudioEncoder instance
+    """
+    try:
+        return ENCODERS[encoding](sample_rate)
+    except KeyError:
+        raise ValueError(
+            f"Unsupported upstream encoding '{encoding}', expected one of {sorted(ENCODERS)}"
+        ) from None
@@ -1,14 +1,22 @@
 """Audio device management for Marlene smart home assistant."""
 import logging
+import threading
 import pyaudio
-from typing import Optional
+from typing import Callable, Dict, Optional, Tuple
+from backend.audio_capture import AudioCapture
 from backend.config import settings
 
 logger = logging.getLogger(__name__)
 
 
 class AudioManager:
-    """Manages PyAudio instance and device selection."""
+    """
+    Manages PyAudio instance and device selection.
+    
+    PortAudio is initialized on first use rather than on construction, so
+    creating an AudioManager (or importing modules that do) never touches
+    audio hardware.
+    """
     
     _instance = None
     
@@ -20,17 +28,57 @@ class AudioManager:
         return cls._instance
     
     def __init__(self):
-        """Initialize PyAudio instance (only once)."""
+        """Initialize the manager (only once); PyAudio is created lazily."""
         if self._initialized:
             return
             
-        self.p = pyaudio.PyAudio()
+        self._p: Optional[pyaudio.PyAudio] = None
+        self._backend: Callable[[], pyaudio.PyAudio] = pyaudio.PyAudio
         self._initialized = True
         self._streams = []
+        self._capture: Optional[AudioCapture] = None
+        
+        # Device registry, filled on first lookup
+        self._device_lock = threading.RLock()
+        self._device_indices: Dict[Tuple[str, bool], Optional[int]] = {}
+        self._device_rates: Dict[Optional[int], int] = {}
+    
+    @property
+    def p(self) -> pyaudio.PyAudio:
+        """PyAudio instance, initializing PortAudio on first access."""
+        if self._p is None:
+            self._p = self._backend()
+        return self._p
+    
+    def use_backend(self, backend: Callable[[], pyaudio.PyAudio]):
+        """
+        Replace PortAudio with another object that has the PyAudio interface.
+        
+        Used by benchmarks to run against a simulated microphone and speaker.
+        Device choices are forgotten, as after refresh_devices().
+        
+        Args:
+            backend: Creates the PyAudio stand-in when PortAudio would be initialized
+            
+        Raises:
+            RuntimeError: If streams are open on the current backend
+        """
+        with self._device_lock:
+            if self._streams:
+                raise RuntimeError("Close all audio streams before switching the audio backend")
+            self._device_indices.clear()
+            self._device_rates.clear()
+            if self._p is not None:
+                self._p.terminate()
+                self._p = None
+            self._backend = backend
     
     def get_device_index(self, prefer_usb: bool = True) -> Optional[int]:
         """
-        Find and return the best available input device index.
+        Return the best available input device index.
+        
+        Devices are enumerated once; later calls return the cached choice
+        until refresh_devices() is called.
         
         Args:
             prefer_usb: If True, tries to find a USB device first
@@ -38,101 +86,139 @@ class AudioManager:
         Returns:
             Device index or None to use system default
         """
-        logger.info("Available Audio Input Devices")
-        usb_device_idx = None
+        return self._select_device("input", prefer_usb)
+
+    def get_output_device_index(self, prefer_usb: bool = True) -> Optional[int]:
+        """
+        Return the best available output device index.
         
-        for i in range(self.p.get_device_count()):
-            info = self.p.get_device_info_by_index(i)
-            name = info.get("name", "")
-            max_input_channels = info.get("maxInputChannels", 0)
-            
-            if max_input_channels > 0:
-                logger.info(f"Index {i}: {name} (Input channels: {max_input_channels})")
-            
-            # Look for USB devices
-            if prefer_usb and "usb" in name.lower() and max_input_channels > 0:
-                if usb_device_idx is None:
-                    usb_device_idx = i
+        Devices are enumerated once; later calls return the cached choice
+        until refresh_devices() is called.
         
-        if usb_device_idx is not None:
-            device_name = self.p.get_device_info_by_index(usb_device_idx).get('name')
-            logger.info(f"Using USB input device: {device_name} (index {usb_device_idx})")
-            return usb_device_idx
+        Args:
+            prefer_usb: If True, tries to find a USB device first
+            
+        Returns:
+            Device index or None to use system default
+        """
+        return self._select_device("output", prefer_usb)
+    
+    def refresh_devices(self):
+        """
+        Forget cached device choices so the next lookup enumerates again.
         
-        # Fall back to default device
-        try:
-            default_info = self.p.get_default_input_device_info()
-            default_idx = default_info.get('index')
-            logger.info(f"Using default input device: {default_info.get('name')} (index {default_idx})")
-            return default_idx
-        except Exception as e:
-            logger.warning(f"Could not get default input device: {e}")
-            return None
-
-    def get_output_device_index(self, prefer_usb: bool = True) -> Optional[int]:
+        Call after plugging or unplugging a device. PortAudio only sees
+        hotplugged devices after it is re-initialized, which needs every
+        stream closed, so the shared capture is reopened around it. If an
+        output stream is still playing, PortAudio is re-initialized the
+        next time this is called with none open.
         """
-        Find and return the best available output device index.
+        with self._device_lock:
+            self._device_indices.clear()
+            self._device_rates.clear()
+        capture = self._capture
+        if capture and capture.is_running:
+            capture.reopen(before_open=self._reinitialize)
+        else:
+            self._reinitialize()
+        logger.info("Audio device cache cleared, devices will be re-probed on next use")
+    
+    def _reinitialize(self):
+        """Terminate PortAudio, if no streams are open, so its next use enumerates devices afresh."""
+        with self._device_lock:
+            if self._p is None:
+                return
+            if self._streams:
+                logger.warning(f"{len(self._streams)} audio streams still open, not re-initializing PortAudio")
+                return
+            self._p.terminate()
+            self._p = None
+    
+    def _select_device(self, kind: str, prefer_usb: bool) -> Optional[int]:
+        """Return the cached device index for (kind, prefer_usb), scanning on a miss."""
+        key = (kind, prefer_usb)
+        with self._device_lock:
+            if key not in self._device_indices:
+                self._device_indices[key] = self._scan_devices(kind, prefer_usb)
+            return self._device_indices[key]
+    
+    def _scan_devices(self, kind: str, prefer_usb: bool) -> Optional[int]:
+        """
+        Enumerate all devices and pick the best one for input or output.
         
         Args:
+            kind: "input" or "output"
             prefer_usb: If True, tries to find a USB device first
             
         Returns:
             Device index or None to use system default
         """
-        logger.info("Available Audio Output Devices")
+        channels_key = "maxInputChannels" if kind == "input" else "maxOutputChannels"
+        logger.info(f"Available Audio {kind.capitalize()} Devices")
         usb_device_idx = None
         
         for i in range(self.p.get_device_count()):
             info = self.p.get_device_info_by_index(i)
             name = info.get("name", "")
-            max_output_channels = info.get("maxOutputChannels", 0)
+            max_channels = info.get(channels_key, 0)
             
-            if max_output_channels > 0:
-                logger.info(f"Index {i}: {name} (Output channels: {max_output_channels})")
+            if max_channels > 0:
+                logger.info(f"Index {i}: {name} ({kind.capitalize()} channels: {max_channels})")
+                # Remember the native rate so it needs no second lookup
+                self._device_rates[i] = int(info.get("defaultSampleRate", 48000))
             
             # Look for USB devices
-            if prefer_usb and "usb" in name.lower() and max_output_channels > 0:
+            if prefer_usb and "usb" in name.lower() and max_channels > 0:
                 if usb_device_idx is None:
                     usb_device_idx = i
         
         if usb_device_idx is not None:
             device_name = self.p.get_device_info_by_index(usb_device_idx).get('name')
-            logger.info(f"Using USB output device: {device_name} (index {usb_device_idx})")
+            logger.info(f"Using USB {kind} device: {device_name} (index {usb_device_idx})")
             return usb_device_idx
         
         # Fall back to default device
         try:
-            default_info = self.p.get_default_output_device_info()
+            if kind == "input":
+                default_info = self.p.get_default_input_device_info()
+            else:
+                default_info = self.p.get_default_output_device_info()
             default_idx = default_info.get('index')
-            logger.info(f"Using default output device: {default_info.get('name')} (index {default_idx})")
+            logger.info(f"Using default {kind} device: {default_info.get('name')} (index {default_idx})")
             return default_idx
         except Exception as e:
-            logger.warning(f"Could not get default output device: {e}")
+            logger.warning(f"Could not get default {kind} device: {e}")
             return None
     
     def get_device_sample_rate(self, device_index: Optional[int] = None) -> int:
         """
         Get the native sample rate of the specified audio input device.
         
+        Rates are cached with the device list and re-read after refresh_devices().
+        
         Args:
             device_index: Device index or None for system default
             
         Returns:
             Sample rate in Hz (e.g., 44100, 48000)
         """
-        try:
-            if device_index is not None:
-                device_info = self.p.get_device_info_by_index(device_index)
-            else:
-                device_info = self.p.get_default_input_device_info()
-            
-            sample_rate = int(device_info.get('defaultSampleRate', 48000))
-            device_name = device_info.get('name', 'Unknown')
-            logger.info(f"Detected sample rate: {sample_rate} Hz for device '{device_name}'")
+        with self._device_lock:
+            if device_index in self._device_rates:
+                return self._device_rates[device_index]
+            try:
+                if device_index is not None:
+                    device_info = self.p.get_device_info_by_index(device_index)
+                else:
+                    device_info = self.p.get_default_input_device_info()
+                
+                sample_rate = int(device_info.get('defaultSampleRate', 48000))
+                device_name = device_info.get('name', 'Unknown')
+                logger.info(f"Detected sample rate: {sample_rate} Hz for device '{device_name}'")
+            except Exception as e:
+                logger.warning(f"Could not detect sample rate, defaulting to 48000 Hz: {e}")
+                return 48000
+            self._device_rates[device_index] = sample_rate
             return sample_rate
-        except Exception as e:
-            logger.warning(f"Could not detect sample rate, defaulting to 48000 Hz: {e}")
-            return 48000
     
     def open_input_stream(
         self,
@@ -214,6 +300,55 @@ class AudioManager:
         self._streams.append(stream)
         return stream
     
+    def flush_output_stream(self, stream: pyaudio.Stream) -> bool:
+        """
+        Discard audio queued in an output stream's device buffer.
+        
+        Aborts the stream (unlike stop_stream(), which plays out what is
+        buffered) and restarts it, so playback stops within one device
+        period instead of after the whole host buffer.
+        
+        Args:
+            stream: Output stream opened by open_output_stream()
+            
+        Returns:
+            True if the buffer was flushed, False if this PyAudio build
+            cannot abort streams
+        """
+        abort_stream = getattr(getattr(pyaudio, "pa", None), "abort_stream", None)
+        if abort_stream is None or not hasattr(stream, "_stream"):
+            return False
+        try:
+            abort_stream(stream._stream)
+        except OSError as e:
+            logger.warning(f"Could not abort output stream: {e}")
+            return False
+        # PyAudio tracks the running state itself; resync it before restarting
+        stream._is_running = False
+        stream.start_stream()
+        return True
+    
+    def get_capture(self) -> AudioCapture:
+        """
+        Get the shared always-on microphone capture, starting it if needed.
+        
+        Every component that needs microphone audio should subscribe to this
+        capture instead of opening its own input stream.
+        
+        Returns:
+            The running AudioCapture instance
+        """
+        if self._capture is None:
+            self._capture = AudioCapture(self)
+        if not self._capture.is_running:
+            self._capture.start()
+        return self._capture
+    
+    def stop_capture(self):
+        """Stop the shared microphone capture if it is running."""
+        if self._capture:
+            self._capture.stop()
+    
     def close_stream(self, stream: pyaudio.Stream):
         """Close a specific stream."""
         if stream in self._streams:
@@ -228,9 +363,11 @@ class AudioManager:
     
     def cleanup(self):
         """Clean up all resources."""
+        self.stop_capture()
         self.close_all_streams()
-        if self.p:
-            self.p.terminate()
+        if self._p:
+            self._p.terminate()
+            self._p = None
     
     def __del__(self):
         """Destructor to ensure cleanup."""
@@ -1,20 +1,25 @@
 """Audio playback for Marlene smart home assistant."""
+import asyncio
 import logging
-import queue
 import threading
+import time
 from typing import Optional
 from .audio_manager import AudioManager
 from .config import settings
+from .jitter_buffer import JitterBuffer
+from .tracing import tracer
 
 logger = logging.getLogger(__name__)
 
 
 class AudioPlayer:
     """
-    Real-time audio player with simple queue-based buffering.
+    Real-time audio player backed by a bounded jitter buffer.
     
     Receives audio chunks asynchronously and plays them through
-    the configured output device using a background thread.
+    the configured output device using a background thread, one
+    fixed-size frame per write. The output device period matches the
+    frame size, so clear() silences playback within one period.
     """
     
     def __init__(
@@ -36,27 +41,46 @@ class AudioPlayer:
         self.prefer_usb = prefer_usb if prefer_usb is not None else settings.prefer_usb_audio
         
         self._audio_manager = AudioManager()
-        self._queue: queue.Queue[Optional[bytes]] = queue.Queue()
+        
+        # Jitter buffer sized in whole frames
+        self.bytes_per_second = self.sample_rate * self.channels * 2
+        frame_bytes = self.sample_rate * settings.audio_playback_frame_ms // 1000 * self.channels * 2
+        self._frame_bytes = max(frame_bytes, self.channels * 2)
+        self._buffer = JitterBuffer(
+            capacity=self._ms_to_frames(settings.audio_playback_max_buffer_ms) * self._frame_bytes,
+            frame_size=self._frame_bytes,
+            prefill=self._ms_to_frames(settings.audio_playback_prefill_ms) * self._frame_bytes
+        )
+        self._frame = bytearray(self._frame_bytes)
+        self._clear_count = 0
         self._stream = None
         self._playback_thread: Optional[threading.Thread] = None
         self._running = False
+        
+        # Barge-in: set by clear(), acknowledged by the playback thread
+        self.flush_on_interrupt = settings.audio_playback_flush_on_interrupt
+        self._interrupt = threading.Event()
+        self._interrupt_lock = threading.Lock()
+        self._interrupt_requested_at = 0.0
+        self._interrupt_dropped = 0
+        # Whether audio has been flowing since the buffer last ran dry
+        self._playing = False
+        self.interrupts = 0
+        self.last_interrupt_ms: Optional[float] = None
+        self.max_interrupt_ms = 0.0
     
     def start(self):
         """Start the audio player and begin playback thread."""
         if self._running:
             return
         
-        # Get the best output device
-        device_index = self._audio_manager.get_output_device_index(
-            prefer_usb=self.prefer_usb
-        )
-        
-        # Open the output stream
-        self._stream = self._audio_manager.open_output_stream(
-            device_index=device_index,
-            rate=self.sample_rate,
-            channels=self.channels
-        )
+        try:
+            self._stream = self._open_stream()
+        except OSError as e:
+            # The cached device may have been unplugged; re-probe and retry once
+            logger.warning(f"Could not open output device ({e}), re-probing audio devices")
+            self._audio_manager.refresh_devices()
+            self._stream = self._open_stream()
         
         self._running = True
         self._playback_thread = threading.Thread(
@@ -66,57 +90,168 @@ class AudioPlayer:
         self._playback_thread.start()
         logger.info(f"Audio player started (rate={self.sample_rate}Hz, channels={self.channels})")
     
+    def _open_stream(self):
+        """Open the best output device with one playback frame per device period."""
+        device_index = self._audio_manager.get_output_device_index(
+            prefer_usb=self.prefer_usb
+        )
+        return self._audio_manager.open_output_stream(
+            device_index=device_index,
+            rate=self.sample_rate,
+            chunk_size=self._frame_bytes // (self.channels * 2),
+            channels=self.channels
+        )
+    
+    def _ms_to_frames(self, milliseconds: int) -> int:
+        """Convert a duration to a whole number of playback frames (at least one)."""
+        return max(1, -(-milliseconds * self.bytes_per_second // 1000 // self._frame_bytes))
+    
     def _playback_loop(self):
-        """Background thread loop that plays audio from the queue."""
+        """Background thread loop that plays frames from the jitter buffer."""
+        frame = memoryview(self._frame)
         while self._running:
             try:
-                # Wait for audio data with timeout to allow clean shutdown
-                audio_data = self._queue.get(timeout=0.1)
+                if self._interrupt.is_set():
+                    self._finish_interrupt(had_frame=False)
+                    continue
+                
+                # Wait for a frame with timeout to allow clean shutdown
+                if not self._buffer.read_frame(frame, timeout=0.1):
+                    self._playing = False
+                    continue
                 
-                if audio_data is None:
-                    # Poison pill - stop signal
-                    break
+                # A frame read just before clear() is dropped, not played
+                if self._interrupt.is_set():
+                    self._finish_interrupt(had_frame=True)
+                    continue
                 
                 # Write audio to the output stream
                 if self._stream and self._running:
-                    self._stream.write(audio_data)
+                    if not self._playing:
+                        self._playing = True
+                        tracer.mark("first_audio")
+                    self._stream.write(self._frame)
                     
-            except queue.Empty:
-                # No data available, continue waiting
-                continue
             except Exception as e:
                 logger.error(f"Audio playback error: {e}")
                 break
     
-    def play(self, audio_bytes: bytes):
+    def _finish_interrupt(self, had_frame: bool):
+        """
+        Silence the device after clear() and record how long it took (playback thread).
+        
+        Args:
+            had_frame: A frame was read but not yet written when clear() came in
+        """
+        with self._interrupt_lock:
+            self._interrupt.clear()
+            dropped, self._interrupt_dropped = self._interrupt_dropped, 0
+            requested_at = self._interrupt_requested_at
+        was_playing, self._playing = self._playing, False
+        if not (had_frame or was_playing or dropped):
+            # Nothing was playing, so there is nothing to time
+            return
+        
+        flushed = False
+        if self.flush_on_interrupt and self._stream:
+            flushed = self._audio_manager.flush_output_stream(self._stream)
+        
+        latency = time.perf_counter() - requested_at
+        if not flushed:
+            # Audio already in the device buffer still plays out
+            latency += self.output_latency
+        
+        self.interrupts += 1
+        self.last_interrupt_ms = latency * 1000
+        self.max_interrupt_ms = max(self.max_interrupt_ms, self.last_interrupt_ms)
+        tracer.observe("barge_in", latency)
+        logger.info(
+            f"Playback interrupted in {self.last_interrupt_ms:.1f}ms"
+            f"{' (device buffer flushed)' if flushed else ''}"
+        )
+    
+    def play(self, audio_bytes: bytes, timeout: Optional[float] = 0.0):
         """
         Queue audio bytes for playback.
         
+        Never grows the buffer past audio_playback_max_buffer_ms. Audio that
+        does not fit within the timeout is dropped and counted as an overrun;
+        use play_async() from the event loop to wait for space instead.
+        
         Args:
             audio_bytes: Raw audio data (16-bit PCM expected)
+            timeout: Seconds to wait for space (0 never waits, None waits forever)
         """
         if self._running:
-            self._queue.put(audio_bytes)
+            self._buffer.write(audio_bytes, timeout=timeout)
+    
+    async def play_async(self, audio_bytes: bytes):
+        """
+        Queue audio bytes for playback, waiting while the buffer is full.
+        
+        This is the backpressure path for streamed agent audio: the caller
+        is held back at the playback rate rather than buffering without
+        limit. Returns early if the player is cleared or stopped.
+        
+        Args:
+            audio_bytes: Raw audio data (16-bit PCM expected)
+        """
+        data = memoryview(audio_bytes).cast("B")
+        clear_count = self._clear_count
+        frame_seconds = self._frame_bytes / self.bytes_per_second
+        while self._running and clear_count == self._clear_count:
+            data = data[self._buffer.try_write(data):]
+            if not data:
+                return
+            await asyncio.sleep(frame_seconds)
+    
+    def end_of_stream(self):
+        """Mark the end of an utterance so the buffer drains without counting an underrun."""
+        self._buffer.mark_end_of_stream()
+    
+    @property
+    def buffered_ms(self) -> float:
+        """Milliseconds of audio waiting to be played."""
+        return self._buffer.buffered * 1000 / self.bytes_per_second
+    
+    @property
+    def output_latency(self) -> float:
+        """Seconds between a frame being written and it being heard."""
+        if self._stream and hasattr(self._stream, "get_output_latency"):
+            return self._stream.get_output_latency()
+        return 0.0
+    
+    def stats(self) -> dict:
+        """Jitter buffer and interrupt latency metrics."""
+        return {
+            "underruns": self._buffer.underruns,
+            "overruns": self._buffer.overruns,
+            "buffered_ms": self.buffered_ms,
+            "interrupts": self.interrupts,
+            "last_interrupt_ms": self.last_interrupt_ms,
+            "max_interrupt_ms": self.max_interrupt_ms,
+        }
     
     def clear(self):
         """
-        Clear all buffered audio from the queue.
+        Clear all buffered audio and interrupt playback.
         
-        This immediately stops playback by removing all queued audio chunks.
-        The currently playing chunk will finish, but no subsequent audio will play.
+        Drops everything in the jitter buffer and, if
+        audio_playback_flush_on_interrupt is set, the audio already queued
+        in the device. At most the frame currently being written finishes.
         Safe to call even when no audio is playing.
         """
         if not self._running:
             return
         
-        # Drain all items from the queue
-        while not self._queue.empty():
-            try:
-                self._queue.get_nowait()
-            except queue.Empty:
-                break
-        
-        logger.info("Audio buffer cleared")
+        self._clear_count += 1
+        # The playback thread decides whether there was anything to interrupt
+        with self._interrupt_lock:
+            self._interrupt_requested_at = time.perf_counter()
+            self._interrupt.set()
+            dropped = self._buffer.clear()
+            self._interrupt_dropped += dropped
+        logger.info(f"Audio buffer cleared ({dropped * 1000 / self.bytes_per_second:.0f}ms dropped)")
     
     def stop(self):
         """Stop the audio player and clean up resources."""
@@ -125,8 +260,8 @@ class AudioPlayer:
         
         self._running = False
         
-        # Send poison pill to stop the playback thread
-        self._queue.put(None)
+        # Wake the playback thread so it sees the stop
+        self._buffer.close()
         
         # Wait for playback thread to finish
         if self._playback_thread and self._playback_thread.is_alive():
@@ -137,14 +272,12 @@ class AudioPlayer:
             self._audio_manager.close_stream(self._stream)
             self._stream = None
         
-        # Clear any remaining items in the queue
-        while not self._queue.empty():
-            try:
-                self._queue.get_nowait()
-            except queue.Empty:
-                break
-        
-        logger.info("Audio player stopped")
+        self._buffer.clear()
+        stats = self.stats()
+        logger.info(
+            f"Audio player stopped (underruns={stats['underruns']}, overruns={stats['overruns']}, "
+            f"interrupts={stats['interrupts']}, max interrupt latency={stats['max_interrupt_ms']:.1f}ms)"
+        )
     
     def __enter__(self):
         """Context manager entry."""
@@ -10,14 +10,31 @@ class Settings(BaseSettings):
     # API Keys
     porcupine_access_key: str
     deepgram_api_key: str
+    voicemonkey_api_token: str | None = None
+    
+    # Smart home settings
+    smart_home_devices: str = ""  # Comma-separated natural language device names
+    smart_home_groups: dict[str, list[str]] = {}  # JSON: group name -> device or group names
+    smart_home_aliases: dict[str, list[str]] = {}  # JSON: device name -> other names the user may say
+    smart_home_scenes: dict[str, list[dict[str, str]]] = {}  # JSON: scene name -> control_smart_home commands
     
     # Audio settings
-    audio_rate: int = 16000
+    audio_rate: int = 16000  # Mic rate delivered to Porcupine and sent to Deepgram
     audio_output_rate: int = 16000  # Deepgram agent output sample rate
     audio_chunk_size: int = 1024
     audio_channels: int = 1
+    audio_capture_native_rate: bool = True  # Capture at the device's native rate and resample to audio_rate
+    audio_capture_buffer_seconds: float = 5.0  # Mic audio retained for capture consumers
+    audio_upstream_encoding: str = "linear16"  # Mic encoding sent to Deepgram: linear16, mulaw, or alaw
+    audio_capture_queue_depth: int = 32  # Mic chunks queued for the agent send loop before dropping the oldest
+    audio_preroll_seconds: float = 2.0  # Max audio captured before the agent socket is ready that gets replayed
+    audio_playback_frame_ms: int = 20  # Size of each write to the output device
+    audio_playback_prefill_ms: int = 60  # Agent audio buffered before playback starts or resumes after an underrun
+    audio_playback_max_buffer_ms: int = 10000  # Agent audio held before play() applies backpressure
+    audio_playback_flush_on_interrupt: bool = True  # Abort the device buffer on barge-in instead of letting it play out
     prefer_usb_audio: bool = True  # Prefer USB devices for input/output
     echo_cancel_source: str | None = None  # PulseAudio echo-cancelled source name (Linux only)
+    sound_cache_dir: str | None = None  # Decoded UI sounds (defaults to ~/.cache/marlene/sounds)
     
     # Porcupine settings
     porcupine_keyword: str = "Hey Marlene"  # custom keyword
@@ -27,6 +44,44 @@ class Settings(BaseSettings):
     # Deepgram settings
     deepgram_model: str = "nova-2"
     deepgram_language: str = "en-US"
+    deepgram_agent_url: str = "wss://agent.deepgram.com/v1/agent/converse"
+    agent_connection_mode: str = "on_demand"  # on_demand, prewarm, or speculative
+    agent_session_max_age: float = 60.0  # Refresh a pre-warmed agent session after this many seconds
+    agent_speculative_ttl: float = 10.0  # Close an unused speculative agent session after this many seconds
+    agent_keepalive_interval: float = 5.0  # KeepAlive period while an agent session sits idle
+    vad_energy_threshold: int = 600  # Frame RMS treated as local voice activity (speculative mode, cached greeting)
+    
+    # Smart home HTTP settings
+    voicemonkey_base_url: str = "https://api-v2.voicemonkey.io"
+    voicemonkey_timeout: float = 5.0  # Seconds before a VoiceMonkey request is abandoned
+    voicemonkey_max_concurrency: int = 8  # Triggers in flight at once, e.g. when fanning out a group or scene
+    voicemonkey_rate_limit: float = 5.0  # Sustained triggers per second per host
+    voicemonkey_burst: int = 10  # Triggers allowed back to back before the rate limit applies
+    voicemonkey_max_pending: int = 32  # Commands accepted at once; more fail fast instead of queueing
+    voicemonkey_retries: int = 2  # Extra attempts after a timeout, connection error or 5xx
+    voicemonkey_retry_backoff_ms: int = 200  # Base retry delay, doubled each time and jittered
+    voicemonkey_hedge_after_ms: int = 1500  # Send a second, parallel attempt if no response by then (0 disables)
+    voicemonkey_breaker_threshold: int = 5  # Failed commands in a row before failing fast
+    voicemonkey_breaker_reset: float = 30.0  # Seconds to fail fast before trying VoiceMonkey again
+    smart_home_default_backend: str = "voicemonkey"  # voicemonkey or local
+    smart_home_backends: dict[str, str] = {}  # JSON: device name -> backend, for devices not on the default
+    local_bridge_host: str = "127.0.0.1"  # LAN bridge speaking JSON lines over TCP (backend "local")
+    local_bridge_port: int = 8765
+    local_bridge_timeout: float = 1.0  # Seconds to wait for the bridge to connect or reply
+    local_bridge_max_concurrency: int = 8  # Commands awaiting a bridge reply at once
+    local_bridge_max_pending: int = 32  # Commands accepted at once; more fail fast instead of queueing
+    local_bridge_breaker_threshold: int = 5  # Failed commands in a row before failing fast
+    local_bridge_breaker_reset: float = 10.0  # Seconds to fail fast before trying the bridge again
+    device_state_ttl: float = 30.0  # Seconds a device's last commanded state is trusted to skip no-op triggers
+    http_keepalive_expiry: float = 30.0  # Seconds an idle pooled connection is kept open
+    function_call_timeout: float = 8.0  # Per-function limit when the agent calls several at once
+    function_call_mode: str = "optimistic"  # optimistic (answer at once, report failures later) or wait
+    fast_path_enabled: bool = False  # Run simple device commands from the transcript without waiting for the LLM
+    fast_path_confirmation: str = "Done"  # Cached phrase played when a fast path command succeeds (chime until recorded)
+    tts_cache_enabled: bool = True  # Record the greeting and short confirmations and replay them locally
+    tts_cache_phrases: list[str] = ["OK", "Done", "Sure thing", "You got it"]  # Confirmations worth recording (JSON)
+    tts_cache_dir: str | None = None  # Defaults to ~/.cache/marlene/tts
+    tts_cache_max_mb: int = 20  # Least recently played clips are evicted beyond this
     
     # Server settings
     api_host: str = "0.0.0.0"
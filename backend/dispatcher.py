@@ -0,0 +1,203 @@
+"""Outbound command dispatch for Marlene smart home assistant."""
+import asyncio
+import logging
+import random
+import time
+from typing import Awaitable, Callable, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class DispatchError(Exception):
+    """A command was refused without being sent."""
+
+
+class QueueFullError(DispatchError):
+    """Too many commands are already waiting."""
+
+
+class CircuitOpenError(DispatchError):
+    """The service failed repeatedly and is not being called for now."""
+
+
+class CommandDispatcher:
+    """
+    Sends commands to one service with retries, hedging and a circuit breaker.
+
+    At most max_pending commands are accepted at once and concurrency of
+    them run together; the rest fail fast. A failed attempt is retried with
+    jittered exponential backoff if it looks transient. An attempt still
+    running after hedge_after seconds gets a second, parallel attempt and
+    the first to succeed wins, so commands must be idempotent. After
+    breaker_threshold commands fail in a row, new commands fail at once
+    for breaker_reset seconds, then a single trial command decides whether
+    the service is back.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        concurrency: int = 8,
+        max_pending: int = 32,
+        retries: int = 2,
+        retry_backoff: float = 0.2,
+        hedge_after: float = 1.5,
+        breaker_threshold: int = 5,
+        breaker_reset: float = 30.0
+    ):
+        """
+        Initialize the dispatcher.
+
+        Args:
+            name: Service name used in logs
+            concurrency: Commands sent at once
+            max_pending: Commands accepted at once, including those sending
+            retries: Extra attempts after a transient failure
+            retry_backoff: Base delay in seconds, doubled on each retry
+            hedge_after: Seconds before a second attempt is started (0 disables)
+            breaker_threshold: Consecutive failed commands that open the circuit
+            breaker_reset: Seconds the circuit stays open
+        """
+        self.name = name
+        self.max_pending = max_pending
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self.hedge_after = hedge_after
+        self.breaker_threshold = breaker_threshold
+        self.breaker_reset = breaker_reset
+        self._slots = asyncio.Semaphore(concurrency)
+        self._pending = 0
+        self._failures = 0
+        self._opened_at: Optional[float] = None
+        self._trial_running = False
+
+        # Stats
+        self.retried = 0
+        self.hedged = 0
+        self.rejected = 0
+
+    @property
+    def state(self) -> str:
+        """Circuit state: closed, open or half-open."""
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at < self.breaker_reset or self._trial_running:
+            return "open"
+        return "half-open"
+
+    async def submit(
+        self,
+        send: Callable[[], Awaitable[T]],
+        is_transient: Callable[[Exception], bool] = lambda e: True,
+        wait_turn: Optional[Callable[[], Awaitable]] = None
+    ) -> T:
+        """
+        Send a command.
+
+        Args:
+            send: Makes one attempt; called again for retries and hedges
+            is_transient: Whether a failure is worth retrying and counts
+                against the circuit breaker
+            wait_turn: Awaited before every attempt, e.g. a rate limit;
+                time spent here does not count towards hedge_after
+
+        Returns:
+            Result of the first successful attempt
+
+        Raises:
+            QueueFullError: If max_pending commands are already waiting
+            CircuitOpenError: If the service is failing
+            Exception: Whatever the last attempt raised
+        """
+        if self._pending >= self.max_pending:
+            self.rejected += 1
+            raise QueueFullError(f"{self.name}: {self._pending} commands already waiting")
+        state = self.state
+        if state == "open":
+            self.rejected += 1
+            raise CircuitOpenError(f"{self.name} is not responding")
+        trial = state == "half-open"
+        if trial:
+            self._trial_running = True
+            logger.info(f"{self.name}: trying a command after the circuit opened")
+
+        self._pending += 1
+        try:
+            async with self._slots:
+                result = await self._send_with_retries(send, is_transient, wait_turn)
+        except Exception as e:
+            if trial or is_transient(e):
+                self._record_failure(trial)
+            raise
+        finally:
+            self._pending -= 1
+            if trial:
+                self._trial_running = False
+        if self._opened_at is not None:
+            logger.info(f"{self.name}: recovered, circuit closed")
+        self._failures = 0
+        self._opened_at = None
+        return result
+
+    def _record_failure(self, trial: bool):
+        self._failures += 1
+        if trial or self._failures >= self.breaker_threshold:
+            self._opened_at = time.monotonic()
+            logger.warning(
+                f"{self.name}: {self._failures} failures in a row, "
+                f"failing fast for {self.breaker_reset:g}s"
+            )
+
+    async def _send_with_retries(self, send, is_transient, wait_turn):
+        for attempt in range(self.retries + 1):
+            try:
+                return await self._send_hedged(send, wait_turn)
+            except Exception as e:
+                if attempt == self.retries or not is_transient(e):
+                    raise
+                # Full jitter keeps retries from many commands from lining up
+                delay = random.uniform(0, self.retry_backoff * 2 ** attempt)
+                self.retried += 1
+                logger.info(f"{self.name}: attempt {attempt + 1} failed ({e!r}), retrying in {delay * 1000:.0f}ms")
+                await asyncio.sleep(delay)
+
+    async def _send_hedged(self, send, wait_turn):
+        async def attempt():
+            if wait_turn:
+                await wait_turn()
+            return await send()
+
+        if wait_turn:
+            await wait_turn()
+        tasks = {asyncio.ensure_future(send())}
+        try:
+            if self.hedge_after > 0:
+                done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+                if not done:
+                    self.hedged += 1
+                    logger.info(f"{self.name}: no response after {self.hedge_after * 1000:.0f}ms, hedging")
+                    tasks.add(asyncio.ensure_future(attempt()))
+            error = None
+            while tasks:
+                done, tasks = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def stats(self) -> dict:
+        """Circuit state and counters."""
+        return {
+            "state": self.state,
+            "pending": self._pending,
+            "consecutive_failures": self._failures,
+            "retried": self.retried,
+            "hedged": self.hedged,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,192 @@
+"""Playback jitter buffer for Marlene smart home assistant."""
+import threading
+from typing import Optional
+
+
+class JitterBuffer:
+    """
+    Bounded FIFO of playback PCM that hands out fixed-size frames.
+
+    Writers append arbitrarily sized network payloads; the playback thread
+    reads exact frame-sized chunks. Playback starts only once prefill bytes
+    are buffered, and restarts the prefill after an underrun, so late
+    packets cause one short gap instead of a run of clicks. Memory is fixed
+    at capacity bytes; writers wait (or drop) when it is full.
+    """
+
+    def __init__(self, capacity: int, frame_size: int, prefill: int):
+        """
+        Initialize the jitter buffer.
+
+        Args:
+            capacity: Maximum bytes held
+            frame_size: Bytes returned by each read_frame()
+            prefill: Bytes buffered before playback (re)starts
+        """
+        self.capacity = capacity
+        self.frame_size = frame_size
+        self.prefill = min(prefill, capacity)
+        self._buffer = bytearray(capacity)
+        self._view = memoryview(self._buffer)
+        self._read_position = 0
+        self._write_position = 0
+        self._condition = threading.Condition()
+        self._playing = False
+        self._end_of_stream = False
+        self._closed = False
+        self._clears = 0
+
+        # Metrics
+        self.underruns = 0
+        self.overruns = 0
+
+    @property
+    def buffered(self) -> int:
+        """Bytes waiting to be played."""
+        return self._write_position - self._read_position
+
+    def write(self, data, timeout: Optional[float] = 0.0) -> int:
+        """
+        Append audio, waiting for space if the buffer is full.
+
+        Args:
+            data: PCM bytes
+            timeout: Seconds to wait for space (0 never waits, None waits forever)
+
+        Returns:
+            Number of bytes written. Anything not written was dropped and
+            counted as an overrun.
+        """
+        data = memoryview(data).cast("B")
+        written = 0
+        with self._condition:
+            self._end_of_stream = False
+            while written < len(data) and not self._closed:
+                space = self.capacity - self.buffered
+                if space == 0:
+                    if timeout == 0 or not self._condition.wait_for(
+                        lambda: self._closed or self.buffered < self.capacity,
+                        timeout=timeout
+                    ):
+                        break
+                    continue
+                size = min(space, len(data) - written)
+                self._copy_in(data[written:written + size])
+                written += size
+                self._condition.notify_all()
+            if written < len(data):
+                self.overruns += 1
+        return written
+
+    def try_write(self, data) -> int:
+        """
+        Append as much audio as currently fits, without waiting or dropping.
+
+        Returns:
+            Number of bytes written; the caller keeps the rest
+        """
+        data = memoryview(data).cast("B")
+        with self._condition:
+            self._end_of_stream = False
+            size = min(self.capacity - self.buffered, len(data))
+            if size:
+                self._copy_in(data[:size])
+                self._condition.notify_all()
+        return size
+
+    def read_frame(self, out: memoryview, timeout: float) -> bool:
+        """
+        Fill out with the next frame of audio.
+
+        Args:
+            out: Writable view of frame_size bytes
+            timeout: Seconds to wait for enough audio
+
+        Returns:
+            True if out holds a frame to play, False if nothing is ready
+        """
+        with self._condition:
+            # A clear() while waiting returns control to the caller at once
+            clears = self._clears
+            if not self._playing:
+                # (Re)build the prefill before starting playback
+                ready = self._condition.wait_for(
+                    lambda: self._closed or self._clears != clears or self.buffered >= self.prefill
+                    or (self._end_of_stream and self.buffered > 0),
+                    timeout=timeout
+                )
+                if not ready or self._closed or self._clears != clears:
+                    return False
+                self._playing = True
+
+            if self.buffered < self.frame_size and not self._end_of_stream:
+                self._condition.wait_for(
+                    lambda: self._closed or self._clears != clears or self._end_of_stream
+                    or self.buffered >= self.frame_size,
+                    timeout=timeout
+                )
+                if self._closed or self._clears != clears:
+                    return False
+
+            size = min(self.frame_size, self.buffered)
+            if size < self.frame_size and not self._end_of_stream:
+                # Packets are late: stop and prefill again
+                self.underruns += 1
+                self._playing = False
+                return False
+            if size == 0:
+                self._playing = False
+                return False
+
+            self._copy_out(out[:size])
+            if size < self.frame_size:
+                # Pad the last frame of a stream with silence
+                out[size:] = bytes(self.frame_size - size)
+            if self.buffered == 0 and self._end_of_stream:
+                self._playing = False
+            self._condition.notify_all()
+        return True
+
+    def mark_end_of_stream(self):
+        """Note that no more audio is coming, so draining is not an underrun."""
+        with self._condition:
+            self._end_of_stream = True
+            self._condition.notify_all()
+
+    def clear(self) -> int:
+        """
+        Drop all buffered audio.
+
+        Returns:
+            Number of bytes dropped
+        """
+        with self._condition:
+            dropped = self.buffered
+            self._read_position = self._write_position
+            self._playing = False
+            self._clears += 1
+            self._condition.notify_all()
+        return dropped
+
+    def close(self):
+        """Wake every waiting reader and writer."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+
+    def _copy_in(self, data: memoryview):
+        start = self._write_position % self.capacity
+        first = min(len(data), self.capacity - start)
+        self._view[start:start + first] = data[:first]
+        if first < len(data):
+            self._view[:len(data) - first] = data[first:]
+        self._write_position += len(data)
+
+    def _copy_out(self, out: memoryview):
+        size = len(out)
+        start = self._read_position % self.capacity
+        first = min(size, self.capacity - start)
+        out[:first] = self._view[start:start + first]
+        if first < size:
+            out[first:] = self._view[:size - first]
+        self._read_position += size
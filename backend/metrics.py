@@ -0,0 +1,239 @@
+"""Latency metrics for Marlene smart home assistant."""
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict
+
+
+class LatencyRecorder:
+    """
+    Keeps the most recent latency samples for one operation.
+
+    Percentiles are computed over a sliding window, so they track current
+    behaviour rather than the whole uptime. Safe to use from any thread.
+    """
+
+    def __init__(self, name: str, window: int = 1000):
+        """
+        Initialize the recorder.
+
+        Args:
+            name: Operation name used in logs
+            window: Number of most recent samples kept
+        """
+        self.name = name
+        self.count = 0
+        self.total = 0.0
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float):
+        """Add one latency sample."""
+        with self._lock:
+            self._samples.append(seconds)
+            self.count += 1
+            self.total += seconds
+
+    @contextmanager
+    def time(self):
+        """Record how long the body of a with block takes."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(time.perf_counter() - started)
+
+    def percentile(self, percent: float) -> float:
+        """
+        Latency at a percentile of the current window (nearest rank).
+
+        Args:
+            percent: Percentile between 0 and 100
+
+        Returns:
+            Latency in seconds (0 if nothing was recorded)
+        """
+        with self._lock:
+            samples = sorted(self._samples)
+        if not samples:
+            return 0.0
+        rank = max(1, -(-len(samples) * percent // 100))
+        return samples[int(rank) - 1]
+
+    def summary(self) -> Dict[str, float]:
+        """Sample count plus p50, p95 and max latency in milliseconds."""
+        with self._lock:
+            samples = list(self._samples)
+        return {
+            "count": self.count,
+            "p50_ms": self.percentile(50) * 1000,
+            "p95_ms": self.percentile(95) * 1000,
+            "max_ms": max(samples, default=0.0) * 1000,
+        }
+
+    def describe(self) -> str:
+        """One-line summary for logs."""
+        summary = self.summary()
+        return (
+            f"{self.name}: p50={summary['p50_ms']:.0f}ms p95={summary['p95_ms']:.0f}ms "
+            f"max={summary['max_ms']:.0f}ms (n={summary['count']})"
+        )
+
+
+_recorders: Dict[str, LatencyRecorder] = {}
+_recorders_lock = threading.Lock()
+
+
+def get_latency_recorder(name: str) -> LatencyRecorder:
+    """Get the shared recorder for an operation, creating it on first use."""
+    with _recorders_lock:
+        if name not in _recorders:
+            _recorders[name] = LatencyRecorder(name)
+        return _recorders[name]
+
+
+def latency_summaries() -> Dict[str, Dict[str, float]]:
+    """Summaries of every recorder, keyed by name."""
+    with _recorders_lock:
+        recorders = list(_recorders.values())
+    return {recorder.name: recorder.summary() for recorder in recorders}
+
+
+_counters: Dict[str, int] = {}
+
+
+def increment(name: str, amount: int = 1):
+    """Add to a named counter, e.g. errors for one device."""
+    with _recorders_lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def counters() -> Dict[str, int]:
+    """Current value of every counter, keyed by name."""
+    with _recorders_lock:
+        return dict(_counters)
+
+
+# Histogram bucket upper bounds in seconds, from a fast LAN call to a slow cloud turn
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram.
+
+    Memory does not grow with the number of samples, and the buckets map
+    directly onto a Prometheus histogram. Safe to use from any thread.
+    """
+
+    def __init__(self, name: str, buckets: tuple = DEFAULT_BUCKETS):
+        """
+        Initialize the histogram.
+
+        Args:
+            name: Stage or operation name
+            buckets: Increasing bucket upper bounds in seconds
+        """
+        self.name = name
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds: float):
+        """Add one sample."""
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        with self._lock:
+            self._counts[index] += 1
+            self.count += 1
+            self.sum += seconds
+            self.max = max(self.max, seconds)
+
+    def cumulative_counts(self) -> list:
+        """Samples at or below each bucket bound, then the total (the +Inf bucket)."""
+        with self._lock:
+            counts = list(self._counts)
+        total = 0
+        cumulative = []
+        for count in counts:
+            total += count
+            cumulative.append(total)
+        return cumulative
+
+    def quantile(self, fraction: float) -> float:
+        """
+        Estimate a quantile by interpolating within its bucket.
+
+        Args:
+            fraction: Quantile between 0 and 1
+
+        Returns:
+            Seconds (0 if nothing was observed)
+        """
+        cumulative = self.cumulative_counts()
+        if not cumulative[-1]:
+            return 0.0
+        rank = fraction * cumulative[-1]
+        lower = 0.0
+        previous = 0
+        for index, total in enumerate(cumulative):
+            upper = self.buckets[index] if index < len(self.buckets) else self.max
+            if total >= rank and total > previous:
+                estimate = lower + (upper - lower) * (rank - previous) / (total - previous)
+                return min(estimate, self.max)
+            lower, previous = upper, total
+        return self.max
+
+
+def render_prometheus(histograms: Dict[str, Histogram] = None) -> str:
+    """
+    Render metrics in the Prometheus text exposition format.
+
+    Args:
+        histograms: Stage histograms keyed by stage name
+
+    Returns:
+        Text for a /metrics endpoint
+    """
+    lines = []
+    if histograms:
+        lines += [
+            "# HELP marlene_stage_seconds Time from the preceding pipeline stage to this one (barge_in: time to silence playback)",
+            "# TYPE marlene_stage_seconds histogram",
+        ]
+        for stage, histogram in histograms.items():
+            cumulative = histogram.cumulative_counts()
+            for bound, total in zip(histogram.buckets, cumulative):
+                lines.append(f'marlene_stage_seconds_bucket{{stage="{stage}",le="{bound:g}"}} {total}')
+            lines.append(f'marlene_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {cumulative[-1]}')
+            lines.append(f'marlene_stage_seconds_sum{{stage="{stage}"}} {histogram.sum:.6f}')
+            lines.append(f'marlene_stage_seconds_count{{stage="{stage}"}} {cumulative[-1]}')
+
+    with _recorders_lock:
+        recorders = list(_recorders.values())
+        counter_values = dict(_counters)
+    if recorders:
+        lines += [
+            "# HELP marlene_latency_seconds Latency of outbound operations over the recent window",
+            "# TYPE marlene_latency_seconds summary",
+        ]
+        for recorder in recorders:
+            for quantile in (0.5, 0.95, 0.99):
+                lines.append(
+                    f'marlene_latency_seconds{{operation="{recorder.name}",quantile="{quantile:g}"}} '
+                    f"{recorder.percentile(quantile * 100):.6f}"
+                )
+            lines.append(f'marlene_latency_seconds_sum{{operation="{recorder.name}"}} {recorder.total:.6f}')
+            lines.append(f'marlene_latency_seconds_count{{operation="{recorder.name}"}} {recorder.count}')
+    if counter_values:
+        lines += [
+            "# HELP marlene_events_total Counted events, e.g. device_errors per device",
+            "# TYPE marlene_events_total counter",
+        ]
+        for name, value in sorted(counter_values.items()):
+            event, _, key = name.partition(":")
+            lines.append(f'marlene_events_total{{event="{event}",key="{key}"}} {value}')
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,75 @@
+"""Request rate limiting for Marlene smart home assistant."""
+import asyncio
+import time
+from typing import Dict
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """
+    Async token bucket: allows bursts up to capacity, then rate per second.
+
+    Waiters are served in arrival order, so a burst of device commands
+    goes out as fast as the limit allows and never faster.
+    """
+
+    def __init__(self, rate: float, capacity: int):
+        """
+        Initialize the bucket (full).
+
+        Args:
+            rate: Tokens added per second
+            capacity: Maximum tokens held, i.e. the burst size
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> float:
+        """
+        Take one token, waiting for it if necessary.
+
+        Returns:
+            Seconds spent waiting
+        """
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0.0
+            # Hold the lock while waiting so later callers queue behind us
+            wait = -self._tokens / self.rate
+            await asyncio.sleep(wait)
+            return wait
+
+
+class HostRateLimiter:
+    """One token bucket per host."""
+
+    def __init__(self, rate: float, capacity: int):
+        """
+        Initialize the limiter.
+
+        Args:
+            rate: Requests per second allowed to each host
+            capacity: Burst size per host
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self._buckets: Dict[str, TokenBucket] = {}
+
+    async def acquire(self, url: str) -> float:
+        """
+        Wait until a request to the host of url is allowed.
+
+        Returns:
+            Seconds spent waiting
+        """
+        host = urlsplit(url).netloc or url
+        if host not in self._buckets:
+            self._buckets[host] = TokenBucket(self.rate, self.capacity)
+        return await self._buckets[host].acquire()
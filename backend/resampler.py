@@ -0,0 +1,116 @@
+"""Streaming sample rate conversion for Marlene smart home assistant."""
+from math import gcd
+import numpy as np
+
+
+class PolyphaseResampler:
+    """
+    Stateful polyphase FIR resampler for 16-bit mono PCM.
+
+    Converts a continuous stream chunk by chunk, carrying filter history
+    and output phase across calls so chunk boundaries are seamless. All
+    working arrays are allocated once up front; process() only fills them.
+    """
+
+    def __init__(
+        self,
+        input_rate: int,
+        output_rate: int,
+        max_input_frames: int,
+        taps_per_phase: int = 32,
+        cutoff: float = 0.9
+    ):
+        """
+        Initialize the resampler.
+
+        Args:
+            input_rate: Sample rate of the incoming audio in Hz
+            output_rate: Sample rate to convert to in Hz
+            max_input_frames: Largest chunk that will be passed to process()
+            taps_per_phase: FIR taps applied per output sample
+            cutoff: Low-pass cutoff as a fraction of the lower Nyquist frequency
+        """
+        divisor = gcd(input_rate, output_rate)
+        self.up = output_rate // divisor
+        self.down = input_rate // divisor
+        self.input_rate = input_rate
+        self.output_rate = output_rate
+        self.max_input_frames = max_input_frames
+        self._taps = taps_per_phase
+
+        # Windowed-sinc prototype filter at the upsampled rate, split into phases
+        length = self.up * taps_per_phase
+        n = np.arange(length) - (length - 1) / 2
+        fc = cutoff * 0.5 / max(self.up, self.down)
+        prototype = 2 * fc * np.sinc(2 * fc * n) * np.kaiser(length, 8.0)
+        prototype *= self.up / prototype.sum()
+        # bank[phase, k] weights input sample (base - taps + 1 + k)
+        bank = prototype.reshape(taps_per_phase, self.up).T[:, ::-1]
+        self._bank = np.ascontiguousarray(bank, dtype=np.float32)
+
+        # Input history followed by the current chunk
+        self._history = taps_per_phase - 1
+        self._input = np.zeros(self._history + max_input_frames, dtype=np.float32)
+        # Position of the next output sample in upsampled units, relative to the chunk start
+        self._offset = 0
+
+        max_outputs = -(-max_input_frames * self.up // self.down) + 1
+        self._index = np.arange(max_outputs, dtype=np.int64)
+        self._tap_range = np.arange(taps_per_phase, dtype=np.int64)
+        self._position = np.empty(max_outputs, dtype=np.int64)
+        self._start = np.empty(max_outputs, dtype=np.int64)
+        self._phase = np.empty(max_outputs, dtype=np.int64)
+        self._gather = np.empty((max_outputs, taps_per_phase), dtype=np.int64)
+        self._windows = np.empty((max_outputs, taps_per_phase), dtype=np.float32)
+        self._coefficients = np.empty((max_outputs, taps_per_phase), dtype=np.float32)
+        self._output = np.empty(max_outputs, dtype=np.float32)
+        self._pcm = np.empty(max_outputs, dtype=np.int16)
+
+    def process(self, data) -> memoryview:
+        """
+        Resample one chunk of 16-bit mono PCM.
+
+        Args:
+            data: PCM bytes, at most max_input_frames frames long
+
+        Returns:
+            Resampled PCM. The view points into an internal buffer and is
+            only valid until the next call.
+        """
+        samples = np.frombuffer(data, dtype=np.int16)
+        frames = len(samples)
+        if frames > self.max_input_frames:
+            raise ValueError(f"Chunk of {frames} frames exceeds max_input_frames={self.max_input_frames}")
+
+        history = self._history
+        self._input[history:history + frames] = samples
+
+        # Outputs whose newest input sample falls inside this chunk
+        count = (frames * self.up - 1 - self._offset) // self.down + 1
+        count = max(count, 0)
+
+        position = self._position[:count]
+        np.multiply(self._index[:count], self.down, out=position)
+        np.add(position, self._offset, out=position)
+        np.floor_divide(position, self.up, out=self._start[:count])
+        np.remainder(position, self.up, out=self._phase[:count])
+
+        gather = self._gather[:count]
+        np.add(self._start[:count, None], self._tap_range, out=gather)
+        windows = self._windows[:count]
+        np.take(self._input, gather, out=windows)
+        coefficients = self._coefficients[:count]
+        np.take(self._bank, self._phase[:count], axis=0, out=coefficients)
+        np.multiply(windows, coefficients, out=windows)
+
+        output = self._output[:count]
+        np.sum(windows, axis=1, out=output)
+        np.rint(output, out=output)
+        np.clip(output, -32768, 32767, out=output)
+        pcm = self._pcm[:count]
+        np.copyto(pcm, output, casting="unsafe")
+
+        # Keep the tail of this chunk as history for the next one
+        self._input[:history] = self._input[frames:frames + history]
+        self._offset += count * self.down - frames * self.up
+        return memoryview(pcm).cast("B")
@@ -0,0 +1,188 @@
+"""Decoded UI sound cache for Marlene smart home assistant."""
+import hashlib
+import logging
+import mmap
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Union
+import numpy as np
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+SOUNDS_DIR = Path(__file__).parent / "voice_agent_config"
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "marlene" / "sounds"
+
+# Renders raw PCM for (sample_rate, channels, sample_width)
+Generator = Callable[[int, int, int], bytes]
+
+
+def tone(*notes: tuple, volume: float = 0.3, fade_ms: float = 5.0) -> Generator:
+    """
+    Build a generator for a sequence of sine tones.
+
+    Args:
+        notes: (frequency_hz, duration_ms) pairs played back to back
+        volume: Peak amplitude as a fraction of full scale
+        fade_ms: Fade in/out applied to each note to avoid clicks
+
+    Returns:
+        Generator usable with SoundCache.register()
+    """
+    def render(sample_rate: int, channels: int, sample_width: int) -> bytes:
+        parts = []
+        for frequency, duration_ms in notes:
+            t = np.arange(int(sample_rate * duration_ms / 1000)) / sample_rate
+            wave = np.sin(2 * np.pi * frequency * t)
+            fade = min(int(sample_rate * fade_ms / 1000), len(t) // 2)
+            if fade:
+                ramp = np.linspace(0.0, 1.0, fade)
+                wave[:fade] *= ramp
+                wave[-fade:] *= ramp[::-1]
+            parts.append(wave)
+        full_scale = 2 ** (8 * sample_width - 1) - 1
+        samples = np.concatenate(parts) * volume * full_scale
+        samples = np.repeat(samples[:, None], channels, axis=1)
+        return samples.astype(f"<i{sample_width}").tobytes()
+
+    render.version = repr((notes, volume, fade_ms))
+    return render
+
+
+class SoundCache:
+    """
+    Decodes UI sounds once and serves them as memory-mapped raw PCM.
+
+    Each registered sound is rendered at most once per (rate, channels,
+    sample width) and written to the cache directory. Later loads, in this
+    process or after a restart, map the file instead of running ffmpeg.
+    Sounds are loaded lazily on first use.
+    """
+
+    def __init__(
+        self,
+        sample_rate: int = None,
+        channels: int = None,
+        sample_width: int = 2,
+        cache_dir: str = None
+    ):
+        """
+        Initialize the sound cache.
+
+        Args:
+            sample_rate: Playback sample rate in Hz (defaults to audio_output_rate config)
+            channels: Number of playback channels (defaults to config)
+            sample_width: Bytes per sample
+            cache_dir: Directory for decoded PCM (defaults to config, then ~/.cache/marlene/sounds)
+        """
+        self.sample_rate = sample_rate or settings.audio_output_rate
+        self.channels = channels or settings.audio_channels
+        self.sample_width = sample_width
+        self.cache_dir = Path(cache_dir or settings.sound_cache_dir or DEFAULT_CACHE_DIR)
+        self._sources: Dict[str, Union[Path, Generator]] = {}
+        self._loaded: Dict[str, Union[mmap.mmap, bytes]] = {}
+        self._lock = threading.Lock()
+
+        for name, source in BUILTIN_SOUNDS.items():
+            self.register(name, source)
+
+    def register(self, name: str, source: Union[str, Path, Generator]):
+        """
+        Register a sound.
+
+        Args:
+            name: Name passed to get()
+            source: Audio file readable by ffmpeg, or a generator such as tone()
+        """
+        if not callable(source):
+            source = Path(source)
+        with self._lock:
+            self._sources[name] = source
+            self._loaded.pop(name, None)
+
+    def get(self, name: str) -> Optional[Union[mmap.mmap, bytes]]:
+        """
+        Get a sound as raw PCM in the playback format, decoding it if needed.
+
+        Args:
+            name: Registered sound name
+
+        Returns:
+            Read-only buffer of PCM bytes, or None if the sound cannot be loaded
+        """
+        with self._lock:
+            if name in self._loaded:
+                return self._loaded[name]
+            source = self._sources.get(name)
+            if source is None:
+                logger.warning(f"Unknown sound '{name}'")
+                return None
+            try:
+                audio = self._load(name, source)
+            except Exception as e:
+                # Remember the failure so ffmpeg is not retried on every use
+                logger.warning(f"Failed to load sound '{name}': {e}")
+                audio = None
+            self._loaded[name] = audio
+            return audio
+
+    def duration(self, name: str) -> float:
+        """Length of a sound in seconds (0 if it cannot be loaded)."""
+        audio = self.get(name)
+        if not audio:
+            return 0.0
+        return len(audio) / (self.sample_rate * self.channels * self.sample_width)
+
+    def _cache_path(self, name: str, source: Union[Path, Generator]) -> Path:
+        """Cache file for a sound, keyed by format and source version."""
+        if callable(source):
+            version = getattr(source, "version", source.__name__)
+        else:
+            stat = source.stat()
+            version = f"{source.resolve()}:{stat.st_size}:{stat.st_mtime_ns}"
+        digest = hashlib.sha1(version.encode("utf-8")).hexdigest()[:12]
+        return self.cache_dir / (
+            f"{name}-{digest}-{self.sample_rate}x{self.channels}x{self.sample_width}.pcm"
+        )
+
+    def _load(self, name: str, source: Union[Path, Generator]) -> Union[mmap.mmap, bytes]:
+        path = self._cache_path(name, source)
+        if not path.exists():
+            pcm = self._render(source)
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            # Write to a temporary file so concurrent loaders never map a partial file
+            temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+            temp_path.write_bytes(pcm)
+            os.replace(temp_path, path)
+            logger.info(f"Decoded sound '{name}' into cache ({len(pcm)} bytes)")
+
+        with open(path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                return b""
+            audio = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        logger.debug(f"Mapped sound '{name}' from {path}")
+        return audio
+
+    def _render(self, source: Union[Path, Generator]) -> bytes:
+        """Produce PCM in the playback format from a file or generator."""
+        if callable(source):
+            return source(self.sample_rate, self.channels, self.sample_width)
+
+        # pydub is only needed on a cache miss
+        from pydub import AudioSegment
+
+        audio = AudioSegment.from_file(source, format=source.suffix.lstrip(".") or None)
+        audio = audio.set_frame_rate(self.sample_rate)
+        audio = audio.set_channels(self.channels)
+        audio = audio.set_sample_width(self.sample_width)
+        return audio.raw_data
+
+
+# Sounds available to every SoundCache
+BUILTIN_SOUNDS: Dict[str, Union[Path, Generator]] = {
+    "power_off": SOUNDS_DIR / "power-off.mp3",
+    "wake_chime": tone((880, 70), (1320, 90)),
+    "error_tone": tone((440, 120), (330, 200)),
+    "confirm": tone((1047, 60), (1568, 110)),
+}
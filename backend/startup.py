@@ -0,0 +1,102 @@
+"""Startup warm-up for Marlene smart home assistant."""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict
+from .audio_manager import AudioManager
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Records how long each warm-up step takes and logs a report."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.steps: Dict[str, float] = {}
+
+    @asynccontextmanager
+    async def step(self, name: str):
+        """
+        Time the body of an async with block as one named step.
+
+        A failing step is logged and skipped; whatever it was warming up is
+        retried lazily on first use and reports its own error there.
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            logger.warning(f"Warm-up step '{name}' failed: {e}")
+        finally:
+            self.steps[name] = time.perf_counter() - started
+
+    def record(self, name: str, seconds: float):
+        """Add a step that was timed elsewhere (e.g. module imports)."""
+        self.steps[name] = seconds
+
+    def report(self) -> Dict[str, float]:
+        """
+        Log the timing report.
+
+        Returns:
+            Seconds per step, plus "total" wall time
+        """
+        total = time.perf_counter() - self.started
+        lines = [f"  {name:<16} {seconds * 1000:8.1f}ms" for name, seconds in self.steps.items()]
+        logger.info("Startup timing:\n" + "\n".join(lines) + f"\n  {'total':<16} {total * 1000:8.1f}ms")
+        return {**self.steps, "total": total}
+
+
+def _probe_audio_devices():
+    """Initialize PortAudio and pick the input and output devices."""
+    audio_manager = AudioManager()
+    input_index = audio_manager.get_device_index(prefer_usb=settings.prefer_usb_audio)
+    audio_manager.get_output_device_index(prefer_usb=settings.prefer_usb_audio)
+    audio_manager.get_device_sample_rate(input_index)
+
+
+async def warm_up(
+    voice_agent=None,
+    wake_word_detector=None,
+    timer: StartupTimer = None
+) -> Dict[str, float]:
+    """
+    Do the slow one-time setup explicitly, before the first wake word.
+
+    Nothing in the backend touches audio hardware or loads models at import
+    time; this is the single place that does it. Independent steps run
+    concurrently.
+
+    Args:
+        voice_agent: Optional VoiceAgent to prepare (UI sounds, standby connection)
+        wake_word_detector: Optional WakeWordDetector whose Porcupine model to load
+        timer: Timer with steps already recorded by the caller
+
+    Returns:
+        Seconds per step, plus "total" wall time
+    """
+    timer = timer or StartupTimer()
+
+    async def probe_audio():
+        async with timer.step("audio devices"):
+            await asyncio.to_thread(_probe_audio_devices)
+
+    async def load_porcupine():
+        async with timer.step("porcupine"):
+            await wake_word_detector.load()
+
+    async def prepare_agent():
+        async with timer.step("voice agent"):
+            await voice_agent.prepare()
+
+    steps = [probe_audio()]
+    if wake_word_detector:
+        steps.append(load_porcupine())
+    if voice_agent:
+        steps.append(prepare_agent())
+
+    await asyncio.gather(*steps)
+    return timer.report()
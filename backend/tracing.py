@@ -0,0 +1,141 @@
+"""Pipeline stage timing for Marlene smart home assistant."""
+import logging
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from .metrics import Histogram, render_prometheus
+
+logger = logging.getLogger(__name__)
+
+# Each stage is timed from the stage it follows in the pipeline
+STAGES: Dict[str, str] = {
+    # Agent connection handshake (may happen ahead of the wake word)
+    "websocket_connected": "connect_started",
+    "welcome": "websocket_connected",
+    "settings_applied": "welcome",
+    # Wake word to a usable session
+    "session_ready": "wake_word",
+    # One conversational turn
+    "user_text": "user_started_speaking",
+    "function_call": "user_text",
+    "device_response": "function_call",
+    "agent_started_speaking": "user_text",
+    "first_audio": "agent_started_speaking",
+    "agent_audio_done": "first_audio",
+}
+
+# End-to-end spans reported alongside the stages
+SPANS: Dict[str, Tuple[str, str]] = {
+    "turn_latency": ("user_text", "first_audio"),
+    "wake_to_ready": ("wake_word", "session_ready"),
+}
+
+
+class Tracer:
+    """
+    Timestamps pipeline stages and keeps a histogram per stage.
+
+    A stage is only timed when the stage it follows happened after its own
+    previous occurrence; repeated marks within a turn (several device
+    responses, audio resuming after an underrun) are ignored. Safe to call
+    from any thread.
+    """
+
+    def __init__(self):
+        self._marks: Dict[str, float] = {}
+        self._turn: List[Tuple[str, float]] = []
+        self.histograms: Dict[str, Histogram] = {}
+        self._lock = threading.Lock()
+
+    def mark(self, stage: str, at: Optional[float] = None):
+        """
+        Record that a stage was reached.
+
+        Args:
+            stage: Stage name, e.g. "user_text"
+            at: time.perf_counter() timestamp (defaults to now)
+        """
+        now = at if at is not None else time.perf_counter()
+        finished_turn = None
+        with self._lock:
+            previous = self._marks.get(stage)
+            base_stage = STAGES.get(stage)
+            base = self._marks.get(base_stage) if base_stage else None
+            if base_stage and previous is not None and (base is None or base <= previous):
+                # Repeat within the same cycle; keep the first timestamp
+                return
+            self._marks[stage] = now
+            if base is not None:
+                self._observe(stage, now - base)
+                for span, (start, end) in SPANS.items():
+                    if end == stage and start in self._marks and self._marks[start] <= base:
+                        self._observe(span, now - self._marks[start])
+
+            if stage == "user_started_speaking":
+                self._turn = [(stage, now)]
+            elif self._turn:
+                self._turn.append((stage, now))
+                if stage == "agent_audio_done":
+                    finished_turn, self._turn = self._turn, []
+        if finished_turn:
+            logger.info("Turn timeline: " + self._describe(finished_turn))
+
+    def observe(self, name: str, seconds: float):
+        """
+        Record a duration measured outside the stage pipeline.
+
+        Args:
+            name: Histogram name, e.g. "barge_in"
+            seconds: Measured duration
+        """
+        with self._lock:
+            self._observe(name, seconds)
+
+    def _observe(self, name: str, seconds: float):
+        if name not in self.histograms:
+            self.histograms[name] = Histogram(name)
+        self.histograms[name].observe(seconds)
+
+    @staticmethod
+    def _describe(turn: List[Tuple[str, float]]) -> str:
+        started = turn[0][1]
+        return ", ".join(f"{stage} +{(at - started) * 1000:.0f}ms" for stage, at in turn[1:])
+
+    def summary(self) -> Dict[str, Dict[str, float]]:
+        """Count plus estimated p50, p95 and max milliseconds for each stage."""
+        with self._lock:
+            histograms = list(self.histograms.values())
+        return {
+            histogram.name: {
+                "count": histogram.count,
+                "p50_ms": histogram.quantile(0.5) * 1000,
+                "p95_ms": histogram.quantile(0.95) * 1000,
+                "max_ms": histogram.max * 1000,
+            }
+            for histogram in histograms
+        }
+
+    def report(self):
+        """Log a table of stage latencies (terminal mode)."""
+        summary = self.summary()
+        if not summary:
+            return
+        order = list(STAGES) + list(SPANS)
+        lines = [f"{'stage':<24}{'n':>6}{'p50':>9}{'p95':>9}{'max':>9}"]
+        for name in sorted(summary, key=lambda name: order.index(name) if name in order else len(order)):
+            stats = summary[name]
+            lines.append(
+                f"{name:<24}{stats['count']:>6}{stats['p50_ms']:>7.0f}ms"
+                f"{stats['p95_ms']:>7.0f}ms{stats['max_ms']:>7.0f}ms"
+            )
+        logger.info("Pipeline latency:\n" + "\n".join(lines))
+
+    def render_prometheus(self) -> str:
+        """All metrics in the Prometheus text format."""
+        with self._lock:
+            histograms = dict(self.histograms)
+        return render_prometheus(histograms)
+
+
+# Shared by the whole process
+tracer = Tracer()
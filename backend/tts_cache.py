@@ -0,0 +1,172 @@
+"""On-disk cache of agent speech clips for Marlene smart home assistant."""
+import hashlib
+import logging
+import os
+import re
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+from .config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "marlene" / "tts"
+
+# Longer turns are not worth caching as a single phrase
+MAX_CLIP_SECONDS = 6.0
+
+
+def phrase_key(text: str) -> str:
+    """
+    Reduce a phrase to what the voice would actually say.
+
+    Examples:
+        "You got it!" -> "you got it"
+        "What's up dog?" -> "whats up dog"
+    """
+    return " ".join(re.findall(r"[a-z0-9]+", text.lower().replace("'", "")))
+
+
+class TTSClipCache:
+    """
+    Raw PCM clips of phrases the agent says often, keyed by (voice, text, sample rate).
+
+    Clips are recorded from the agent's own audio the first time a phrase is
+    heard and kept on disk across restarts. The least recently played clips
+    are evicted once the cache grows past max_bytes. Safe to use from any
+    thread.
+    """
+
+    def __init__(self, cache_dir: str = None, max_bytes: int = None, phrases: Iterable[str] = ()):
+        """
+        Initialize the cache.
+
+        Args:
+            cache_dir: Directory for clips (defaults to config, then ~/.cache/marlene/tts)
+            max_bytes: Disk budget (defaults to tts_cache_max_mb config)
+            phrases: Phrases worth recording, e.g. the greeting and confirmations
+        """
+        self.cache_dir = Path(cache_dir or settings.tts_cache_dir or DEFAULT_CACHE_DIR)
+        self.max_bytes = max_bytes if max_bytes is not None else settings.tts_cache_max_mb * 1024 * 1024
+        self.phrases = {phrase_key(phrase) for phrase in phrases} - {""}
+        self._sizes: Optional[Dict[Path, int]] = None
+        self._lock = threading.Lock()
+
+    def _path(self, voice: str, text: str, sample_rate: int) -> Path:
+        key = f"{voice}|{phrase_key(text)}|{sample_rate}"
+        return self.cache_dir / f"{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}.pcm"
+
+    def _index(self) -> Dict[Path, int]:
+        """Sizes of the clips on disk, scanned once."""
+        if self._sizes is None:
+            self._sizes = {}
+            if self.cache_dir.is_dir():
+                for path in self.cache_dir.glob("*.pcm"):
+                    self._sizes[path] = path.stat().st_size
+        return self._sizes
+
+    def wants(self, text: str) -> bool:
+        """Whether a phrase should be recorded."""
+        return phrase_key(text) in self.phrases
+
+    def has(self, voice: str, text: str, sample_rate: int) -> bool:
+        """Whether a clip is cached."""
+        with self._lock:
+            return self._path(voice, text, sample_rate) in self._index()
+
+    def get(self, voice: str, text: str, sample_rate: int) -> Optional[bytes]:
+        """
+        Load a clip and mark it as recently used.
+
+        Returns:
+            Raw PCM, or None if the phrase has not been recorded
+        """
+        path = self._path(voice, text, sample_rate)
+        with self._lock:
+            if path not in self._index():
+                return None
+            try:
+                pcm = path.read_bytes()
+                # The modification time doubles as the LRU timestamp
+                os.utime(path)
+            except OSError as e:
+                logger.warning(f"Could not read cached clip for '{text}': {e}")
+                self._index().pop(path, None)
+                return None
+        return pcm
+
+    def put(self, voice: str, text: str, sample_rate: int, pcm: bytes):
+        """Store a clip, evicting the least recently used ones if over budget."""
+        if not pcm or len(pcm) > self.max_bytes:
+            return
+        path = self._path(voice, text, sample_rate)
+        with self._lock:
+            try:
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                # Write to a temporary file so readers never see a partial clip
+                temp_path = path.with_suffix(f".{os.getpid()}.tmp")
+                temp_path.write_bytes(pcm)
+                os.replace(temp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not cache clip for '{text}': {e}")
+                return
+            sizes = self._index()
+            sizes[path] = len(pcm)
+            self._evict(keep=path)
+        logger.info(f"Cached speech clip for '{text}' ({len(pcm)} bytes)")
+
+    def _evict(self, keep: Path):
+        sizes = self._index()
+        total = sum(sizes.values())
+        if total <= self.max_bytes:
+            return
+        by_age = sorted(
+            (path for path in sizes if path != keep),
+            key=lambda path: path.stat().st_mtime if path.exists() else 0
+        )
+        for path in by_age:
+            if total <= self.max_bytes:
+                break
+            total -= sizes.pop(path)
+            path.unlink(missing_ok=True)
+            logger.debug(f"Evicted cached clip {path.name}")
+
+
+class ClipRecorder:
+    """
+    Collects the agent audio of one spoken turn so it can be cached.
+
+    Recording is abandoned if the turn gets too long or is interrupted, so
+    only complete clips reach the cache.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.texts = []
+        self._chunks = []
+        self._size = 0
+        self.abandoned = False
+
+    def add_text(self, text: str):
+        self.texts.append(text)
+
+    def add_audio(self, data: bytes):
+        if self.abandoned:
+            return
+        self._size += len(data)
+        if self._size > self.max_bytes:
+            self.abandon()
+            return
+        self._chunks.append(data)
+
+    def abandon(self):
+        self.abandoned = True
+        self._chunks.clear()
+
+    @property
+    def text(self) -> str:
+        return " ".join(self.texts)
+
+    @property
+    def audio(self) -> bytes:
+        return b"" if self.abandoned else b"".join(self._chunks)
@@ -1,99 +1,141 @@
 import asyncio
 import json
 import logging
-import os
-from dotenv import load_dotenv
+import time
 import websockets
-from pydub import AudioSegment
-from .voice_agent_config.settings import SETTINGS
+from .voice_agent_config.settings import AGENT_AUDIO_SAMPLE_RATE, GREETING, VOICE, build_settings
+from .agent_connection import AgentConnectionManager
+from .audio_capture import SAMPLE_WIDTH
+from .audio_encoder import create_encoder
 from .audio_player import AudioPlayer
 from .audio_manager import AudioManager
 from .config import settings
-from .voice_agent_config.smart_home_controller import control_smart_home
-
-load_dotenv()
-DEEPGRAM_API_KEY: str = os.getenv("DEEPGRAM_API_KEY")
+from .sound_cache import SoundCache
+from .tracing import tracer
+from .tts_cache import MAX_CLIP_SECONDS, ClipRecorder, TTSClipCache
+from .voice_agent_config.backends import active_backends, close_backends, warm_up_backends
+from .voice_agent_config.fast_path import match_command
+from .voice_agent_config.smart_home_controller import (
+    DEVICE_FUNCTIONS,
+    SmartHomeError,
+    resolve_command,
+)
 
 logger = logging.getLogger(__name__)
 
 class VoiceAgent:
     def __init__(self):
         self.connection = None
-        self.url = "wss://agent.deepgram.com/v1/agent/converse"
+        self.url = settings.deepgram_agent_url
         self._audio_player = None
         self._audio_manager = AudioManager()
-        self._mic_stream = None
+        self._mic_consumer = None
+        self._encoder = None
         self._is_running = False
-        
-        # Load power-off sound
-        power_off_path = os.path.join(
-            os.path.dirname(__file__),
-            "voice_agent_config",
-            "power-off.mp3"
+        # Device commands that outlive the message that started them
+        self._background_tasks: set = set()
+        self._agent_speaking = False
+        self._pending_notices: list = []
+        self._last_notice: str = None
+        # Command of the current user turn run by the local fast path
+        self._fast_command: dict = None
+        self._fast_result: asyncio.Task = None
+        self._fast_failed = False
+        self._mute_agent_audio = False
+        # Agent audio waiting for the player, tagged with the turn it belongs
+        # to; a separate task feeds it so playback never holds up the receive loop
+        self._agent_audio: asyncio.Queue = None
+        self._agent_audio_generation = 0
+        # Capture positions (start, end) the cached greeting plays over
+        self._greeting_window: tuple = None
+        self._connections = AgentConnectionManager(
+            self.url, settings.deepgram_api_key, self._build_settings
         )
-        try:
-            # Load and decode MP3 to raw PCM audio
-            audio = AudioSegment.from_mp3(power_off_path)
-            # Convert to the format expected by AudioPlayer (16-bit PCM, mono/stereo)
-            audio = audio.set_frame_rate(settings.audio_output_rate)
-            audio = audio.set_channels(settings.audio_channels)
-            audio = audio.set_sample_width(2)  # 16-bit audio
-            self._power_off_audio = audio.raw_data
-            logger.info(f"Loaded power-off sound ({len(self._power_off_audio)} bytes)")
-        except Exception as e:
-            logger.warning(f"Failed to load power-off sound: {e}")
-            self._power_off_audio = None
+        # UI sounds are decoded once, cached on disk and loaded on first use
+        self._sounds = SoundCache()
+        # Greeting and confirmation speech, recorded from the agent the first time
+        self._clips = TTSClipCache(phrases=[GREETING, *settings.tts_cache_phrases]) if settings.tts_cache_enabled else None
+        self._recorder: ClipRecorder = None
 
-    async def listen(self, inactivity_timeout: int = 10):
+    async def listen(self, inactivity_timeout: int = 10, start_position: int = None):
         """
         Establishes a websocket connection to Deepgram Agent API,
         sends microphone audio, and processes incoming responses.
         
+        Audio captured while the connection is being set up is kept and
+        flushed ahead of live audio once the agent settings are applied.
+        The connection itself may already be open (see AgentConnectionManager).
+        
         Args:
             inactivity_timeout: Seconds of inactivity before closing connection (default: 10)
+            start_position: Capture position to start sending from, e.g. right
+                after the wake word (defaults to the newest audio)
         """
         self._is_running = True
         self._inactivity_timeout = inactivity_timeout
+        self._agent_speaking = False
+        self._pending_notices.clear()
+        self._reset_fast_path()
+        self._greeting_window = None
+        session = None
+        playback = None
+        
+        # Subscribe before connecting so speech during the handshake is kept
+        # Chunks are encoded on the capture thread and delivered on this loop
+        capture = self._audio_manager.get_capture()
+        self._encoder = create_encoder(settings.audio_upstream_encoding, capture.sample_rate)
+        self._mic_consumer = capture.subscribe_async(start_position, transform=self._encoder.encode)
+        
+        # Open the smart home connection while the user is still talking
+        self._spawn(warm_up_backends())
         
         try:
-            headers = {
-                "Authorization": f"Token {DEEPGRAM_API_KEY}"
-            }
+            # Start the audio player first so a cached greeting plays while connecting
+            self._audio_player = AudioPlayer()
+            self._audio_player.start()
+            self._agent_audio = asyncio.Queue()
+            playback = asyncio.create_task(self._play_agent_audio_task())
+            greeting_played = await self._play_cached_greeting()
             
-            async with websockets.connect(self.url, additional_headers=headers) as websocket:
-                self.connection = websocket
-                logger.info(f"Connected to Deepgram Agent API (inactivity timeout: {inactivity_timeout}s)")
-                
-                # Start the audio player for playback
-                self._audio_player = AudioPlayer()
-                self._audio_player.start()
-                
-                # Set up microphone input stream
-                device_index = self._audio_manager.get_device_index()
-                detected_rate = self._audio_manager.get_device_sample_rate(device_index)
-                self._mic_stream = self._audio_manager.open_input_stream(
-                    device_index=device_index,
-                    rate=detected_rate,
-                    chunk_size=settings.audio_chunk_size,
-                    channels=settings.audio_channels
-                )
-                logger.info(f"Microphone stream opened (rate: {detected_rate}Hz)")
-                
-                # Run send and receive tasks concurrently
-                await asyncio.gather(
-                    self._send_audio_task(),
-                    self._receive_messages_task()
-                )
+            # Get a session with settings already applied
+            session = await self._connections.acquire()
+            tracer.mark("session_ready")
+            self.connection = session.websocket
+            logger.info(f"Connected to Deepgram Agent API (inactivity timeout: {inactivity_timeout}s)")
+            
+            # A session opened before the greeting was cached still speaks it
+            if greeting_played and session.settings_message.get("agent", {}).get("greeting"):
+                logger.info("Muting the agent's greeting, it was already played")
+                self._mute_agent_audio = True
+            
+            # Replay anything the session received before it was handed over
+            for message in session.pending_messages:
+                await self._handle_message(message)
+            
+            # Run send and receive tasks concurrently
+            await asyncio.gather(
+                self._send_audio_task(),
+                self._receive_messages_task()
+            )
 
         except Exception as e:
             logger.error(f"Error in listen: {e}")
             raise
         finally:
             self._is_running = False
-            # Clean up microphone stream
-            if self._mic_stream:
-                self._audio_manager.close_stream(self._mic_stream)
-                self._mic_stream = None
+            if session:
+                await self._connections.release(session)
+            self.connection = None
+            # Release the microphone capture
+            self._log_upstream_stats()
+            for backend in active_backends():
+                if backend.latency.count:
+                    logger.info(f"Smart home latency {backend.latency.describe()}")
+            if self._mic_consumer:
+                self._mic_consumer.close()
+                self._mic_consumer = None
+            if playback:
+                playback.cancel()
             # Stop audio player
             if self._audio_player:
                 self._audio_player.stop()
@@ -107,16 +149,17 @@ class VoiceAgent:
         """
         logger.debug("Starting audio send task")
         
+        await self._flush_preroll()
+        
         while self._is_running and self.connection:
             try:
-                # Read audio chunk from microphone (blocking, so use thread)
-                audio_data = await asyncio.to_thread(
-                    self._mic_stream.read,
-                    settings.audio_chunk_size,
-                    exception_on_overflow=False
-                )
+                # Wait for the next encoded chunk pushed by the capture thread
+                audio_data = await self._mic_consumer.get()
+                if audio_data is None:
+                    logger.info("Send task: microphone capture stopped")
+                    break
                 
-                # Send raw audio bytes to Deepgram
+                # Send encoded audio bytes to Deepgram
                 await self.connection.send(audio_data)
                 
             except websockets.exceptions.ConnectionClosed:
@@ -126,6 +169,67 @@ class VoiceAgent:
                 logger.error(f"Send task error: {e}")
                 break
     
+    async def _flush_preroll(self):
+        """
+        Send audio buffered since the session started, faster than real time.
+        
+        Audio captured while the cached greeting played is left out, since
+        the microphone heard the greeting rather than the user.
+        """
+        capture = self._audio_manager.get_capture()
+        max_frames = int(settings.audio_preroll_seconds * capture.sample_rate)
+        skipped = self._mic_consumer.limit_backlog(max_frames)
+        if skipped:
+            logger.debug(f"Dropped {skipped / capture.sample_rate:.2f}s of audio beyond the pre-roll")
+        
+        flush_frames = settings.audio_chunk_size * 8
+        sent_frames = 0
+        try:
+            while self._is_running and self.connection:
+                backlog = self._mic_consumer.available_frames
+                if self._greeting_window:
+                    until_greeting = self._greeting_window[0] - self._mic_consumer.position
+                    backlog = min(backlog, until_greeting // SAMPLE_WIDTH)
+                if backlog < settings.audio_chunk_size:
+                    break
+                # Audio is already buffered, so this read does not block
+                frames = min(backlog, flush_frames)
+                audio_data = await asyncio.to_thread(self._read_encoded, frames)
+                if audio_data is None:
+                    break
+                await self.connection.send(audio_data)
+                sent_frames += frames
+        except websockets.exceptions.ConnectionClosed:
+            return
+        
+        if sent_frames:
+            logger.info(f"Flushed {sent_frames / capture.sample_rate * 1000:.0f}ms of pre-roll audio")
+        if self._greeting_window:
+            self._mic_consumer.skip_to(self._greeting_window[1])
+    
+    def _read_encoded(self, num_frames: int):
+        """Read buffered microphone audio and encode it for upload (runs in a worker thread)."""
+        audio_data = self._mic_consumer.read(num_frames)
+        if audio_data is None:
+            return None
+        return self._encoder.encode(audio_data)
+    
+    def _log_upstream_stats(self):
+        """Log upstream bandwidth savings and capture queue health for this session."""
+        if not self._encoder or not self._encoder.frames:
+            return
+        stats = self._encoder.stats()
+        logger.info(
+            f"Upstream audio ({stats['encoding']}): {stats['bytes_out']} bytes sent, "
+            f"{stats['bytes_per_second_saved'] / 1000:.1f} kB/s saved, "
+            f"{stats['encode_ms_per_frame']:.3f} ms encode per frame"
+        )
+        if self._mic_consumer and self._mic_consumer.overflows:
+            logger.warning(
+                f"Mic queue overflowed {self._mic_consumer.overflows} times "
+                f"({self._mic_consumer.recoveries} recovered from the capture buffer)"
+            )
+    
     async def _receive_messages_task(self):
         """
         Receives and processes messages from the websocket.
@@ -141,24 +245,7 @@ class VoiceAgent:
                     self.connection.recv(),
                     timeout=self._inactivity_timeout
                 )
-                
-                # Handle different message types
-                if isinstance(message, bytes):
-                    # Binary message (audio data) - play through speaker
-                    if self._audio_player:
-                        self._audio_player.play(message)
-                elif isinstance(message, str):
-                    # Text message - try to parse as JSON
-                    try:
-                        parsed = json.loads(message)
-                        await self._handle_json_message(parsed)
-                    except json.JSONDecodeError:
-                        # Plain text message
-                        logger.debug(f"Text message received: {message}")
-                else:
-                    # Unknown message type
-                    logger.warning(f"Unknown message type: {type(message)}")
-                    logger.warning(f"Content: {message}")
+                await self._handle_message(message)
             
             except asyncio.TimeoutError:
                 logger.info(f"No messages received for {self._inactivity_timeout}s, closing connection")
@@ -172,72 +259,363 @@ class VoiceAgent:
                 logger.error(f"Receive task error: {e}")
                 break
     
+    async def _handle_message(self, message):
+        """Dispatch a websocket message from Deepgram by its type."""
+        if isinstance(message, bytes):
+            if self._clips:
+                self._turn_recorder().add_audio(message)
+            # Binary message (audio data) - play through speaker, unless it
+            # was already played locally (cached greeting or fast path)
+            if self._audio_player and not self._mute_agent_audio:
+                self._agent_audio.put_nowait((self._agent_audio_generation, message))
+        elif isinstance(message, str):
+            # Text message - try to parse as JSON
+            try:
+                parsed = json.loads(message)
+                await self._handle_json_message(parsed)
+            except json.JSONDecodeError:
+                # Plain text message
+                logger.debug(f"Text message received: {message}")
+        else:
+            # Unknown message type
+            logger.warning(f"Unknown message type: {type(message)}")
+            logger.warning(f"Content: {message}")
+    
+    async def _play_agent_audio_task(self):
+        """
+        Feed agent audio to the player as it makes room.
+        
+        Waiting for the jitter buffer happens here rather than in the receive
+        loop, so control messages such as UserStartedSpeaking are handled as
+        soon as they arrive. Audio queued before an interruption is dropped.
+        """
+        while True:
+            generation, audio = await self._agent_audio.get()
+            if generation != self._agent_audio_generation or not self._audio_player:
+                continue
+            if audio is None:
+                self._audio_player.end_of_stream()
+            else:
+                await self._audio_player.play_async(audio)
+    
+    def _interrupt_agent_audio(self):
+        """Drop queued agent audio and silence the player."""
+        self._agent_audio_generation += 1
+        if self._agent_audio:
+            while not self._agent_audio.empty():
+                self._agent_audio.get_nowait()
+        if self._audio_player:
+            self._audio_player.clear()
+    
     async def _handle_json_message(self, parsed: dict):
         """Handle parsed JSON messages from Deepgram."""
         msg_type = parsed.get("type", "unknown")
         
-        if msg_type == "Welcome":
-            logger.info("Welcome message received, sending SETTINGS")
-            asyncio.create_task(self._send_settings())
-        elif msg_type == "SettingsApplied":
+        if msg_type == "SettingsApplied":
             logger.info("Settings applied successfully")
         elif msg_type == "UserStartedSpeaking":
             logger.info("User started speaking")
+            tracer.mark("user_started_speaking")
             # Interrupt agent audio immediately
-            if self._audio_player:
-                self._audio_player.clear()
+            self._interrupt_agent_audio()
+            self._mute_agent_audio = False
+            if self._recorder:
+                self._recorder.abandon()
         elif msg_type == "AgentStartedSpeaking":
             logger.info("Agent started speaking")
+            tracer.mark("agent_started_speaking")
+            self._agent_speaking = True
         elif msg_type == "ConversationText":
             role = parsed.get("role", "unknown")
             content = parsed.get("content", "")
             logger.info(f"[{role}]: {content}")
+            if role == "assistant" and self._clips:
+                self._turn_recorder().add_text(content)
+            if role == "user":
+                tracer.mark("user_text")
+                # The agent's next turn starts after this; drop any interrupted recording
+                self._recorder = None
+                if settings.fast_path_enabled:
+                    self._start_fast_path(content)
         elif msg_type == "AgentAudioDone":
             logger.info("Agent finished speaking")
+            tracer.mark("agent_audio_done")
+            if self._audio_player:
+                # Ends the utterance once the audio queued before it has played
+                self._agent_audio.put_nowait((self._agent_audio_generation, None))
+            self._agent_speaking = False
+            self._mute_agent_audio = False
+            self._finish_recording()
+            # Deliver failure notices that arrived while the agent was talking
+            if self._pending_notices:
+                self._spawn(self._send_pending_notices())
         elif msg_type == "AgentThinking":
             logger.info("Agent is thinking, here are its thoughts:")
             logger.info(parsed.get("content", ""))
             asyncio.create_task(self._inject_agent_message())
         elif msg_type == "FunctionCallRequest":
-            functions = parsed.get("functions", [])
-            if len(functions) > 1:
-                raise NotImplementedError(
-                    "Multiple functions not supported"
+            tracer.mark("function_call")
+            calls = [(function, self._parse_arguments(function)) for function in parsed.get("functions", [])]
+            if self._fast_command and calls:
+                # Mute only the reply to the call the fast path answers (and
+                # not if the command failed); any other reply is about
+                # something the fast path did not do
+                matched = all(
+                    self._matches_fast_command(function.get("name"), parameters) for function, parameters in calls
                 )
-            function_name = functions[0].get("name")
-            function_call_id = functions[0].get("id")
-            parameters = json.loads(functions[0].get("arguments", {}))
-            if function_name == "control_smart_home":
-                await control_smart_home(parameters)
-            elif function_name == "end_conversation":
-                logger.info(f"End conversation function called. Parameters: {parameters}")
-                asyncio.create_task(self.close())
-                return # Need to return here so that you can stop the loop.
-            else:
-                pass
-            function_call_response = {
-                "type": "FunctionCallResponse",
-                "name": function_name,
-                "id": function_call_id,
-                "content": "The function call was successful."
-            }
-            asyncio.create_task(self._send_function_call_response(function_call_response))
+                self._mute_agent_audio = matched and not self._fast_failed
+            # Never block the receive loop (and agent audio) on device I/O
+            self._spawn(self._handle_function_call_request(calls))
+        elif msg_type == "InjectionRefused":
+            # The agent was busy; retry the last failure notice once it stops talking
+            logger.info("Agent refused injected message, will retry")
+            if self._last_notice:
+                self._pending_notices.insert(0, self._last_notice)
+                self._last_notice = None
         else:
             # Log other message types
             logger.debug(f"{msg_type}: {json.dumps(parsed, indent=2)}")
     
-    async def _send_settings(self):
-        """Send settings configuration to Deepgram."""
-        if self.connection:
-            await self.connection.send(json.dumps(SETTINGS))
-            logger.debug("SETTINGS sent successfully")
-
+    def _reset_fast_path(self):
+        """Forget the fast path command of the previous turn."""
+        self._fast_command = None
+        self._fast_result = None
+        self._fast_failed = False
+        self._mute_agent_audio = False
+    
+    def _start_fast_path(self, text: str):
+        """
+        Run a simple device command from the user's words without waiting for the LLM.
+        
+        The agent still handles the turn as usual; its control_smart_home
+        call is answered with this result. The agent's audio is muted from
+        before the command is sent, since the confirmation sound covers the
+        reply, until the agent's reply to that call is done. It is unmuted
+        as soon as the command fails or the agent asks for something else.
+        """
+        self._reset_fast_path()
+        parameters = match_command(text)
+        if not parameters:
+            return
+        logger.info(f"Fast path: {parameters.get('device')} -> {parameters.get('action')}")
+        self._fast_command = parameters
+        self._mute_agent_audio = True
+        self._fast_result = self._spawn(self._run_fast_command(parameters))
+    
+    async def _run_fast_command(self, parameters: dict) -> str:
+        """Execute a fast path command and confirm success with a sound."""
+        started = time.perf_counter()
+        try:
+            content = await self._execute_command(DEVICE_FUNCTIONS["control_smart_home"], parameters)
+        except SmartHomeError as e:
+            # Let the agent's reply through so it can explain the failure
+            logger.warning(f"Fast path command failed: {e}")
+            if self._fast_command is parameters:
+                self._fast_failed = True
+                self._mute_agent_audio = False
+            return f"Failed: {e}."
+        logger.info(f"Fast path: {content} in {(time.perf_counter() - started) * 1000:.0f}ms")
+        if self._fast_command is parameters:
+            await self._play_confirmation()
+        return content
+    
+    async def _play_confirmation(self):
+        """Say the cached confirmation phrase, or chime if it has not been recorded yet."""
+        clip = None
+        if self._clips:
+            clip = await asyncio.to_thread(
+                self._clips.get, VOICE, settings.fast_path_confirmation, AGENT_AUDIO_SAMPLE_RATE
+            )
+        if clip and self._audio_player:
+            await self._audio_player.play_async(clip)
+            self._audio_player.end_of_stream()
+        else:
+            await self._play_sound("confirm")
+    
+    def _matches_fast_command(self, function_name: str, parameters: dict) -> bool:
+        """Whether a function call asks for what the fast path already did this turn."""
+        if function_name != "control_smart_home" or not self._fast_result:
+            return False
+        try:
+            requested = resolve_command(parameters)
+        except SmartHomeError:
+            return False
+        return all(requested.get(key) == value for key, value in self._fast_command.items())
+    
+    async def _play_sound(self, name: str):
+        """Play a cached UI sound through the current session's player."""
+        sound = await asyncio.to_thread(self._sounds.get, name)
+        if sound and self._audio_player:
+            await self._audio_player.play_async(sound)
+            self._audio_player.end_of_stream()
+    
+    def _build_settings(self) -> dict:
+        """Settings for a new session; the greeting is left out when it can be played locally."""
+        cached = self._clips is not None and self._clips.has(VOICE, GREETING, AGENT_AUDIO_SAMPLE_RATE)
+        return build_settings(greeting=not cached)
+    
+    async def _play_cached_greeting(self) -> bool:
+        """
+        Play the recorded greeting right away, unless the user kept talking
+        after the wake word.
+        
+        The microphone hears the greeting too, so the window it plays over
+        is remembered and left out of the pre-roll (see _flush_preroll).
+        
+        Returns:
+            Whether the greeting was played
+        """
+        if not self._clips:
+            return False
+        clip = await asyncio.to_thread(self._clips.get, VOICE, GREETING, AGENT_AUDIO_SAMPLE_RATE)
+        if not clip or not self._audio_player:
+            return False
+        if self._mic_consumer.backlog_rms() >= settings.vad_energy_threshold:
+            logger.info("User is still talking after the wake word, skipping the cached greeting")
+            return False
+        logger.info("Playing cached greeting")
+        capture = self._audio_manager.get_capture()
+        started = capture.position
+        await self._audio_player.play_async(clip)
+        self._audio_player.end_of_stream()
+        remaining = self._audio_player.buffered_ms / 1000 + self._audio_player.output_latency
+        ended = capture.position + int(remaining * capture.sample_rate) * SAMPLE_WIDTH
+        self._greeting_window = (started, ended)
+        return True
+    
+    def _turn_recorder(self) -> ClipRecorder:
+        """Recorder for the agent's current spoken turn, started on first use."""
+        if self._recorder is None:
+            self._recorder = ClipRecorder(int(MAX_CLIP_SECONDS * AGENT_AUDIO_SAMPLE_RATE * 2))
+        return self._recorder
+    
+    def _finish_recording(self):
+        """Cache the turn's audio if it was a phrase worth keeping."""
+        recorder, self._recorder = self._recorder, None
+        if not recorder or not self._clips or not self._clips.wants(recorder.text):
+            return
+        audio = recorder.audio
+        if audio and not self._clips.has(VOICE, recorder.text, AGENT_AUDIO_SAMPLE_RATE):
+            self._spawn(asyncio.to_thread(self._clips.put, VOICE, recorder.text, AGENT_AUDIO_SAMPLE_RATE, audio))
+    
+    def _spawn(self, coro) -> asyncio.Task:
+        """Run a coroutine in the background, keeping a reference until it finishes."""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+        return task
+    
+    async def _handle_function_call_request(self, calls: list):
+        """Run every requested function at once; each answers as soon as it finishes."""
+        started = time.perf_counter()
+        await asyncio.gather(*(self._run_function_call(function, parameters) for function, parameters in calls))
+        if len(calls) > 1:
+            logger.info(
+                f"Ran {len(calls)} function calls concurrently in "
+                f"{(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+    
+    @staticmethod
+    def _parse_arguments(function: dict) -> dict:
+        """Parameters of a requested function, or {} if they are not valid JSON."""
+        try:
+            return json.loads(function.get("arguments") or "{}")
+        except json.JSONDecodeError:
+            logger.warning(f"Invalid arguments for {function.get('name')}: {function.get('arguments')}")
+            return {}
+    
+    async def _run_function_call(self, function: dict, parameters: dict):
+        """
+        Execute one function from a FunctionCallRequest and send its response.
+        
+        Args:
+            function: Entry from the request's "functions" list
+            parameters: Its parsed arguments
+        """
+        function_name = function.get("name")
+        function_call_id = function.get("id")
+        
+        if function_name == "end_conversation":
+            logger.info(f"End conversation function called. Parameters: {parameters}")
+            asyncio.create_task(self.close())
+            return # No response needed, the connection is closing.
+        
+        device_function = DEVICE_FUNCTIONS.get(function_name)
+        if self._matches_fast_command(function_name, parameters):
+            # Already running (or done) from the fast path
+            fast_result, self._fast_result = self._fast_result, None
+            content = await fast_result
+        elif device_function and settings.function_call_mode == "optimistic":
+            # Answer right away and let the command complete in the background
+            try:
+                device_function.validate(parameters)
+            except SmartHomeError as e:
+                content = f"Failed: {e}."
+            else:
+                self._spawn(self._complete_command(device_function, parameters))
+                content = device_function.describe(parameters)
+        elif device_function:
+            try:
+                content = await self._execute_command(device_function, parameters)
+            except SmartHomeError as e:
+                content = f"Failed: {e}."
+        else:
+            logger.warning(f"Unknown function called: {function_name}")
+            content = f"Unknown function: {function_name}."
+        
+        function_call_response = {
+            "type": "FunctionCallResponse",
+            "name": function_name,
+            "id": function_call_id,
+            "content": content
+        }
+        await self._send_function_call_response(function_call_response)
+    
+    async def _execute_command(self, device_function, parameters: dict) -> str:
+        """
+        Run a device function under function_call_timeout.
+        
+        Returns:
+            Result description
+        
+        Raises:
+            SmartHomeError: If the command failed or timed out
+        """
+        try:
+            return await asyncio.wait_for(
+                device_function.run(parameters),
+                timeout=settings.function_call_timeout
+            )
+        except asyncio.TimeoutError:
+            raise SmartHomeError(
+                f"{parameters.get('device') or parameters.get('scene') or 'the device'} did not respond in time"
+            ) from None
+    
+    async def _complete_command(self, device_function, parameters: dict):
+        """Finish an optimistically answered command and report a failure to the user."""
+        try:
+            await self._execute_command(device_function, parameters)
+        except SmartHomeError as e:
+            notice = f"Sorry, that didn't work. {e}."
+            if not self.connection:
+                logger.warning(f"Command failed after the session ended: {e}")
+                return
+            self._pending_notices.append(notice)
+            if not self._agent_speaking:
+                await self._send_pending_notices()
+    
+    async def _send_pending_notices(self):
+        """Have the agent speak queued failure notices."""
+        while self._pending_notices and self.connection:
+            self._last_notice = self._pending_notices.pop(0)
+            await self._inject_agent_message(self._last_notice)
+    
     # I've built this but it doesn't come up very often in my testing. I just wanted to account for it.
-    async def _inject_agent_message(self):
-        """Inject agent message while agent is thinking."""
+    async def _inject_agent_message(self, message: str = "Hang on just a minute."):
+        """Inject agent message while agent is thinking, or to report a late failure."""
         inject_message = {
             "type": "InjectAgentMessage",
-            "message": "Hang on just a minute."
+            "message": message
         }
         if self.connection:
             await self.connection.send(json.dumps(inject_message))
@@ -252,15 +630,31 @@ class VoiceAgent:
     async def close(self):
         """Close the connection"""
         # Play power-off sound before closing
-        if self._audio_player and self._power_off_audio:
+        power_off_audio = await asyncio.to_thread(self._sounds.get, "power_off") if self._audio_player else None
+        if power_off_audio:
             logger.info("Playing power-off sound")
-            self._audio_player.play(self._power_off_audio)
-            # Wait for sound to finish playing (calculate duration based on audio length)
-            # Assuming 16-bit stereo at output_rate, bytes_per_second = rate * channels * 2
-            bytes_per_second = settings.audio_output_rate * settings.audio_channels * 2
-            duration = len(self._power_off_audio) / bytes_per_second
-            # Add small buffer to ensure sound finishes
-            await asyncio.sleep(duration + 0.5)
+            await self._audio_player.play_async(power_off_audio)
+            self._audio_player.end_of_stream()
+            # Wait for sound to finish playing, plus a small buffer to ensure it finishes
+            await asyncio.sleep(self._sounds.duration("power_off") + 0.5)
         
         if self.connection:
             await self.connection.close()
+
+    async def prepare(self):
+        """Load UI sounds and open a standby agent connection (if configured) ahead of the first session."""
+        await asyncio.to_thread(self._sounds.get, "power_off")
+        if settings.fast_path_enabled:
+            await asyncio.to_thread(self._sounds.get, "confirm")
+        await self._connections.start()
+
+    def on_voice_activity(self):
+        """Hint that the user may be about to speak to the agent."""
+        self._connections.speculate()
+
+    async def shutdown(self):
+        """Let in-flight device commands finish, then close connections."""
+        if self._background_tasks:
+            await asyncio.wait(self._background_tasks, timeout=settings.function_call_timeout)
+        await self._connections.close()
+        await close_backends()
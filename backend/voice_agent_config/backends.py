@@ -0,0 +1,320 @@
+"""Transports that deliver smart home commands to devices."""
+import abc
+import asyncio
+import itertools
+import json
+import logging
+import time
+from typing import Dict, List, Optional
+import httpx
+from ..config import settings
+from ..dispatcher import CommandDispatcher
+from ..metrics import get_latency_recorder
+from ..rate_limiter import HostRateLimiter
+from .utils import normalize_device_name
+
+logger = logging.getLogger(__name__)
+
+class BridgeError(Exception):
+    """The local bridge refused a command."""
+
+
+class SmartHomeBackend(abc.ABC):
+    """
+    One way of reaching devices.
+
+    Each backend has its own dispatcher, so a slow or failing backend does
+    not hold up or trip the circuit breaker of another.
+    """
+
+    name = "backend"
+
+    def __init__(self, dispatcher: CommandDispatcher):
+        self.dispatcher = dispatcher
+        self.latency = get_latency_recorder(self.name)
+
+    @abc.abstractmethod
+    async def send(self, endpoint: str, parameters: dict):
+        """
+        Make one attempt at a command.
+
+        Args:
+            endpoint: Trigger name, e.g. "living-room-lights-on"
+            parameters: control_smart_home parameters for a single device
+        """
+
+    def is_transient(self, error: Exception) -> bool:
+        """Whether a failed attempt is worth retrying."""
+        return False
+
+    async def wait_turn(self):
+        """Wait until another attempt may be sent."""
+
+    async def warm_up(self):
+        """Open connections ahead of the first command."""
+
+    async def close(self):
+        """Close connections."""
+
+
+class VoiceMonkeyBackend(SmartHomeBackend):
+    """Triggers Alexa routines through the VoiceMonkey cloud API."""
+
+    name = "voicemonkey"
+
+    def __init__(self, base_url: str = None):
+        super().__init__(CommandDispatcher(
+            "VoiceMonkey",
+            concurrency=settings.voicemonkey_max_concurrency,
+            max_pending=settings.voicemonkey_max_pending,
+            retries=settings.voicemonkey_retries,
+            retry_backoff=settings.voicemonkey_retry_backoff_ms / 1000,
+            hedge_after=settings.voicemonkey_hedge_after_ms / 1000,
+            breaker_threshold=settings.voicemonkey_breaker_threshold,
+            breaker_reset=settings.voicemonkey_breaker_reset
+        ))
+        self.base_url = base_url or settings.voicemonkey_base_url
+        self._rate_limiter = HostRateLimiter(settings.voicemonkey_rate_limit, settings.voicemonkey_burst)
+        # One pooled client, so commands reuse a warm TCP+TLS connection
+        self._client: Optional[httpx.AsyncClient] = None
+        self._last_request_at = 0.0
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """The pooled HTTP client, created on first use."""
+        if self._client is None or self._client.is_closed:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                timeout=settings.voicemonkey_timeout,
+                limits=httpx.Limits(
+                    max_connections=max(8, settings.voicemonkey_max_concurrency),
+                    max_keepalive_connections=4,
+                    keepalive_expiry=settings.http_keepalive_expiry
+                )
+            )
+        return self._client
+
+    async def send(self, endpoint: str, parameters: dict):
+        with self.latency.time():
+            response = await self.client.get(
+                "/trigger",
+                params={"token": settings.voicemonkey_api_token, "device": endpoint}
+            )
+        self._last_request_at = time.monotonic()
+        response.raise_for_status()
+
+    def is_transient(self, error: Exception) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500 or error.response.status_code == 429
+        return isinstance(error, httpx.TransportError)
+
+    async def wait_turn(self):
+        waited = await self._rate_limiter.acquire(self.base_url)
+        if waited:
+            logger.debug(f"Rate limited VoiceMonkey for {waited * 1000:.0f}ms")
+
+    async def warm_up(self):
+        """Open a connection, unless a pooled one is still fresh."""
+        if time.monotonic() - self._last_request_at < settings.http_keepalive_expiry / 2:
+            return
+        try:
+            started = time.perf_counter()
+            await self.client.head("/")
+            self._last_request_at = time.monotonic()
+            logger.debug(f"VoiceMonkey connection warmed in {(time.perf_counter() - started) * 1000:.0f}ms")
+        except httpx.HTTPError as e:
+            logger.debug(f"Could not warm VoiceMonkey connection: {e}")
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class LocalBridgeBackend(SmartHomeBackend):
+    """
+    Controls devices through a bridge on the LAN over one persistent TCP connection.
+
+    The protocol is JSON lines. Each command is sent as
+    {"id": 1, "endpoint": "kitchen-light-on", "device": "kitchen-light",
+    "action": "on", "color": null, "brightness": null} and answered with
+    {"id": 1, "ok": true} or {"id": 1, "ok": false, "error": "..."}.
+    Requests are matched to replies by id, so several can be in flight.
+    """
+
+    name = "local"
+
+    def __init__(self, host: str, port: int, timeout: float):
+        """
+        Initialize the backend (connects on first use).
+
+        Args:
+            host: Bridge host
+            port: Bridge TCP port
+            timeout: Seconds to wait for a connection or reply
+        """
+        # Retries reconnect after a dropped connection; hedging would only
+        # queue a duplicate on the same connection
+        super().__init__(CommandDispatcher(
+            "Local bridge",
+            concurrency=settings.local_bridge_max_concurrency,
+            max_pending=settings.local_bridge_max_pending,
+            retries=1,
+            retry_backoff=0.05,
+            hedge_after=0,
+            breaker_threshold=settings.local_bridge_breaker_threshold,
+            breaker_reset=settings.local_bridge_breaker_reset
+        ))
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock = asyncio.Lock()
+        self._replies: Dict[int, asyncio.Future] = {}
+        self._ids = itertools.count(1)
+
+    @property
+    def connected(self) -> bool:
+        return self._writer is not None and not self._writer.is_closing()
+
+    async def _connect(self):
+        async with self._connect_lock:
+            if self.connected:
+                return
+            started = time.perf_counter()
+            reader, self._writer = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.port),
+                timeout=self.timeout
+            )
+            self._reader_task = asyncio.create_task(self._read_replies(reader, self._writer))
+            logger.info(
+                f"Connected to local bridge at {self.host}:{self.port} "
+                f"in {(time.perf_counter() - started) * 1000:.0f}ms"
+            )
+
+    async def _read_replies(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                try:
+                    reply = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Ignoring malformed bridge reply: {line[:80]!r}")
+                    continue
+                future = self._replies.pop(reply.get("id"), None)
+                if future and not future.done():
+                    future.set_result(reply)
+        except OSError as e:
+            logger.warning(f"Local bridge connection lost: {e}")
+        finally:
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+            for future in self._replies.values():
+                if not future.done():
+                    future.set_exception(ConnectionError("Local bridge connection closed"))
+            self._replies.clear()
+
+    async def send(self, endpoint: str, parameters: dict):
+        await self._connect()
+        request_id = next(self._ids)
+        reply = asyncio.get_running_loop().create_future()
+        self._replies[request_id] = reply
+        message = {
+            "id": request_id,
+            "endpoint": endpoint,
+            "device": normalize_device_name(parameters.get("device", "")),
+            "action": parameters.get("action"),
+            "color": parameters.get("color"),
+            "brightness": parameters.get("brightness"),
+        }
+        try:
+            with self.latency.time():
+                self._writer.write(json.dumps(message).encode() + b"\n")
+                await self._writer.drain()
+                result = await asyncio.wait_for(reply, timeout=self.timeout)
+        finally:
+            self._replies.pop(request_id, None)
+        if not result.get("ok"):
+            raise BridgeError(result.get("error") or "Command rejected")
+
+    def is_transient(self, error: Exception) -> bool:
+        # Covers timeouts and dropped connections (both OSError subclasses)
+        return isinstance(error, OSError)
+
+    async def warm_up(self):
+        try:
+            await self._connect()
+        except OSError as e:
+            logger.debug(f"Could not connect to local bridge: {e}")
+
+    async def close(self):
+        if self._reader_task:
+            self._reader_task.cancel()
+            self._reader_task = None
+        if self._writer:
+            self._writer.close()
+            self._writer = None
+
+
+_backends: Dict[str, SmartHomeBackend] = {}
+
+
+def _create_backend(name: str) -> SmartHomeBackend:
+    if name == "voicemonkey":
+        return VoiceMonkeyBackend()
+    if name == "local":
+        return LocalBridgeBackend(settings.local_bridge_host, settings.local_bridge_port, settings.local_bridge_timeout)
+    raise ValueError(f"Unknown smart home backend: {name}")
+
+
+def backend_name(device: str) -> str:
+    """Name of the backend configured for a device."""
+    key = normalize_device_name(device)
+    for configured, name in settings.smart_home_backends.items():
+        if normalize_device_name(configured) == key:
+            return name
+    return settings.smart_home_default_backend
+
+
+def get_backend(device: str) -> SmartHomeBackend:
+    """
+    Get the backend that controls a device, creating it on first use.
+
+    Raises:
+        ValueError: If the configured backend does not exist
+    """
+    name = backend_name(device)
+    if name not in _backends:
+        _backends[name] = _create_backend(name)
+    return _backends[name]
+
+
+def active_backends() -> List[SmartHomeBackend]:
+    """Backends that have been used so far."""
+    return list(_backends.values())
+
+
+async def warm_up_backends():
+    """
+    Connect every configured backend ahead of the first command.
+
+    Called when a voice session starts, so handshakes overlap with the
+    user speaking.
+    """
+    names = {settings.smart_home_default_backend, *settings.smart_home_backends.values()}
+    backends = []
+    for name in names:
+        try:
+            if name not in _backends:
+                _backends[name] = _create_backend(name)
+            backends.append(_backends[name])
+        except ValueError as e:
+            logger.warning(str(e))
+    await asyncio.gather(*(backend.warm_up() for backend in backends))
+
+
+async def close_backends():
+    """Close every backend's connections."""
+    for backend in list(_backends.values()):
+        await backend.close()
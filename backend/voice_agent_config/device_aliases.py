@@ -0,0 +1,131 @@
+"""Resolve the device names the agent sends to configured devices."""
+import difflib
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+from ..config import settings
+from .functions import DEVICE_LIST, GROUP_LIST
+
+logger = logging.getLogger(__name__)
+
+# Words that do not help tell devices apart
+STOP_WORDS = {"the", "a", "an", "my", "our", "of", "in", "please"}
+
+# Fuzzy scores (0-1) for a confident match and for a candidate
+MATCH_SCORE = 0.8
+CANDIDATE_SCORE = 0.5
+# A confident match must beat the next device by this much
+MATCH_MARGIN = 0.1
+
+
+def alias_key(name: str) -> str:
+    """
+    Reduce a device name or alias to comparable tokens.
+
+    Lowercases, drops punctuation and filler words, and strips plural "s",
+    so "the Kitchen Lights" and "kitchen light" give the same key.
+
+    Examples:
+        "JJ's Lamp" -> "jjs lamp"
+        "the overhead lights" -> "overhead light"
+    """
+    words = re.findall(r"[a-z0-9]+", name.lower().replace("'", ""))
+    tokens = [word for word in words if word not in STOP_WORDS]
+    return " ".join(token[:-1] if len(token) > 3 and token.endswith("s") else token for token in tokens)
+
+
+class DeviceMatch:
+    """Result of resolving a device name."""
+
+    def __init__(self, device: Optional[str], candidates: List[str]):
+        self.device = device
+        self.candidates = candidates
+
+
+class DeviceAliasIndex:
+    """
+    Precomputed index of device names and their aliases.
+
+    Exact key matches resolve straight away. Anything else is scored with
+    difflib against every name and alias; a clear winner resolves, otherwise
+    the closest devices are returned as candidates.
+    """
+
+    def __init__(self, devices: Iterable[str], aliases: Dict[str, List[str]] = None):
+        """
+        Build the index.
+
+        Args:
+            devices: Canonical device and group names
+            aliases: Canonical name -> other names the user may say
+        """
+        self.devices = list(devices)
+        self._entries: List[Tuple[str, str]] = []
+        self._exact: Dict[str, List[str]] = {}
+        for device in self.devices:
+            self._add(alias_key(device), device)
+        for device, names in (aliases or {}).items():
+            if device not in self.devices:
+                logger.warning(f"Ignoring aliases for unknown device: {device}")
+                continue
+            for name in names:
+                self._add(alias_key(name), device)
+
+    def _add(self, key: str, device: str):
+        if not key:
+            return
+        self._entries.append((key, device))
+        matches = self._exact.setdefault(key, [])
+        if device not in matches:
+            matches.append(device)
+
+    def resolve(self, name: str) -> DeviceMatch:
+        """
+        Resolve a device name.
+
+        Args:
+            name: Device name as sent by the agent
+
+        Returns:
+            DeviceMatch with the canonical device if confident, otherwise
+            device=None and up to three candidates (possibly none)
+        """
+        key = alias_key(name)
+        if key in self._exact:
+            matches = self._exact[key]
+            return DeviceMatch(matches[0] if len(matches) == 1 else None, matches[:3])
+
+        key_tokens = set(key.split())
+        scores: Dict[str, float] = {}
+        for entry, device in self._entries:
+            entry_tokens = set(entry.split())
+            overlap = len(key_tokens & entry_tokens) / len(key_tokens | entry_tokens) if key_tokens else 0.0
+            if key_tokens and key_tokens <= entry_tokens:
+                # A shortened name ("hallway" for "hallway light") is a strong hint
+                overlap = 0.6 + 0.4 * overlap
+            score = max(difflib.SequenceMatcher(None, key, entry).ratio(), overlap)
+            scores[device] = max(scores.get(device, 0.0), score)
+
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        candidates = [device for device, score in ranked if score >= CANDIDATE_SCORE][:3]
+        if ranked and ranked[0][1] >= MATCH_SCORE:
+            runner_up = ranked[1][1] if len(ranked) > 1 else 0.0
+            if ranked[0][1] - runner_up >= MATCH_MARGIN:
+                return DeviceMatch(ranked[0][0], candidates)
+        return DeviceMatch(None, candidates)
+
+
+@lru_cache(maxsize=1)
+def get_alias_index() -> DeviceAliasIndex:
+    """Get the index of configured devices, groups and aliases."""
+    return DeviceAliasIndex(DEVICE_LIST + GROUP_LIST, settings.smart_home_aliases)
+
+
+@lru_cache(maxsize=256)
+def resolve_device(name: str) -> DeviceMatch:
+    """Resolve a device name against the configured devices (cached)."""
+    match = get_alias_index().resolve(name)
+    if match.device and match.device != name:
+        logger.info(f"Resolved device '{name}' -> '{match.device}'")
+    return match
@@ -0,0 +1,196 @@
+"""Last known device state, used to skip redundant smart home triggers."""
+import asyncio
+import logging
+import time
+from typing import Dict, Optional
+from ..config import settings
+from .utils import normalize_device_name
+
+logger = logging.getLogger(__name__)
+
+
+class DeviceState:
+    """What we last told one device to do."""
+
+    def __init__(self, device: str):
+        self.device = device
+        self.power: Optional[str] = None
+        self.brightness: Optional[str] = None
+        self.color: Optional[str] = None
+        self.last_action: Optional[str] = None
+        self.updated_at = 0.0
+
+    @property
+    def age(self) -> float:
+        """Seconds since the last successful command."""
+        return time.monotonic() - self.updated_at
+
+    def to_dict(self) -> dict:
+        return {
+            "device": self.device,
+            "power": self.power,
+            "brightness": self.brightness,
+            "color": self.color,
+            "last_action": self.last_action,
+            "age_seconds": round(self.age, 1),
+        }
+
+
+class Command:
+    """A command that is being sent to a device."""
+
+    def __init__(self, key: str, parameters: dict):
+        self.key = key
+        self.parameters = parameters
+        self.done = asyncio.Event()
+
+
+class DeviceStateCache:
+    """
+    In-memory state of each device, keyed by normalized device name.
+
+    Only commands we sent successfully are recorded, and entries expire
+    after ttl seconds, since devices can also be switched by hand. Within
+    that window a command that would not change anything is skipped. So is
+    a command identical to one still being sent. A brightness change that
+    arrives while another command to the device is in flight waits, and is
+    dropped if any newer command to the device arrives first.
+    """
+
+    def __init__(self, ttl: float = None):
+        """
+        Initialize the cache.
+
+        Args:
+            ttl: Seconds a recorded state is trusted (defaults to config)
+        """
+        self.ttl = ttl if ttl is not None else settings.device_state_ttl
+        self._states: Dict[str, DeviceState] = {}
+        self._in_flight: Dict[str, Command] = {}
+        self._pending_brightness: Dict[str, object] = {}
+
+        # Triggers avoided
+        self.skipped = 0
+        self.coalesced = 0
+
+    def get(self, device: str) -> Optional[DeviceState]:
+        """Get a device's state if it has not expired."""
+        key = normalize_device_name(device)
+        state = self._states.get(key)
+        if state and state.age > self.ttl:
+            del self._states[key]
+            return None
+        return state
+
+    def is_redundant(self, parameters: dict) -> bool:
+        """
+        Whether a command would leave the device as it already is.
+
+        Args:
+            parameters: control_smart_home parameters for a single device
+        """
+        state = self.get(parameters.get("device", ""))
+        if not state:
+            return False
+        action = parameters.get("action")
+        if action in ("on", "off"):
+            redundant = state.power == action
+        elif action == "change brightness":
+            redundant = state.power == "on" and state.brightness == parameters.get("brightness")
+        elif action == "change color":
+            redundant = state.power == "on" and state.color == parameters.get("color")
+        else:
+            redundant = False
+        if redundant:
+            self.skipped += 1
+        return redundant
+
+    async def begin(self, parameters: dict) -> Optional[Command]:
+        """
+        Claim a device for a command that is about to be sent.
+
+        The first command to an idle device goes out at once. A brightness
+        change that arrives while the device has a command in flight waits
+        for it, and is only sent if no newer command arrived meanwhile.
+
+        Args:
+            parameters: control_smart_home parameters for a single device
+
+        Returns:
+            The claim to pass to finish() once the command is done, or None
+            if the command should be skipped
+        """
+        key = normalize_device_name(parameters.get("device", ""))
+        in_flight = self._in_flight.get(key)
+        # A brightness change still waiting must not go out after this command
+        self._pending_brightness.pop(key, None)
+        if in_flight and _same_effect(in_flight.parameters, parameters):
+            self.skipped += 1
+            return None
+        if in_flight and parameters.get("action") == "change brightness":
+            token = object()
+            self._pending_brightness[key] = token
+            await in_flight.done.wait()
+            if self._pending_brightness.get(key) is not token:
+                self.coalesced += 1
+                return None
+            del self._pending_brightness[key]
+        command = Command(key, parameters)
+        self._in_flight[key] = command
+        return command
+
+    def finish(self, command: Command):
+        """Release a device claimed by begin(), whether or not the command succeeded."""
+        if self._in_flight.get(command.key) is command:
+            del self._in_flight[command.key]
+        command.done.set()
+
+    def record(self, parameters: dict):
+        """Remember a command that was sent successfully."""
+        device = parameters.get("device", "")
+        key = normalize_device_name(device)
+        state = self._states.get(key) or DeviceState(device)
+        action = parameters.get("action")
+        if action in ("on", "off"):
+            state.power = action
+        elif action == "change brightness":
+            state.power = "on"
+            state.brightness = parameters.get("brightness")
+        elif action == "change color":
+            state.power = "on"
+            state.color = parameters.get("color")
+        state.last_action = action
+        state.updated_at = time.monotonic()
+        self._states[key] = state
+
+    def forget(self, device: str):
+        """Drop a device's state, e.g. after a failed command left it unknown."""
+        self._states.pop(normalize_device_name(device), None)
+
+    def snapshot(self) -> dict:
+        """All unexpired states plus skip counters, for the API."""
+        for key in list(self._states):
+            self.get(self._states[key].device)
+        return {
+            "ttl_seconds": self.ttl,
+            "skipped": self.skipped,
+            "coalesced": self.coalesced,
+            "in_flight": len(self._in_flight),
+            "devices": [state.to_dict() for state in self._states.values()],
+        }
+
+
+def _same_effect(first: dict, second: dict) -> bool:
+    """Whether two commands to one device would leave it in the same state."""
+    action = first.get("action")
+    if action != second.get("action"):
+        return False
+    if action == "change brightness":
+        return first.get("brightness") == second.get("brightness")
+    if action == "change color":
+        return first.get("color") == second.get("color")
+    return True
+
+
+# Shared by every command in the process
+device_states = DeviceStateCache()
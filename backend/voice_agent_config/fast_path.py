@@ -0,0 +1,160 @@
+"""Local grammar for simple device commands that do not need the LLM."""
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+from ..config import settings
+from .functions import DEVICE_LIST, FUNCTION_DEFINITIONS, GROUP_LIST
+
+# Colors recognised by the grammar; anything else goes to the LLM
+COLORS = [
+    "warm white", "cool white", "daylight", "white", "red", "orange", "yellow",
+    "green", "blue", "purple", "pink", "teal", "cyan", "magenta",
+]
+
+# Optional wake-up and politeness around a command
+PREFIX = r"(?:(?:hey |ok |okay )?marlene )?(?:(?:please|can you|could you|would you) )*"
+SUFFIX = r"(?: please)?"
+
+
+def normalize_utterance(text: str) -> str:
+    """
+    Lowercase and strip punctuation so text can be matched against the grammar.
+
+    Examples:
+        "Turn off JJ's lamp, please." -> "turn off jjs lamp please"
+        "Kitchen light to 50%" -> "kitchen light to 50 percent"
+    """
+    text = text.lower().replace("'", "").replace("%", " percent")
+    return " ".join(re.findall(r"[a-z0-9]+", text))
+
+
+def _device_key(name: str) -> str:
+    key = normalize_utterance(name)
+    return key[4:] if key.startswith("the ") else key
+
+
+class FastPathGrammar:
+    """
+    Compiled patterns for "turn on X", "X off", "set X to 40 percent" and
+    "make X blue", where X is a configured device, group or alias.
+
+    Only whole utterances match, so anything with more to it than a single
+    command is left to the LLM.
+    """
+
+    def __init__(
+        self,
+        devices: Iterable[str],
+        aliases: Dict[str, List[str]] = None,
+        actions: Iterable[str] = (),
+        brightness_levels: Iterable[str] = ()
+    ):
+        """
+        Compile the grammar.
+
+        Args:
+            devices: Canonical device and group names
+            aliases: Canonical name -> other names the user may say
+            actions: control_smart_home actions to recognise
+            brightness_levels: Allowed brightness values, e.g. "10" to "100"
+        """
+        self._devices: Dict[str, str] = {}
+        ambiguous = set()
+        names = [(device, device) for device in devices]
+        for device, others in (aliases or {}).items():
+            names.extend((other, device) for other in others)
+        for name, device in names:
+            key = _device_key(name)
+            if not key:
+                continue
+            if self._devices.get(key, device) != device:
+                ambiguous.add(key)
+            self._devices[key] = device
+        for key in ambiguous:
+            del self._devices[key]
+
+        self.brightness_levels = sorted(int(level) for level in brightness_levels)
+        self.actions = set(actions)
+        self._patterns = []
+        if not self._devices:
+            return
+
+        device = "(?:the )?(?P<device>" + "|".join(
+            re.escape(key) for key in sorted(self._devices, key=len, reverse=True)
+        ) + ")"
+        forms = []
+        if {"on", "off"} <= self.actions:
+            forms += [
+                rf"(?:turn|switch) (?P<power>on|off) {device}",
+                rf"(?:turn|switch) {device} (?P<power>on|off)",
+                rf"{device} (?P<power>on|off)",
+            ]
+        if "change brightness" in self.actions and self.brightness_levels:
+            level = r"(?P<brightness>\d{1,3})(?: percent)?"
+            forms += [
+                rf"(?:set|dim|brighten|turn|change) {device}(?: brightness)? (?:to|at) {level}",
+                rf"(?:set|change) (?:the )?brightness of {device} to {level}",
+                rf"{device} (?:to|at) {level}",
+            ]
+        if "change color" in self.actions:
+            color = "(?P<color>" + "|".join(re.escape(color) for color in COLORS) + ")"
+            forms += [
+                rf"(?:set|change|make|turn) {device}(?: color)? (?:to )?{color}",
+            ]
+        self._patterns = [re.compile(PREFIX + form + SUFFIX) for form in forms]
+
+    def match(self, text: str) -> Optional[dict]:
+        """
+        Parse an utterance.
+
+        Args:
+            text: What the user said
+
+        Returns:
+            control_smart_home parameters, or None if the utterance is not a
+            simple command
+        """
+        utterance = normalize_utterance(text)
+        for pattern in self._patterns:
+            found = pattern.fullmatch(utterance)
+            if not found:
+                continue
+            groups = found.groupdict()
+            parameters = {"device": self._devices[groups["device"]]}
+            if groups.get("power"):
+                parameters["action"] = groups["power"]
+            elif groups.get("brightness"):
+                level = self._brightness_level(int(groups["brightness"]))
+                if level is None:
+                    return None
+                parameters.update(action="change brightness", brightness=str(level))
+            else:
+                parameters.update(action="change color", color=groups["color"])
+            return parameters
+        return None
+
+    def _brightness_level(self, percent: int) -> Optional[int]:
+        """Nearest allowed brightness, or None if out of range."""
+        if not 0 < percent <= 100:
+            return None
+        return min(self.brightness_levels, key=lambda level: abs(level - percent))
+
+
+@lru_cache(maxsize=1)
+def get_grammar() -> FastPathGrammar:
+    """Get the grammar for the configured devices and the control_smart_home schema."""
+    properties = next(
+        definition["parameters"]["properties"] for definition in FUNCTION_DEFINITIONS
+        if definition["name"] == "control_smart_home"
+    )
+    return FastPathGrammar(
+        DEVICE_LIST + GROUP_LIST,
+        settings.smart_home_aliases,
+        properties["action"]["enum"],
+        properties["brightness"]["enum"]
+    )
+
+
+def match_command(text: str) -> Optional[dict]:
+    """Parse a simple device command from an utterance, or return None."""
+    return get_grammar().match(text)
@@ -1,14 +1,20 @@
 # Function definitions for Marlene Voice Agent
 # These functions are provided to the LLM to enable tool use
 
-import os
-from dotenv import load_dotenv
-
-load_dotenv()
+from ..config import settings
 
 # Load device list from .env (natural language format)
-devices_str = os.getenv("SMART_HOME_DEVICES", "")
-DEVICE_LIST = [d.strip() for d in devices_str.split(",") if d.strip()]
+DEVICE_LIST = [d.strip() for d in settings.smart_home_devices.split(",") if d.strip()]
+
+# Groups are offered as devices; scenes get their own function
+GROUP_LIST = list(settings.smart_home_groups)
+SCENE_LIST = list(settings.smart_home_scenes)
+
+# Other names for devices; the agent may pick these and they are resolved locally
+ALIAS_LIST = list(dict.fromkeys(
+    alias for aliases in settings.smart_home_aliases.values() for alias in aliases
+    if alias not in DEVICE_LIST and alias not in GROUP_LIST
+))
 
 FUNCTION_DEFINITIONS = [
     {
@@ -30,8 +36,11 @@ FUNCTION_DEFINITIONS = [
                     - 'JJ's Lamp' - Also: 'JJ's light', 'JJs lamp', 'the bedroom lamp'
                     
                     If the user's request is ambiguous (e.g., just says "the lamp" and multiple lamps exist), ask which specific device they mean before calling this function.
-                    Always select the exact device name from the enum, even if the user uses a variation.""",
-                    "enum": DEVICE_LIST
+                    Always select the exact device name from the enum, even if the user uses a variation. The enum also lists other names the user has set up for their devices; those are mapped to the right device for you.
+                    
+                    Some names are groups that control several devices at once: """ + (", ".join(GROUP_LIST) or "none") + """.
+                    Prefer a group over calling this function once per device (e.g., 'turn off all the lights').""",
+                    "enum": DEVICE_LIST + GROUP_LIST + ALIAS_LIST
                 },
                 "action": {
                     "type": "string",
@@ -83,3 +92,20 @@ FUNCTION_DEFINITIONS = [
         },
     },
 ]
+
+if SCENE_LIST:
+    FUNCTION_DEFINITIONS.append({
+        "name": "activate_scene",
+        "description": "Activate a scene, which sets several smart home devices at once. Use this when the user names a scene or mode (e.g., 'movie mode', 'good night').",
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "scene": {
+                    "type": "string",
+                    "description": "The scene to activate. Always select the exact scene name from the enum.",
+                    "enum": SCENE_LIST
+                }
+            },
+            "required": ["scene"]
+        }
+    })
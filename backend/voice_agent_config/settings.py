@@ -6,14 +6,12 @@ import os
 
 # Add parent directory to path to import backend modules
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..'))
-from backend.audio_manager import AudioManager
+from backend.config import settings
 
 VOICE = "aura-2-thalia-en"
 
-# Dynamically detect sample rate from audio input device
-_audio_manager = AudioManager()
-_device_index = _audio_manager.get_device_index()
-USER_AUDIO_SAMPLE_RATE = _audio_manager.get_device_sample_rate(_device_index)
+# Microphone audio comes from the shared capture, resampled to the configured rate
+USER_AUDIO_SAMPLE_RATE = settings.audio_rate
 
 USER_AUDIO_SECS_PER_CHUNK = 0.05
 USER_AUDIO_SAMPLES_PER_CHUNK = round(USER_AUDIO_SAMPLE_RATE * USER_AUDIO_SECS_PER_CHUNK)
@@ -23,7 +21,7 @@ AGENT_AUDIO_BYTES_PER_SEC = 2 * AGENT_AUDIO_SAMPLE_RATE
 
 AUDIO_SETTINGS = {
     "input": {
-        "encoding": "linear16",
+        "encoding": settings.audio_upstream_encoding,
         "sample_rate": USER_AUDIO_SAMPLE_RATE,
     },
     "output": {
@@ -40,17 +38,6 @@ LISTEN_SETTINGS = {
     }
 }
 
-THINK_SETTINGS = {
-    "provider": {
-        "type": "anthropic",
-        "model": "claude-3-5-haiku-latest"
-    },
-    "prompt": PROMPT.format(
-        current_date=datetime.now().strftime("%A, %B %d, %Y")
-    ),
-    "functions": FUNCTION_DEFINITIONS,
-}
-
 SPEAK_SETTINGS = {
     "provider": {
         "type": "deepgram",
@@ -58,12 +45,36 @@ SPEAK_SETTINGS = {
     }
 }
 
-AGENT_SETTINGS = {
-    "language": "en",
-    "listen": LISTEN_SETTINGS,
-    "think": THINK_SETTINGS,
-    "speak": SPEAK_SETTINGS,
-    "greeting": "What's up dog?",
-}
+GREETING = "What's up dog?"
+
 
-SETTINGS = {"type": "Settings", "audio": AUDIO_SETTINGS, "agent": AGENT_SETTINGS}
+def build_settings(greeting: bool = True) -> dict:
+    """
+    Build the agent Settings message.
+    
+    Built on demand rather than at import so the prompt carries the
+    current date, even in a long-running server.
+    
+    Args:
+        greeting: Have the agent speak GREETING; off when it is played
+            from the local clip cache instead
+    """
+    think_settings = {
+        "provider": {
+            "type": "anthropic",
+            "model": "claude-3-5-haiku-latest"
+        },
+        "prompt": PROMPT.format(
+            current_date=datetime.now().strftime("%A, %B %d, %Y")
+        ),
+        "functions": FUNCTION_DEFINITIONS,
+    }
+    agent_settings = {
+        "language": "en",
+        "listen": LISTEN_SETTINGS,
+        "think": think_settings,
+        "speak": SPEAK_SETTINGS,
+    }
+    if greeting:
+        agent_settings["greeting"] = GREETING
+    return {"type": "Settings", "audio": AUDIO_SETTINGS, "agent": agent_settings}
@@ -1,33 +1,43 @@
 import asyncio
 import logging
-import requests
-import os
-from dotenv import load_dotenv
+import time
+from typing import Awaitable, Callable, Dict, List
+import httpx
+from ..config import settings
+from ..dispatcher import CircuitOpenError, QueueFullError
+from ..metrics import get_latency_recorder, increment
+from ..tracing import tracer
+from .backends import BridgeError, get_backend
+from .device_aliases import resolve_device
+from .device_state import device_states
+from .functions import DEVICE_LIST
 from .utils import normalize_device_name
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-voice_monkey_token = os.getenv("VOICEMONKEY_API_TOKEN")
+# Metric label for devices that are not configured, so labels stay bounded
+UNKNOWN_DEVICE = "unknown"
+
+
+class SmartHomeError(Exception):
+    """A device command could not be carried out."""
 
-logger = logging.getLogger(__name__)
 
-async def control_smart_home(parameters):
+def build_endpoint(parameters: dict) -> str:
     """
-    Control smart home devices via VoiceMonkey API.
+    Validate a command and build its VoiceMonkey trigger name.
     
-    This function dynamically builds VoiceMonkey API endpoints based on the device name
-    and action provided. Device names are normalized to lowercase-hyphenated format.
+    Device names are normalized to lowercase-hyphenated format. This does no
+    I/O, so it can be used to reject a bad command before dispatching it.
     
     Args:
-        parameters: Dictionary containing:
-            - device: Natural language device name (e.g., "Living Room Lights")
-            - action: One of "on", "off", "change color", "change brightness"
-            - color: (optional) Color name for color changes
-            - brightness: (optional) Brightness percentage for brightness changes
+        parameters: control_smart_home parameters
     
-    Example:
-        Device: "Living Room Lights", Action: "on"
-        → API endpoint: "living-room-lights-on"
+    Returns:
+        Trigger name, e.g. "living-room-lights-on"
+    
+    Raises:
+        SmartHomeError: If the parameters are invalid
     """
     action = parameters.get("action")
     device = parameters.get("device")
@@ -36,43 +46,336 @@ async def control_smart_home(parameters):
     
     if not action or not device:
         logger.warning(f"Missing required parameters: device={device}, action={action}")
-        return
+        raise SmartHomeError(f"Missing required parameters: device={device}, action={action}")
     
     # Normalize device name to VoiceMonkey format
     normalized_device = normalize_device_name(device)
     
     # Build endpoint based on action
     if action == "on":
-        endpoint = f"{normalized_device}-on"
+        return f"{normalized_device}-on"
     elif action == "off":
-        endpoint = f"{normalized_device}-off"
+        return f"{normalized_device}-off"
     elif action == "change color":
-        endpoint = f"{normalized_device}-color"
         # Future enhancement: pass color parameter to VoiceMonkey
         # This would require VoiceMonkey to support color parameters in triggers
         if color:
             logger.debug(f"Color parameter received: {color}")
+        return f"{normalized_device}-color"
     elif action == "change brightness":
-        endpoint = f"{normalized_device}-brightness"
         # Future enhancement: pass brightness parameter to VoiceMonkey
         # This would require VoiceMonkey to support brightness parameters in triggers
         if brightness:
             logger.debug(f"Brightness parameter received: {brightness}%")
+        return f"{normalized_device}-brightness"
     else:
         logger.warning(f"Unknown action: {action}")
+        raise SmartHomeError(f"Unknown action: {action}")
+
+
+def expand_device(device: str) -> List[str]:
+    """
+    Resolve a device or group name to the devices it controls.
+    
+    Groups (smart_home_groups) may contain other groups.
+    
+    Args:
+        device: Device or group name
+        
+    Returns:
+        Device names, in order and without duplicates
+    
+    Raises:
+        SmartHomeError: If a group contains no devices
+    """
+    devices: List[str] = []
+    pending = [device]
+    seen = set()
+    while pending:
+        name = pending.pop(0)
+        if name in seen:
+            continue
+        seen.add(name)
+        if name in settings.smart_home_groups:
+            pending[:0] = settings.smart_home_groups[name]
+        else:
+            devices.append(name)
+    if not devices:
+        raise SmartHomeError(f"{device} has no devices in it")
+    return devices
+
+
+def resolve_command(parameters: dict) -> dict:
+    """
+    Replace the device the agent named with the configured device it means.
+    
+    Names that match nothing configured are passed through unchanged, since
+    VoiceMonkey may still have a trigger for them.
+    
+    Returns:
+        Parameters with the canonical device name
+    
+    Raises:
+        SmartHomeError: If the name could mean several devices, listing them
+    """
+    device = parameters.get("device")
+    if not device:
+        return parameters
+    match = resolve_device(device)
+    if match.device:
+        return {**parameters, "device": match.device}
+    if match.candidates:
+        options = ", ".join(match.candidates[:-1]) + " or " + match.candidates[-1] if len(match.candidates) > 1 else match.candidates[0]
+        raise SmartHomeError(f"'{device}' could be {options}; ask which one")
+    return parameters
+
+
+def validate_command(parameters: dict):
+    """
+    Check a control_smart_home call for every device it would trigger.
+    
+    Raises:
+        SmartHomeError: If the parameters are invalid
+    """
+    parameters = resolve_command(parameters)
+    for device in expand_device(parameters.get("device") or ""):
+        build_endpoint({**parameters, "device": device})
+        try:
+            get_backend(device)
+        except ValueError as e:
+            raise SmartHomeError(str(e)) from None
+
+
+def describe_command(parameters: dict) -> str:
+    """Describe a successful command for the agent, e.g. "Living Room Lights turned on"."""
+    parameters = resolve_command(parameters)
+    device = parameters.get("device")
+    action = parameters.get("action")
+    if action in ("on", "off"):
+        return f"{device} turned {action}"
+    return f"{device}: {action} sent"
+
+
+async def control_smart_home(parameters) -> str:
+    """
+    Control smart home devices via their configured backend (VoiceMonkey by default).
+    
+    This function dynamically builds VoiceMonkey API endpoints based on the device name
+    and action provided. The name is first resolved through the alias index,
+    and a group name is fanned out to all of its devices in parallel.
+    
+    Args:
+        parameters: Dictionary containing:
+            - device: Natural language device or group name (e.g., "Living Room Lights")
+            - action: One of "on", "off", "change color", "change brightness"
+            - color: (optional) Color name for color changes
+            - brightness: (optional) Brightness percentage for brightness changes
+    
+    Returns:
+        Result description for the agent, e.g. "Living Room Lights turned on"
+    
+    Raises:
+        SmartHomeError: If the parameters are invalid or VoiceMonkey fails
+    
+    Example:
+        Device: "Living Room Lights", Action: "on"
+        → API endpoint: "living-room-lights-on"
+    """
+    parameters = resolve_command(parameters)
+    device = parameters.get("device")
+    devices = expand_device(device or "")
+    if devices == [device]:
+        await _trigger(parameters)
+    else:
+        validate_command(parameters)
+        await _fan_out([{**parameters, "device": member} for member in devices])
+    return describe_command(parameters)
+
+
+async def _trigger(parameters: dict):
+    """
+    Send one device's command through its backend's dispatcher.
+    
+    Commands that would not change the device's known state, or that
+    repeat one already being sent, are skipped. A brightness change that
+    queues behind another command is dropped if a newer one follows it.
+    """
+    endpoint = build_endpoint(parameters)
+    device = parameters.get("device")
+    
+    if device_states.is_redundant(parameters):
+        logger.info(f"Skipping {endpoint}: {device} is already in that state")
         return
     
-    # Build API URL
-    url = f"https://api-v2.voicemonkey.io/trigger?token={voice_monkey_token}&device={endpoint}"
+    try:
+        backend = get_backend(device)
+    except ValueError as e:
+        raise SmartHomeError(str(e)) from None
+    command = await device_states.begin(parameters)
+    if command is None:
+        logger.info(f"Skipping {endpoint}: already being sent or superseded")
+        return
+    try:
+        await _send(backend, endpoint, parameters)
+    finally:
+        device_states.finish(command)
+
+
+def metric_device(device: str) -> str:
+    """
+    Get the metric label for a device.
+    
+    Names the agent made up are passed through to the backend, so only
+    configured devices get their own label; everything else is counted
+    under one "unknown" label.
+    """
+    if device in DEVICE_LIST:
+        return normalize_device_name(device)
+    return UNKNOWN_DEVICE
+
+
+async def _send(backend, endpoint: str, parameters: dict):
+    """Submit one command to a backend, recording the device's new state."""
+    device = parameters.get("device")
+    action = parameters.get("action")
+    label = metric_device(device)
+    device_latency = get_latency_recorder(f"device:{label}")
     
-    # Make API call
     try:
-        logger.info(f"Triggering VoiceMonkey: {endpoint}")
-        await asyncio.to_thread(requests.get, url, timeout=5)
+        logger.info(f"Triggering {backend.name}: {endpoint}")
+        try:
+            with device_latency.time():
+                await backend.dispatcher.submit(
+                    lambda: backend.send(endpoint, parameters),
+                    backend.is_transient,
+                    wait_turn=backend.wait_turn
+                )
+        finally:
+            tracer.mark("device_response")
         logger.info(f"Successfully triggered {device} -> {action}")
-    except requests.exceptions.Timeout:
-        logger.warning(f"Timeout controlling {device}: VoiceMonkey API took too long to respond")
-    except requests.exceptions.RequestException as e:
+        logger.debug(backend.latency.describe())
+    except CircuitOpenError:
+        logger.warning(f"Not controlling {device}: {backend.name} is failing, circuit open")
+        increment(f"device_errors:{label}")
+        raise SmartHomeError("The smart home service is not responding right now") from None
+    except QueueFullError:
+        logger.warning(f"Not controlling {device}: too many commands waiting")
+        increment(f"device_errors:{label}")
+        raise SmartHomeError("Too many commands are waiting, try again in a moment") from None
+    except (httpx.TimeoutException, TimeoutError):
+        logger.warning(f"Timeout controlling {device}: {backend.name} took too long to respond")
+        increment(f"device_errors:{label}")
+        device_states.forget(device)
+        raise SmartHomeError(f"{device} did not respond in time") from None
+    except (httpx.HTTPError, OSError) as e:
         logger.error(f"Error controlling {device}: {e}")
+        increment(f"device_errors:{label}")
+        device_states.forget(device)
+        raise SmartHomeError(f"Could not reach {device}") from e
+    except BridgeError as e:
+        logger.error(f"Local bridge rejected {endpoint}: {e}")
+        increment(f"device_errors:{label}")
+        device_states.forget(device)
+        raise SmartHomeError(f"Could not control {device}: {e}") from e
     except Exception as e:
         logger.error(f"Unexpected error controlling {device}: {e}")
+        increment(f"device_errors:{label}")
+        device_states.forget(device)
+        raise SmartHomeError(f"Could not control {device}") from e
+    device_states.record(parameters)
+
+
+async def _fan_out(commands: List[dict]):
+    """
+    Trigger several devices in parallel; the dispatcher limits how many are in flight.
+    
+    Raises:
+        SmartHomeError: Naming every device that failed
+    """
+    started = time.perf_counter()
+    results = await asyncio.gather(*(_trigger(command) for command in commands), return_exceptions=True)
+    failed = [
+        command.get("device") for command, result in zip(commands, results)
+        if isinstance(result, Exception)
+    ]
+    logger.info(
+        f"Fanned out {len(commands)} triggers in {(time.perf_counter() - started) * 1000:.0f}ms"
+        f" ({len(failed)} failed)"
+    )
+    if failed:
+        names = ", ".join(failed[:-1]) + " and " + failed[-1] if len(failed) > 1 else failed[0]
+        raise SmartHomeError(f"Could not control {names}")
+
+
+def scene_commands(scene: str) -> List[dict]:
+    """
+    Get the device commands of a scene, with groups expanded.
+    
+    Raises:
+        SmartHomeError: If the scene is not configured or controls nothing
+    """
+    if scene not in settings.smart_home_scenes:
+        raise SmartHomeError(f"Unknown scene: {scene}")
+    commands = []
+    for command in settings.smart_home_scenes[scene]:
+        for device in expand_device(command.get("device", "")):
+            commands.append({**command, "device": device})
+    if not commands:
+        raise SmartHomeError(f"{scene} has no devices in it")
+    return commands
+
+
+def validate_scene(parameters: dict):
+    """
+    Check an activate_scene call.
+    
+    Raises:
+        SmartHomeError: If the scene or any of its commands is invalid
+    """
+    for command in scene_commands(parameters.get("scene")):
+        build_endpoint(command)
+
+
+def describe_scene(parameters: dict) -> str:
+    """Describe a successful scene activation for the agent."""
+    return f"{parameters.get('scene')} activated"
+
+
+async def activate_scene(parameters: dict) -> str:
+    """
+    Run every command of a configured scene in parallel.
+    
+    Args:
+        parameters: Dictionary containing:
+            - scene: Scene name from smart_home_scenes
+    
+    Returns:
+        Result description for the agent
+    
+    Raises:
+        SmartHomeError: If the scene is invalid or any device fails
+    """
+    validate_scene(parameters)
+    await _fan_out(scene_commands(parameters.get("scene")))
+    return describe_scene(parameters)
+
+
+class DeviceFunction:
+    """How the voice agent runs, validates and describes one device function."""
+    
+    def __init__(
+        self,
+        run: Callable[[dict], Awaitable[str]],
+        validate: Callable[[dict], None],
+        describe: Callable[[dict], str]
+    ):
+        self.run = run
+        self.validate = validate
+        self.describe = describe
+
+
+# Agent functions that control devices, by function name
+DEVICE_FUNCTIONS: Dict[str, DeviceFunction] = {
+    "control_smart_home": DeviceFunction(control_smart_home, validate_command, describe_command),
+    "activate_scene": DeviceFunction(activate_scene, validate_scene, describe_scene),
+}
@@ -1,132 +1,233 @@
 """Wake word detection using Porcupine."""
 import asyncio
+import ctypes
 import logging
-import struct
+import math
+import threading
+import numpy as np
 import pvporcupine
 from typing import Callable, Optional, Awaitable
+from backend.audio_capture import CaptureConsumer
 from backend.audio_manager import AudioManager
 from backend.config import settings
-from dotenv import load_dotenv
-import os
+from backend.tracing import tracer
 
-load_dotenv()
+logger = logging.getLogger(__name__)
 
-PORCUPINE_ACCESS_KEY: str = os.getenv("PORCUPINE_ACCESS_KEY")
 
-logger = logging.getLogger(__name__)
+class PorcupineFrameProcessor:
+    """
+    Feeds Porcupine from a single preallocated frame buffer.
+    
+    Porcupine.process() takes a sequence of Python ints and copies it into a
+    new ctypes array on every call. Here the capture copies audio straight
+    into one reusable ctypes frame that is passed to the native library
+    as-is, and voice activity is measured on a NumPy view of the same
+    memory, so the per-frame path allocates nothing.
+    """
+    
+    def __init__(self, porcupine: pvporcupine.Porcupine):
+        """
+        Initialize the frame processor.
+        
+        Args:
+            porcupine: Initialized Porcupine instance
+        """
+        self.porcupine = porcupine
+        frame_length = porcupine.frame_length
+        self._buffer = bytearray(frame_length * 2)
+        self.frame_bytes = memoryview(self._buffer)
+        self.frame = (ctypes.c_short * frame_length).from_buffer(self._buffer)
+        self.samples = np.frombuffer(self._buffer, dtype=np.int16)
+        self._energy = np.empty(frame_length, dtype=np.float32)
+        self._result = ctypes.c_int()
+        self._result_ref = ctypes.byref(self._result)
+        
+        # Call the native function directly when this pvporcupine version exposes it
+        self._process_func = getattr(porcupine, "_process_func", None)
+        self._handle = getattr(porcupine, "_handle", None)
+        statuses = getattr(porcupine, "PicovoiceStatuses", None)
+        self._success = statuses.SUCCESS if statuses else None
+        if self._success is None:
+            self._process_func = None
+    
+    def process(self) -> int:
+        """Run Porcupine on the current frame and return the keyword index (-1 if none)."""
+        if self._process_func is None:
+            return self.porcupine.process(self.frame)
+        status = self._process_func(self._handle, self.frame, self._result_ref)
+        if status is not self._success:
+            # Let pvporcupine raise its own error for this status
+            return self.porcupine.process(self.frame)
+        return self._result.value
+    
+    def rms(self) -> float:
+        """Root mean square level of the current frame."""
+        np.copyto(self._energy, self.samples)
+        return math.sqrt(float(np.dot(self._energy, self._energy)) / len(self._energy))
+
 
 class WakeWordDetector:
     """Detects wake word using Porcupine picovoice."""
     
-    def __init__(self, on_wake_word: Callable[[], Awaitable[None]]):
+    def __init__(
+        self,
+        on_wake_word: Callable[[], Awaitable[None]],
+        on_voice_activity: Optional[Callable[[], None]] = None
+    ):
         """
         Initialize wake word detector.
         
         Args:
             on_wake_word: Async callback function to execute when wake word is detected
+            on_voice_activity: Optional callback when local voice activity starts
         """
         self.on_wake_word = on_wake_word
+        self.on_voice_activity = on_voice_activity
         self.audio_manager = AudioManager()
         self.porcupine: Optional[pvporcupine.Porcupine] = None
-        self.stream = None
+        self._consumer: Optional[CaptureConsumer] = None
         self.is_listening = False
         self._is_paused = False
-        self._device_index = None
+        self.last_detection_position: Optional[int] = None
+        self._voice_active = False
+        
+        # Capture and inference run on a worker thread; detections come back as events
+        self._worker: Optional[threading.Thread] = None
+        self._active = threading.Event()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._detections: Optional[asyncio.Queue] = None
         
     async def start(self):
-        """Start listening for wake word."""
+        """
+        Start listening for wake word.
+        
+        Porcupine runs on a dedicated worker thread. This coroutine only waits
+        for detection events and runs on_wake_word for each one, so the event
+        loop stays free while listening.
+        """
         if self.is_listening:
             logger.warning("Wake word detector already running")
             return
         
-        logger.info(f"Initializing Porcupine with keyword: '{settings.porcupine_keyword}'")
-        
-        # Initialize Porcupine (only if not already initialized)
-        if not self.porcupine:
-            try:
-                # self.porcupine = pvporcupine.create(
-                #     access_key=settings.porcupine_access_key,
-                #     keywords=[settings.porcupine_keyword],
-                #     sensitivities=[settings.porcupine_sensitivity]
-                # )
-                logger.debug(f"From Settings, file path = {settings.porcupine_keyword_file_path}")
-                self.porcupine = pvporcupine.create(
-                    access_key=PORCUPINE_ACCESS_KEY,
-                    keyword_paths=[settings.porcupine_keyword_file_path]
-                    )
-
-            except Exception as e:
-                logger.error(f"Error initializing Porcupine: {e}")
-                raise
-        
-        # Get and store audio device index
-        self._device_index = self.audio_manager.get_device_index()
+        # Normally already loaded during warm-up
+        await self.load()
         
-        # Open audio stream with Porcupine's required settings
-        self._open_stream()
+        # Subscribe to the shared microphone capture
+        capture = self.audio_manager.get_capture()
+        if capture.sample_rate != self.porcupine.sample_rate:
+            raise ValueError(
+                f"Capture rate {capture.sample_rate}Hz does not match "
+                f"Porcupine rate {self.porcupine.sample_rate}Hz"
+            )
+        self._consumer = capture.subscribe()
         
+        self._loop = asyncio.get_running_loop()
+        self._detections = asyncio.Queue()
         self.is_listening = True
         self._is_paused = False
+        self._active.set()
+        self._worker = threading.Thread(target=self._detection_loop, daemon=True)
+        self._worker.start()
         logger.info(f"Listening for wake word: '{settings.porcupine_keyword}'")
         
+        while self.is_listening:
+            position = await self._detections.get()
+            if position is None:
+                break
+            
+            logger.info(f"Wake word '{settings.porcupine_keyword}' detected")
+            self.last_detection_position = position
+            try:
+                await self.on_wake_word()
+            except Exception as e:
+                logger.error(f"Error handling wake word: {e}")
+            
+            # Only resume if not stopped
+            if self.is_listening:
+                self.resume()
+    
+    async def load(self):
+        """Load the Porcupine model (only if not already loaded), off the event loop."""
+        if self.porcupine:
+            return
+        
+        logger.info(f"Initializing Porcupine with keyword: '{settings.porcupine_keyword}'")
         try:
-            while self.is_listening:
-                # Skip processing if paused (stream closed)
-                if self._is_paused or not self.stream:
-                    await asyncio.sleep(0.1)
-                    continue
-                
-                # Read audio chunk
-                pcm = self.stream.read(self.porcupine.frame_length, exception_on_overflow=False)
-                pcm = struct.unpack_from("h" * self.porcupine.frame_length, pcm)
-                
-                # Process audio for wake word
-                keyword_index = self.porcupine.process(pcm)
-                
-                if keyword_index >= 0:
-                    logger.info(f"Wake word '{settings.porcupine_keyword}' detected")
-                    await self.on_wake_word()
-                    # Only log resume message if not stopped
-                    if self.is_listening:
-                        logger.info(f"Listening for wake word: '{settings.porcupine_keyword}'")
-                    
-        except KeyboardInterrupt:
-            logger.info("Stopping wake word detection")
-            self.stop()
+            # self.porcupine = pvporcupine.create(
+            #     access_key=settings.porcupine_access_key,
+            #     keywords=[settings.porcupine_keyword],
+            #     sensitivities=[settings.porcupine_sensitivity]
+            # )
+            logger.debug(f"From Settings, file path = {settings.porcupine_keyword_file_path}")
+            self.porcupine = await asyncio.to_thread(
+                pvporcupine.create,
+                access_key=settings.porcupine_access_key,
+                keyword_paths=[settings.porcupine_keyword_file_path]
+                )
+
+        except Exception as e:
+            logger.error(f"Error initializing Porcupine: {e}")
+            raise
+    
+    def _detection_loop(self):
+        """Worker thread loop that reads the capture and runs Porcupine."""
+        frames = PorcupineFrameProcessor(self.porcupine)
+        while self.is_listening:
+            # Skip processing while the voice agent owns the conversation
+            if not self._active.wait(timeout=0.1):
+                continue
+            
+            # Read audio chunk straight into the reusable frame
+            if not self._consumer.read_into(frames.frame_bytes):
+                break
+            
+            if self.on_voice_activity:
+                self._detect_voice_activity(frames.rms())
+            
+            # Process audio for wake word
+            keyword_index = frames.process()
+            
+            if keyword_index >= 0:
+                tracer.mark("wake_word")
+                # Stop detecting until the session is over and resume() is called
+                self._is_paused = True
+                self._active.clear()
+                # Capture position right after the wake word, where the command starts
+                self._emit(self._detections.put_nowait, self._consumer.position)
+        
+        self._emit(self._detections.put_nowait, None)
     
-    def _open_stream(self):
-        """Open the audio input stream."""
-        if self.stream:
-            return  # Already open
-        
-        self.stream = self.audio_manager.open_input_stream(
-            device_index=self._device_index,
-            rate=self.porcupine.sample_rate,
-            chunk_size=self.porcupine.frame_length,
-            channels=1
-        )
+    def _emit(self, callback, *args):
+        """Schedule a callback on the event loop from the worker thread."""
+        try:
+            self._loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # Event loop already closed
+            pass
     
-    def _close_stream(self):
-        """Close the audio input stream."""
-        if self.stream:
-            self.audio_manager.close_stream(self.stream)
-            self.stream = None
+    def _detect_voice_activity(self, rms: float):
+        """Fire on_voice_activity when the frame energy rises above the threshold."""
+        voice_active = rms >= settings.vad_energy_threshold
+        if voice_active and not self._voice_active:
+            self._emit(self.on_voice_activity)
+        self._voice_active = voice_active
     
     def pause(self):
         """
-        Pause wake word listening by closing the audio stream.
-        Keeps Porcupine initialized for quick resume.
+        Pause wake word listening while the voice agent is active.
+        Stays subscribed to the shared capture for instant resume.
         """
         if self._is_paused:
             return
         
-        self._close_stream()
         self._is_paused = True
+        self._active.clear()
         logger.info("Wake word detector paused")
     
     def resume(self):
         """
-        Resume wake word listening by reopening the audio stream.
+        Resume wake word listening from the newest captured audio.
         """
         if not self._is_paused:
             return
@@ -135,24 +236,40 @@ class WakeWordDetector:
             logger.warning("Cannot resume - Porcupine not initialized")
             return
         
-        self._open_stream()
+        # Skip the audio captured during the voice session
+        if self._consumer:
+            self._consumer.seek_to_latest()
         self._is_paused = False
+        self._active.set()
         logger.info(f"Wake word detector resumed - listening for '{settings.porcupine_keyword}'")
     
     def stop(self):
-        """Stop listening and cleanup resources."""
+        """
+        Stop listening.
+        
+        Porcupine stays loaded so listening can restart instantly; call
+        close() to release it.
+        """
         self.is_listening = False
         
-        if self.stream:
-            self.audio_manager.close_stream(self.stream)
-            self.stream = None
+        # Closing the consumer wakes the worker if it is blocked on a read
+        if self._consumer:
+            self._consumer.close()
+        
+        if self._worker and self._worker.is_alive() and self._worker is not threading.current_thread():
+            self._worker.join(timeout=1.0)
+        self._worker = None
+        self._consumer = None
         
+        logger.info("Wake word detector stopped")
+    
+    def close(self):
+        """Stop listening and release Porcupine."""
+        self.stop()
         if self.porcupine:
             self.porcupine.delete()
             self.porcupine = None
-        
-        logger.info("Wake word detector stopped")
     
     def __del__(self):
         """Ensure cleanup on deletion."""
-        self.stop()
+        self.close()
@@ -0,0 +1,287 @@
+"""End-to-end benchmark of voice sessions, without hardware or accounts.
+
+Runs complete VoiceAgent sessions against a fake agent server, a stub
+VoiceMonkey server (benchmarks.fake_services) and a simulated microphone
+and speaker (benchmarks.fake_audio). Each session starts as if the wake word
+had just been heard and plays a greeting, one device command and a reply
+that the user interrupts. Per session it measures:
+
+    wake_to_first_audio_ms  wake word -> first agent audio out of the speaker
+    turn_latency_ms         user transcript -> first reply audio out of the speaker
+    command_latency_ms      user transcript -> trigger received by VoiceMonkey
+    barge_in_ms             user interrupts -> speaker silent
+    cpu_ms, rss_mb          process CPU time and resident memory
+
+CPU includes the stand-in servers, which share the event loop but do
+little work. Results, with pipeline stage percentiles from the tracer, are
+written as JSON; pass an earlier file as --baseline to compare commits.
+
+Settings come from the environment and .env as usual (e.g.
+AGENT_CONNECTION_MODE=prewarm or FAST_PATH_ENABLED=true), except that
+the agent and VoiceMonkey URLs, devices and speech clip cache point at the
+stand-ins.
+
+Usage:
+    uv run python -m benchmarks.e2e [--sessions 20] [--output e2e.json] [--baseline old.json]
+"""
+import os
+
+# Device names are read at import time; keep the benchmark off real devices
+os.environ["SMART_HOME_DEVICES"] = "Kitchen Light"
+for _name in ("SMART_HOME_GROUPS", "SMART_HOME_ALIASES", "SMART_HOME_SCENES", "SMART_HOME_BACKENDS"):
+    os.environ[_name] = "{}"
+os.environ.setdefault("PORCUPINE_ACCESS_KEY", "benchmark")
+os.environ.setdefault("DEEPGRAM_API_KEY", "benchmark")
+os.environ.setdefault("VOICEMONKEY_API_TOKEN", "benchmark")
+
+import argparse
+import asyncio
+import json
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from typing import List, Optional
+from backend.audio_manager import AudioManager
+from backend.config import settings
+from backend.logging_config import setup_logging
+from backend.tracing import tracer
+from backend.voice_agent import VoiceAgent
+from benchmarks.fake_audio import FakePyAudio
+from benchmarks.fake_services import FakeAgentServer, StubVoiceMonkey
+
+DEVICE = "Kitchen Light"
+SESSION_TIMEOUT = 30.0
+METRICS = ["wake_to_first_audio_ms", "turn_latency_ms", "command_latency_ms", "barge_in_ms", "cpu_ms"]
+
+
+def rss_mb() -> float:
+    """Current resident set size (peak on platforms without /proc)."""
+    try:
+        with open("/proc/self/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes elsewhere
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def describe(values: List[float]) -> Optional[dict]:
+    """Count, mean and nearest-rank percentiles of a metric."""
+    if not values:
+        return None
+    ordered = sorted(values)
+
+    def percentile(q: float) -> float:
+        return ordered[min(len(ordered) - 1, max(0, round(q * len(ordered) + 0.5) - 1))]
+
+    return {
+        "count": len(ordered),
+        "mean": sum(ordered) / len(ordered),
+        "p50": percentile(0.5),
+        "p95": percentile(0.95),
+        "max": ordered[-1],
+    }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run_session(agent: VoiceAgent, audio: FakePyAudio, server: FakeAgentServer, voicemonkey: StubVoiceMonkey) -> dict:
+    """Run one voice session and measure it from the stand-ins' timestamps."""
+    conversations = len(server.conversations)
+    outputs = len(audio.outputs)
+    triggers = len(voicemonkey.triggers)
+    cpu_started = time.process_time()
+
+    wake_at = time.perf_counter()
+    tracer.mark("wake_word", wake_at)
+    await asyncio.wait_for(agent.listen(), timeout=SESSION_TIMEOUT)
+    # Optimistic commands may still be on their way to VoiceMonkey
+    deadline = time.perf_counter() + settings.function_call_timeout
+    while len(voicemonkey.triggers) <= triggers and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+
+    result = {"cpu_ms": (time.process_time() - cpu_started) * 1000, "rss_mb": rss_mb()}
+    writes = sorted(write for stream in audio.outputs[outputs:] for write in stream.writes)
+    if writes:
+        result["wake_to_first_audio_ms"] = (writes[0][0] - wake_at) * 1000
+    if len(server.conversations) <= conversations:
+        result["error"] = "Session ended before the conversation started"
+        return result
+
+    conversation = server.conversations[conversations]
+    result["function_response"] = conversation.function_response
+    if conversation.user_text_at is not None:
+        reply = [start for start, _ in writes if start >= conversation.user_text_at]
+        if reply:
+            result["turn_latency_ms"] = (reply[0] - conversation.user_text_at) * 1000
+        received = [at for at, _ in voicemonkey.triggers[triggers:]]
+        if received:
+            result["command_latency_ms"] = (received[0] - conversation.user_text_at) * 1000
+    if conversation.barge_in_at is not None:
+        # Audio still playing when the user spoke up plays until it is cut off
+        audible_until = max((end for start, end in writes if start < conversation.barge_in_at), default=None)
+        if audible_until is not None and audible_until > conversation.barge_in_at:
+            heard = max(end for _, end in writes)
+            result["barge_in_ms"] = (heard - conversation.barge_in_at) * 1000
+    return result
+
+
+async def run(args) -> dict:
+    """Start the stand-ins, run every session and collect the results."""
+    audio = FakePyAudio()
+    AudioManager().use_backend(lambda: audio)
+    server = FakeAgentServer(
+        settings_delay=args.settings_delay_ms / 1000,
+        greeting_seconds=args.greeting_ms / 1000,
+        think=args.think_ms / 1000,
+        reply_delay=args.reply_delay_ms / 1000,
+        barge_in_after=args.barge_in_ms / 1000
+    )
+    voicemonkey = StubVoiceMonkey(args.voicemonkey_delay_ms / 1000)
+    agent_server = await server.start("127.0.0.1", 0)
+    voicemonkey_server = await voicemonkey.start("127.0.0.1", 0)
+    settings.deepgram_agent_url = f"ws://127.0.0.1:{agent_server.sockets[0].getsockname()[1]}"
+    settings.voicemonkey_base_url = f"http://127.0.0.1:{voicemonkey_server.sockets[0].getsockname()[1]}"
+    settings.smart_home_default_backend = "voicemonkey"
+
+    sessions = []
+    with tempfile.TemporaryDirectory() as cache_dir:
+        settings.tts_cache_dir = cache_dir
+        agent = VoiceAgent()
+        await agent.prepare()
+        try:
+            cpu_started = time.process_time()
+            wall_started = time.perf_counter()
+            rss_started = rss_mb()
+            for index in range(args.warmup + args.sessions):
+                # Alternate so the device state cache never skips a command
+                server.command = {"device": DEVICE, "action": "on" if index % 2 == 0 else "off"}
+                session = await run_session(agent, audio, server, voicemonkey)
+                if index < args.warmup:
+                    # Warm-up sessions record the greeting and open connections
+                    tracer.histograms.clear()
+                    cpu_started = time.process_time()
+                    wall_started = time.perf_counter()
+                    rss_started = rss_mb()
+                else:
+                    sessions.append(session)
+                    print(
+                        f"session {len(sessions):>3}: " + ", ".join(
+                            f"{name} {session[name]:.0f}" for name in METRICS if name in session
+                        ) + (f" ({session['error']})" if "error" in session else ""),
+                        flush=True
+                    )
+                await asyncio.sleep(args.gap_ms / 1000)
+            cpu_seconds = time.process_time() - cpu_started
+            wall_seconds = time.perf_counter() - wall_started
+        finally:
+            AudioManager().stop_capture()
+            await agent.shutdown()
+            agent_server.close()
+            voicemonkey_server.close()
+
+    return {
+        "commit": git_commit(),
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "sessions": args.sessions,
+            "warmup": args.warmup,
+            "agent_connection_mode": settings.agent_connection_mode,
+            "function_call_mode": settings.function_call_mode,
+            "fast_path_enabled": settings.fast_path_enabled,
+            "tts_cache_enabled": settings.tts_cache_enabled,
+            "audio_upstream_encoding": settings.audio_upstream_encoding,
+            "audio_playback_prefill_ms": settings.audio_playback_prefill_ms,
+            "settings_delay_ms": args.settings_delay_ms,
+            "greeting_ms": args.greeting_ms,
+            "think_ms": args.think_ms,
+            "reply_delay_ms": args.reply_delay_ms,
+            "barge_in_ms": args.barge_in_ms,
+            "voicemonkey_delay_ms": args.voicemonkey_delay_ms,
+        },
+        "summary": {name: describe([session[name] for session in sessions if name in session]) for name in METRICS},
+        "failed_sessions": sum(1 for session in sessions if "error" in session),
+        "cpu": {
+            "seconds": cpu_seconds,
+            "percent": cpu_seconds / wall_seconds * 100 if wall_seconds else 0.0,
+        },
+        "rss_mb": {"start": rss_started, "end": rss_mb(), "peak": peak_rss_mb()},
+        "stages": tracer.summary(),
+        "sessions": sessions,
+    }
+
+
+def report(results: dict, baseline: dict = None):
+    """Print the summary, with changes against a baseline run if given."""
+    print(f"\n{'metric':<24}{'n':>5}{'p50':>10}{'p95':>10}{'max':>10}" + ("   p50 vs baseline" if baseline else ""))
+    for name in METRICS:
+        stats = results["summary"].get(name)
+        if not stats:
+            continue
+        line = f"{name:<24}{stats['count']:>5}{stats['p50']:>10.1f}{stats['p95']:>10.1f}{stats['max']:>10.1f}"
+        old = (baseline or {}).get("summary", {}).get(name)
+        if old and old["p50"]:
+            line += f"   {old['p50']:.1f} -> {stats['p50']:.1f} ({(stats['p50'] / old['p50'] - 1) * 100:+.0f}%)"
+        print(line)
+    cpu, rss = results["cpu"], results["rss_mb"]
+    print(f"\nCPU {cpu['percent']:.1f}% of one core, RSS {rss['start']:.0f} -> {rss['end']:.0f} MB (peak {rss['peak']:.0f} MB)")
+    if baseline:
+        print(
+            f"Baseline ({baseline.get('commit')}): CPU {baseline['cpu']['percent']:.1f}%, "
+            f"RSS end {baseline['rss_mb']['end']:.0f} MB"
+        )
+    if results["failed_sessions"]:
+        print(f"{results['failed_sessions']} sessions failed")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=20)
+    parser.add_argument("--warmup", type=int, default=1, help="Sessions run first and left out of the results")
+    parser.add_argument("--output", help="Results file (default e2e-<commit>.json)")
+    parser.add_argument("--baseline", help="Earlier results file to compare against")
+    parser.add_argument("--settings-delay-ms", type=float, default=50.0, help="Settings -> SettingsApplied")
+    parser.add_argument("--greeting-ms", type=float, default=800.0, help="Length of the greeting audio")
+    parser.add_argument("--think-ms", type=float, default=300.0, help="User transcript -> FunctionCallRequest")
+    parser.add_argument("--reply-delay-ms", type=float, default=200.0, help="FunctionCallResponse -> reply audio")
+    parser.add_argument("--barge-in-ms", type=float, default=500.0, help="Reply audio -> the user interrupts")
+    parser.add_argument("--voicemonkey-delay-ms", type=float, default=50.0, help="Simulated VoiceMonkey latency")
+    parser.add_argument("--gap-ms", type=float, default=300.0, help="Pause between sessions")
+    parser.add_argument("--log-level", default="WARNING")
+    args = parser.parse_args()
+
+    setup_logging(args.log_level)
+    results = await run(args)
+    output = args.output or f"e2e-{results['commit'] or 'results'}.json"
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    report(results, baseline)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
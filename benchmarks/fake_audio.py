@@ -0,0 +1,113 @@
+"""Simulated microphone and speaker with the PyAudio interface.
+
+Streams run in real time like a sound card: reads block until a chunk of
+(silent) microphone audio would have been captured, and writes block while
+more than one device period is queued, so the capture and playback threads
+behave as they do on hardware. Every speaker write is timestamped with when
+it is audible.
+
+Install before any audio is opened:
+    AudioManager().use_backend(FakePyAudio)
+"""
+import threading
+import time
+from typing import List, Tuple
+
+DEVICES = [
+    {"name": "Fake USB Microphone", "maxInputChannels": 1, "maxOutputChannels": 0, "defaultSampleRate": 48000},
+    {"name": "Fake USB Speaker", "maxInputChannels": 0, "maxOutputChannels": 2, "defaultSampleRate": 48000},
+]
+
+
+class FakeStream:
+    """One open input or output stream."""
+
+    def __init__(
+        self,
+        rate: int,
+        channels: int = 1,
+        frames_per_buffer: int = 1024,
+        input: bool = False,
+        output: bool = False,
+        **kwargs
+    ):
+        self.rate = rate
+        self.channels = channels
+        self.frames_per_buffer = frames_per_buffer
+        self.is_input = input
+        self.bytes_per_second = rate * channels * 2
+        self.active = True
+        # (audible from, audible until) for every write, as time.perf_counter()
+        self.writes: List[Tuple[float, float]] = []
+        self._clock = 0.0
+        self._silence = b""
+
+    def read(self, num_frames: int, exception_on_overflow: bool = True) -> bytes:
+        """Wait for the next chunk of microphone audio."""
+        now = time.perf_counter()
+        # A reader that fell behind resumes from now, as after an overflow
+        self._clock = max(self._clock, now - 0.1) + num_frames / self.rate
+        delay = self._clock - now
+        if delay > 0:
+            time.sleep(delay)
+        size = num_frames * self.channels * 2
+        if len(self._silence) != size:
+            self._silence = bytes(size)
+        return self._silence
+
+    def write(self, frames: bytes, num_frames: int = None, exception_on_underflow: bool = False):
+        """Queue audio on the speaker, blocking while the device buffer is full."""
+        now = time.perf_counter()
+        # The speaker plays from now if it ran dry, otherwise after what is queued
+        starts = max(self._clock, now)
+        self._clock = starts + len(frames) / self.bytes_per_second
+        self.writes.append((starts, self._clock))
+        delay = self._clock - self.get_output_latency() - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+    def get_output_latency(self) -> float:
+        """Seconds of audio the device buffers (one period)."""
+        return self.frames_per_buffer / self.rate
+
+    def start_stream(self):
+        self.active = True
+
+    def stop_stream(self):
+        self.active = False
+
+    def is_active(self) -> bool:
+        return self.active
+
+    def close(self):
+        self.active = False
+
+
+class FakePyAudio:
+    """PyAudio stand-in that keeps every stream it opens for inspection."""
+
+    def __init__(self):
+        self.inputs: List[FakeStream] = []
+        self.outputs: List[FakeStream] = []
+        self._lock = threading.Lock()
+
+    def get_device_count(self) -> int:
+        return len(DEVICES)
+
+    def get_device_info_by_index(self, index: int) -> dict:
+        return dict(DEVICES[index], index=index)
+
+    def get_default_input_device_info(self) -> dict:
+        return self.get_device_info_by_index(0)
+
+    def get_default_output_device_info(self) -> dict:
+        return self.get_device_info_by_index(1)
+
+    def open(self, **kwargs) -> FakeStream:
+        stream = FakeStream(**kwargs)
+        with self._lock:
+            (self.inputs if stream.is_input else self.outputs).append(stream)
+        return stream
+
+    def terminate(self):
+        pass
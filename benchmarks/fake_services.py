@@ -0,0 +1,264 @@
+"""Stand-ins for the Deepgram agent API and VoiceMonkey.
+
+FakeAgentServer speaks the part of the agent websocket protocol that
+VoiceAgent handles and plays one scripted conversation per session:
+
+    Welcome -> (Settings) -> SettingsApplied -> greeting, if requested
+    (client starts streaming microphone audio)
+    UserStartedSpeaking -> ConversationText (user) -> FunctionCallRequest
+    (FunctionCallResponse) -> AgentStartedSpeaking -> reply audio
+    UserStartedSpeaking part way through the reply -> close
+
+A session opened ahead of time (prewarm and speculative modes) sits idle
+after its greeting until the client sends audio, like the real service.
+StubVoiceMonkey answers /trigger over HTTP/1.1 keep-alive. Both run on the
+caller's event loop and timestamp events with time.perf_counter().
+"""
+import array
+import asyncio
+import json
+import logging
+import math
+import time
+import uuid
+from typing import List, Optional, Tuple
+from urllib.parse import parse_qs, urlsplit
+import websockets
+from websockets.asyncio.server import Server, ServerConnection, serve
+
+logger = logging.getLogger("fake_services")
+
+AGENT_AUDIO_SAMPLE_RATE = 16000
+# Agent audio is streamed this much faster than real time, as TTS is
+TTS_SPEED = 2.0
+TTS_CHUNK_SECONDS = 0.05
+# Time given to the client to go quiet after a barge-in before hanging up
+SETTLE_SECONDS = 0.3
+
+
+def tone(seconds: float, frequency: float = 440.0) -> bytes:
+    """16-bit mono sine wave at the agent audio rate."""
+    samples = int(seconds * AGENT_AUDIO_SAMPLE_RATE)
+    step = 2 * math.pi * frequency / AGENT_AUDIO_SAMPLE_RATE
+    return array.array("h", (int(3000 * math.sin(i * step)) for i in range(samples))).tobytes()
+
+
+class Conversation:
+    """Timestamps of one scripted conversation."""
+
+    def __init__(self, command: dict):
+        self.command = command
+        self.audio_started_at: Optional[float] = None
+        self.user_text_at: Optional[float] = None
+        self.function_call_at: Optional[float] = None
+        self.function_response_at: Optional[float] = None
+        self.barge_in_at: Optional[float] = None
+        self.function_response: Optional[str] = None
+
+
+class FakeAgentServer:
+    """Scripted Deepgram agent with configurable delays (all in seconds)."""
+
+    def __init__(
+        self,
+        settings_delay: float = 0.05,
+        greeting_seconds: float = 0.8,
+        user_start: float = 1.0,
+        user_speech: float = 0.6,
+        think: float = 0.3,
+        reply_delay: float = 0.2,
+        reply_seconds: float = 2.0,
+        barge_in_after: float = 0.5
+    ):
+        """
+        Initialize the server.
+
+        Args:
+            settings_delay: Settings -> SettingsApplied
+            greeting_seconds: Length of the greeting audio
+            user_start: First microphone audio -> UserStartedSpeaking
+            user_speech: UserStartedSpeaking -> user transcript
+            think: User transcript -> FunctionCallRequest
+            reply_delay: FunctionCallResponse -> AgentStartedSpeaking
+            reply_seconds: Length of the reply audio
+            barge_in_after: AgentStartedSpeaking -> the user interrupts
+                (0 lets the reply finish)
+        """
+        self.settings_delay = settings_delay
+        self.user_start = user_start
+        self.user_speech = user_speech
+        self.think = think
+        self.reply_delay = reply_delay
+        self.barge_in_after = barge_in_after
+        self.greeting_audio = tone(greeting_seconds, 660.0)
+        self.reply_audio = tone(reply_seconds)
+        # control_smart_home parameters the next conversation asks for
+        self.command = {"device": "Kitchen Light", "action": "on"}
+        self.conversations: List[Conversation] = []
+        self.connections = 0
+
+    async def start(self, host: str, port: int) -> Server:
+        """Start listening; returns the server."""
+        return await serve(self.handle, host, port, max_size=None)
+
+    async def handle(self, websocket: ServerConnection):
+        """Run the handshake and one conversation on a connection."""
+        self.connections += 1
+        messages: asyncio.Queue = asyncio.Queue()
+        audio_started = asyncio.Event()
+        reader = asyncio.create_task(self._read(websocket, messages, audio_started))
+        try:
+            await websocket.send(json.dumps({"type": "Welcome", "request_id": str(uuid.uuid4())}))
+            settings_message = await self._expect(messages, "Settings")
+            if settings_message is None:
+                return
+            await asyncio.sleep(self.settings_delay)
+            await websocket.send(json.dumps({"type": "SettingsApplied"}))
+
+            greeting = settings_message.get("agent", {}).get("greeting")
+            if greeting:
+                await self._speak(websocket, greeting, self.greeting_audio)
+
+            # A pre-opened session waits here until it is handed to a voice session
+            await self._until(audio_started, reader)
+            if reader.done():
+                return
+            conversation = Conversation(dict(self.command))
+            self.conversations.append(conversation)
+            conversation.audio_started_at = time.perf_counter()
+            await self._converse(websocket, conversation, messages)
+            await asyncio.sleep(SETTLE_SECONDS)
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            reader.cancel()
+            await websocket.close()
+
+    async def _converse(self, websocket: ServerConnection, conversation: Conversation, messages: asyncio.Queue):
+        command = conversation.command
+        await asyncio.sleep(self.user_start)
+        await websocket.send(json.dumps({"type": "UserStartedSpeaking"}))
+        await asyncio.sleep(self.user_speech)
+        text = f"Turn {command['action']} the {command['device']}."
+        await websocket.send(json.dumps({"type": "ConversationText", "role": "user", "content": text}))
+        conversation.user_text_at = time.perf_counter()
+
+        await asyncio.sleep(self.think)
+        call_id = str(uuid.uuid4())
+        await websocket.send(json.dumps({
+            "type": "FunctionCallRequest",
+            "functions": [{
+                "id": call_id,
+                "name": "control_smart_home",
+                "arguments": json.dumps(command),
+                "client_side": True,
+            }],
+        }))
+        conversation.function_call_at = time.perf_counter()
+        response = await self._expect(messages, "FunctionCallResponse")
+        if response is None:
+            return
+        conversation.function_response_at = time.perf_counter()
+        conversation.function_response = response.get("content")
+
+        await asyncio.sleep(self.reply_delay)
+        reply = f"Okay, the {command['device']} is {command['action']}."
+        conversation.barge_in_at = await self._speak(websocket, reply, self.reply_audio, self.barge_in_after)
+
+    async def _speak(
+        self,
+        websocket: ServerConnection,
+        text: str,
+        audio: bytes,
+        interrupt_after: float = 0.0
+    ) -> Optional[float]:
+        """
+        Stream one agent turn, optionally cut short by the user.
+
+        Returns:
+            When UserStartedSpeaking was sent, or None if the turn finished
+        """
+        await websocket.send(json.dumps({"type": "ConversationText", "role": "assistant", "content": text}))
+        await websocket.send(json.dumps({"type": "AgentStartedSpeaking"}))
+        started = time.perf_counter()
+        chunk = int(TTS_CHUNK_SECONDS * AGENT_AUDIO_SAMPLE_RATE) * 2
+        for offset in range(0, len(audio), chunk):
+            if interrupt_after and time.perf_counter() - started >= interrupt_after:
+                await websocket.send(json.dumps({"type": "UserStartedSpeaking"}))
+                return time.perf_counter()
+            await websocket.send(audio[offset:offset + chunk])
+            await asyncio.sleep(TTS_CHUNK_SECONDS / TTS_SPEED)
+        if interrupt_after:
+            # The reply was sent before the user spoke up; interrupt its playback
+            await asyncio.sleep(max(0.0, started + interrupt_after - time.perf_counter()))
+            await websocket.send(json.dumps({"type": "UserStartedSpeaking"}))
+            return time.perf_counter()
+        await websocket.send(json.dumps({"type": "AgentAudioDone"}))
+        return None
+
+    @staticmethod
+    async def _read(websocket: ServerConnection, messages: asyncio.Queue, audio_started: asyncio.Event):
+        """Collect client messages; microphone audio only marks that streaming began."""
+        try:
+            async for message in websocket:
+                if isinstance(message, bytes):
+                    audio_started.set()
+                else:
+                    messages.put_nowait(json.loads(message))
+        except websockets.exceptions.ConnectionClosed:
+            pass
+        finally:
+            messages.put_nowait(None)
+
+    @staticmethod
+    async def _expect(messages: asyncio.Queue, msg_type: str) -> Optional[dict]:
+        """Wait for a message of one type, skipping others; None once the client is gone."""
+        while (message := await messages.get()) is not None:
+            if message.get("type") == msg_type:
+                return message
+        return None
+
+    @staticmethod
+    async def _until(event: asyncio.Event, reader: asyncio.Task):
+        waiter = asyncio.create_task(event.wait())
+        try:
+            await asyncio.wait({waiter, reader}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            waiter.cancel()
+
+
+class StubVoiceMonkey:
+    """Answers VoiceMonkey trigger requests after a fixed delay."""
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        # (received at, device) for every /trigger request
+        self.triggers: List[Tuple[float, str]] = []
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer requests on one keep-alive connection."""
+        try:
+            while request_line := await reader.readline():
+                while (await reader.readline()).strip():
+                    pass  # Headers; requests have no body
+                method, target, _ = request_line.decode("latin-1").split(" ", 2)
+                url = urlsplit(target)
+                if url.path == "/trigger":
+                    device = parse_qs(url.query).get("device", [""])[0]
+                    self.triggers.append((time.perf_counter(), device))
+                    if self.delay:
+                        await asyncio.sleep(self.delay)
+                body = b"" if method == "HEAD" else b'{"success": true}'
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body
+                )
+                await writer.drain()
+        except (ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        """Start listening; returns the server."""
+        return await asyncio.start_server(self.serve_client, host, port)
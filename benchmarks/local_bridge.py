@@ -0,0 +1,104 @@
+"""Stand-in for a LAN smart home bridge.
+
+Speaks the JSON-lines protocol of LocalBridgeBackend and keeps device state
+in memory, so the local backend can be tried without real hardware.
+
+Usage:
+    uv run python -m benchmarks.local_bridge [--port 8765] [--delay-ms 5] [--fail kitchen-light]
+
+Then set SMART_HOME_BACKENDS={"Kitchen Light": "local"} and talk to Marlene.
+"""
+import argparse
+import asyncio
+import json
+import logging
+
+logger = logging.getLogger("local_bridge")
+
+ACTIONS = {"on", "off", "change color", "change brightness"}
+
+
+class LocalBridge:
+    """Answers commands after a fixed delay, optionally failing some devices."""
+
+    def __init__(self, delay: float = 0.0, failing: set = None):
+        self.delay = delay
+        self.failing = failing or set()
+        self.states = {}
+        self.commands = 0
+
+    async def handle(self, request: dict) -> dict:
+        """Apply one command and build its reply."""
+        self.commands += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        device = request.get("device")
+        action = request.get("action")
+        if not device or action not in ACTIONS:
+            return {"id": request.get("id"), "ok": False, "error": f"Bad command: {action} {device}"}
+        if device in self.failing:
+            return {"id": request.get("id"), "ok": False, "error": f"{device} is offline"}
+        state = self.states.setdefault(device, {})
+        if action in ("on", "off"):
+            state["power"] = action
+        elif action == "change color":
+            state.update(power="on", color=request.get("color"))
+        else:
+            state.update(power="on", brightness=request.get("brightness"))
+        logger.info(f"{device}: {state}")
+        return {"id": request.get("id"), "ok": True}
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        """Answer every command on one connection, concurrently."""
+        peer = writer.get_extra_info("peername")
+        logger.info(f"Client connected: {peer}")
+
+        async def reply(request: dict):
+            writer.write(json.dumps(await self.handle(request)).encode() + b"\n")
+            await writer.drain()
+
+        tasks = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    request = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Malformed request: {line[:80]!r}")
+                    continue
+                task = asyncio.create_task(reply(request))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        except ConnectionError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            writer.close()
+            logger.info(f"Client disconnected: {peer}")
+
+    async def start(self, host: str, port: int) -> asyncio.AbstractServer:
+        """Start listening; returns the server."""
+        return await asyncio.start_server(self.serve_client, host, port)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--delay-ms", type=float, default=5.0, help="Simulated device latency")
+    parser.add_argument("--fail", action="append", default=[], help="Normalized device name that always fails")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(message)s")
+    bridge = LocalBridge(args.delay_ms / 1000, set(args.fail))
+    server = await bridge.start(args.host, args.port)
+    logger.info(f"Local bridge listening on {args.host}:{args.port}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
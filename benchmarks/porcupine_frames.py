@@ -0,0 +1,105 @@
+"""Micro-benchmark for the Porcupine frame pipeline.
+
+Compares the CPU cost of getting one Porcupine frame from the capture ring
+buffer to the native library, before and after the zero-copy frame path.
+Porcupine's own inference is identical in both cases, so it is replaced by
+a no-op native call and only the Python-side overhead is measured.
+
+Usage:
+    uv run python -m benchmarks.porcupine_frames [--frames 200000]
+"""
+import argparse
+import ctypes
+import math
+import struct
+import time
+from backend.audio_capture import AudioCapture
+from backend.wake_word_detector import PorcupineFrameProcessor
+
+FRAME_LENGTH = 512
+SAMPLE_RATE = 16000
+FRAMES_PER_HOUR = SAMPLE_RATE / FRAME_LENGTH * 3600
+
+# Stand-in for pv_porcupine_process with the same C signature
+_PROCESS_PROTOTYPE = ctypes.CFUNCTYPE(
+    ctypes.c_int,
+    ctypes.c_void_p,
+    ctypes.POINTER(ctypes.c_short),
+    ctypes.POINTER(ctypes.c_int)
+)
+
+
+class _FakePorcupine:
+    """Exposes the attributes PorcupineFrameProcessor and Porcupine.process rely on."""
+
+    class PicovoiceStatuses:
+        SUCCESS = 0
+
+    frame_length = FRAME_LENGTH
+    sample_rate = SAMPLE_RATE
+
+    def __init__(self):
+        self._handle = None
+        self._process_func = _PROCESS_PROTOTYPE(lambda handle, pcm, result: 0)
+        self._result = ctypes.c_int()
+
+    def process(self, pcm) -> int:
+        # Same conversion pvporcupine.Porcupine.process does on every call
+        self._process_func(self._handle, (ctypes.c_short * len(pcm))(*pcm), ctypes.byref(self._result))
+        return self._result.value
+
+
+def _make_capture() -> AudioCapture:
+    """Capture ring that is filled by the benchmark instead of a device."""
+    capture = AudioCapture(audio_manager=None, sample_rate=SAMPLE_RATE, chunk_size=FRAME_LENGTH)
+    capture.is_running = True
+    return capture
+
+
+def bench_before(frames: int) -> float:
+    """Original loop: bytes per read, struct.unpack_from, tuple-to-ctypes copy."""
+    porcupine = _FakePorcupine()
+    capture = _make_capture()
+    consumer = capture.subscribe()
+    chunk = bytes(range(256)) * (FRAME_LENGTH * 2 // 256)
+
+    started = time.process_time()
+    for _ in range(frames):
+        capture.ring.write(chunk)
+        pcm = consumer.read(porcupine.frame_length)
+        pcm = struct.unpack_from("h" * porcupine.frame_length, pcm)
+        math.sqrt(sum(sample * sample for sample in pcm) / len(pcm))
+        porcupine.process(pcm)
+    return time.process_time() - started
+
+
+def bench_after(frames: int) -> float:
+    """Zero-copy loop: read_into a preallocated ctypes frame, NumPy energy."""
+    processor = PorcupineFrameProcessor(_FakePorcupine())
+    capture = _make_capture()
+    consumer = capture.subscribe()
+    chunk = bytes(range(256)) * (FRAME_LENGTH * 2 // 256)
+
+    started = time.process_time()
+    for _ in range(frames):
+        capture.ring.write(chunk)
+        consumer.read_into(processor.frame_bytes)
+        processor.rms()
+        processor.process()
+    return time.process_time() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=200_000, help="Frames processed per variant")
+    args = parser.parse_args()
+
+    for name, bench in (("before", bench_before), ("after", bench_after)):
+        seconds = bench(args.frames)
+        per_frame_us = seconds / args.frames * 1e6
+        per_hour = seconds / args.frames * FRAMES_PER_HOUR
+        print(f"{name:>6}: {per_frame_us:7.2f} us/frame, {per_hour:6.2f} CPU s per hour of listening")
+
+
+if __name__ == "__main__":
+    main()
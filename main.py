@@ -3,12 +3,19 @@
 This script runs the wake word detector in the terminal, listening for the
 wake word and processing voice commands via Deepgram when triggered.
 """
+import time
+_imports_started = time.perf_counter()
+
 import asyncio
 import logging
 from backend.wake_word_detector import WakeWordDetector
 from backend.voice_agent import VoiceAgent
 from backend.logging_config import setup_logging
 from backend.config import settings
+from backend.startup import StartupTimer, warm_up
+from backend.tracing import tracer
+
+_import_seconds = time.perf_counter() - _imports_started
 
 logger = logging.getLogger(__name__)
 
@@ -25,20 +32,29 @@ async def main():
     async def on_wake_word_detected():
         """Async callback when wake word is detected."""
         logger.info("Processing voice command")
-        detector.pause()  # Release mic for voice agent
-        await voice_agent.listen()
-        detector.resume()  # Re-acquire mic for wake word detection
+        # The detector stays paused until this returns, then resumes on its own
+        await voice_agent.listen(start_position=detector.last_detection_position)
+        tracer.report()
 
     # Initialize and start wake word detector
-    detector = WakeWordDetector(on_wake_word=on_wake_word_detected)
+    # Local voice activity only matters when it opens agent sessions speculatively
+    speculative = settings.agent_connection_mode == "speculative"
+    detector = WakeWordDetector(
+        on_wake_word=on_wake_word_detected,
+        on_voice_activity=voice_agent.on_voice_activity if speculative else None
+    )
     
     try:
+        # Probe audio, load Porcupine and prepare the agent before listening
+        timer = StartupTimer()
+        timer.record("imports", _import_seconds)
+        await warm_up(voice_agent, detector, timer)
         await detector.start()
     except KeyboardInterrupt:
         logger.info("Shutting down")
     finally:
-        detector.stop()
-        await voice_agent.close()
+        detector.close()
+        await voice_agent.shutdown()
         logger.info("Goodbye")
 
 
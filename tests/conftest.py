@@ -0,0 +1,5 @@
+"""Shared pytest setup: settings need API keys, which the tests never use."""
+import os
+
+os.environ.setdefault("PORCUPINE_ACCESS_KEY", "test")
+os.environ.setdefault("DEEPGRAM_API_KEY", "test")
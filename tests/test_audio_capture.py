@@ -0,0 +1,220 @@
+"""Tests for the capture ring buffer and its consumers."""
+import threading
+import time
+import pytest
+from backend.audio_capture import AudioCapture, RingBuffer, SAMPLE_WIDTH
+
+
+def frames(start: int, count: int) -> bytes:
+    """Distinct 16-bit samples start..start+count-1."""
+    return b"".join((i % 32768).to_bytes(2, "little") for i in range(start, start + count))
+
+
+def make_capture(buffer_frames: int = 100) -> AudioCapture:
+    """Capture filled by the test instead of a device."""
+    capture = AudioCapture(audio_manager=None, sample_rate=16000, chunk_size=10)
+    capture.ring = RingBuffer(buffer_frames * SAMPLE_WIDTH)
+    capture.is_running = True
+    return capture
+
+
+def feed(capture: AudioCapture, data: bytes):
+    with capture.condition:
+        capture.ring.write(data)
+        capture.condition.notify_all()
+
+
+class TestRingBuffer:
+    def test_wraps_around(self):
+        ring = RingBuffer(8)
+        ring.write(b"abcdef")
+        ring.write(b"ghij")
+        assert ring.write_position == 10
+        assert ring.oldest_position == 2
+        out = bytearray(8)
+        ring.read_into(2, memoryview(out))
+        assert bytes(out) == b"cdefghij"
+
+    def test_write_larger_than_capacity_keeps_newest(self):
+        ring = RingBuffer(4)
+        ring.write(b"0123456789")
+        out = bytearray(4)
+        ring.read_into(ring.oldest_position, memoryview(out))
+        assert bytes(out) == b"6789"
+        assert ring.write_position == 10
+
+
+class TestCaptureConsumer:
+    def test_consumers_read_independently(self):
+        capture = make_capture()
+        first = capture.subscribe(0)
+        second = capture.subscribe(0)
+        feed(capture, frames(0, 20))
+        assert first.read(10, timeout=0) == frames(0, 10)
+        assert first.read(10, timeout=0) == frames(10, 10)
+        assert second.read(20, timeout=0) == frames(0, 20)
+
+    def test_subscribe_defaults_to_newest_audio(self):
+        capture = make_capture()
+        feed(capture, frames(0, 10))
+        consumer = capture.subscribe()
+        assert consumer.available_frames == 0
+        feed(capture, frames(10, 5))
+        assert consumer.read(5, timeout=0) == frames(10, 5)
+
+    def test_read_times_out_without_audio(self):
+        consumer = make_capture().subscribe()
+        assert consumer.read(10, timeout=0.01) is None
+
+    def test_read_blocks_until_audio_arrives(self):
+        capture = make_capture()
+        consumer = capture.subscribe()
+        threading.Timer(0.05, feed, (capture, frames(0, 10))).start()
+        assert consumer.read(10, timeout=2) == frames(0, 10)
+
+    def test_slow_consumer_skips_overwritten_audio(self):
+        capture = make_capture(buffer_frames=10)
+        consumer = capture.subscribe(0)
+        feed(capture, frames(0, 25))
+        assert consumer.available_frames == 10
+        assert consumer.overrun_bytes == 15 * SAMPLE_WIDTH
+        assert consumer.read(10, timeout=0) == frames(15, 10)
+
+    def test_limit_backlog(self):
+        capture = make_capture()
+        consumer = capture.subscribe(0)
+        feed(capture, frames(0, 30))
+        assert consumer.limit_backlog(10) == 20
+        assert consumer.read(10, timeout=0) == frames(20, 10)
+
+    def test_skip_to_a_position_not_captured_yet(self):
+        capture = make_capture()
+        consumer = capture.subscribe(0)
+        feed(capture, frames(0, 10))
+        consumer.skip_to(25 * SAMPLE_WIDTH)
+        feed(capture, frames(10, 10))
+        assert consumer.available_frames == 0
+        assert consumer.limit_backlog(0) == 0
+        feed(capture, frames(20, 10))
+        assert consumer.read(5, timeout=0) == frames(25, 5)
+
+    def test_skip_to_never_moves_back(self):
+        capture = make_capture()
+        consumer = capture.subscribe(0)
+        feed(capture, frames(0, 10))
+        consumer.skip_to(8 * SAMPLE_WIDTH)
+        consumer.skip_to(0)
+        assert consumer.read(2, timeout=0) == frames(8, 2)
+
+    def test_backlog_rms_does_not_consume(self):
+        capture = make_capture()
+        consumer = capture.subscribe()
+        assert consumer.backlog_rms() == 0.0
+        loud = (1000).to_bytes(2, "little", signed=True) + (-1000).to_bytes(2, "little", signed=True)
+        feed(capture, loud * 5)
+        assert consumer.backlog_rms() == pytest.approx(1000)
+        assert consumer.available_frames == 10
+
+    def test_close_wakes_blocked_reader(self):
+        consumer = make_capture().subscribe()
+        threading.Timer(0.05, consumer.close).start()
+        started = time.monotonic()
+        assert consumer.read(10, timeout=2) is None
+        assert time.monotonic() - started < 1
+
+
+class _FailingStream:
+    def read(self, num_frames, exception_on_overflow=True):
+        raise OSError("Device unplugged")
+
+
+class _AudioManager:
+    """Hands out input streams and tracks which are still open."""
+
+    def __init__(self):
+        self.open_streams = []
+
+    def get_device_index(self, prefer_usb=True):
+        return None
+
+    def get_device_sample_rate(self, device_index=None):
+        return 16000
+
+    def open_input_stream(self, **kwargs):
+        stream = _FailingStream()
+        self.open_streams.append(stream)
+        return stream
+
+    def close_stream(self, stream):
+        self.open_streams.remove(stream)
+
+
+def test_restart_after_read_error_does_not_leak_stream():
+    audio_manager = _AudioManager()
+    capture = AudioCapture(audio_manager, sample_rate=16000, chunk_size=160)
+    capture.start()
+    capture._thread.join(timeout=2)
+    assert not capture.is_running
+    capture.start()
+    capture._thread.join(timeout=2)
+    assert len(audio_manager.open_streams) == 1
+    capture.stop()
+    assert audio_manager.open_streams == []
+
+
+class _SilentStream:
+    def read(self, num_frames, exception_on_overflow=True):
+        time.sleep(0.005)
+        return bytes(num_frames * SAMPLE_WIDTH)
+
+
+class _ReopenAudioManager(_AudioManager):
+    """Records the order in which streams are closed, re-initialized and opened."""
+
+    def __init__(self):
+        super().__init__()
+        self.events = []
+
+    def open_input_stream(self, **kwargs):
+        stream = _SilentStream()
+        self.open_streams.append(stream)
+        self.events.append("open")
+        return stream
+
+    def close_stream(self, stream):
+        super().close_stream(stream)
+        self.events.append("close")
+
+
+def test_reopen_swaps_the_stream_without_closing_consumers():
+    audio_manager = _ReopenAudioManager()
+    capture = AudioCapture(audio_manager, sample_rate=16000, chunk_size=160)
+    capture.start()
+    try:
+        consumer = capture.subscribe()
+        assert consumer.read(160, timeout=2) is not None
+        capture.reopen(before_open=lambda: audio_manager.events.append("reinit"))
+        assert audio_manager.events == ["open", "close", "reinit", "open"]
+        assert len(audio_manager.open_streams) == 1
+        assert not consumer.closed
+        assert consumer.read(160, timeout=2) is not None
+    finally:
+        capture.stop()
+    assert audio_manager.open_streams == []
+
+
+def test_failed_reopen_stops_the_capture():
+    audio_manager = _ReopenAudioManager()
+    capture = AudioCapture(audio_manager, sample_rate=16000, chunk_size=160)
+    capture.start()
+    consumer = capture.subscribe()
+
+    def unplugged():
+        raise OSError("No input device")
+
+    audio_manager.open_input_stream = lambda **kwargs: unplugged()
+    with pytest.raises(OSError):
+        capture.reopen()
+    assert not capture.is_running
+    assert consumer.closed
+    assert consumer.read(160, timeout=0.1) is None
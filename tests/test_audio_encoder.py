@@ -0,0 +1,49 @@
+"""Tests for the G.711 upstream encoders."""
+import warnings
+import numpy as np
+import pytest
+from backend.audio_encoder import AlawEncoder, AudioEncoder, MulawEncoder, create_encoder
+
+ALL_SAMPLES = np.arange(-32768, 32768, dtype=np.int16).tobytes()
+
+
+@pytest.mark.parametrize("sample,mulaw,alaw", [
+    (0, 0xFF, 0xD5),
+    (32767, 0x80, 0xAA),
+    (-32768, 0x00, 0x2A),
+    (-1, 0x7E, 0x55),
+])
+def test_known_codes(sample, mulaw, alaw):
+    pcm = np.array([sample], dtype=np.int16).tobytes()
+    assert MulawEncoder(16000).encode(pcm) == bytes([mulaw])
+    assert AlawEncoder(16000).encode(pcm) == bytes([alaw])
+
+
+def test_matches_reference_implementation():
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        audioop = pytest.importorskip("audioop")
+    assert MulawEncoder(16000).encode(ALL_SAMPLES) == audioop.lin2ulaw(ALL_SAMPLES, 2)
+    assert AlawEncoder(16000).encode(ALL_SAMPLES) == audioop.lin2alaw(ALL_SAMPLES, 2)
+
+
+def test_halves_bandwidth_and_tracks_stats():
+    encoder = MulawEncoder(16000)
+    pcm = bytes(3200)
+    for _ in range(10):
+        assert len(encoder.encode(pcm)) == 1600
+    stats = encoder.stats()
+    assert stats["frames"] == 10
+    assert stats["bytes_in"] == 32000
+    assert stats["bytes_out"] == 16000
+    assert stats["bytes_per_second_saved"] == pytest.approx(16000)
+
+
+def test_linear16_passes_through():
+    assert AudioEncoder(16000).encode(b"\x01\x02\x03\x04") == b"\x01\x02\x03\x04"
+
+
+def test_create_encoder():
+    assert isinstance(create_encoder("alaw", 16000), AlawEncoder)
+    with pytest.raises(ValueError):
+        create_encoder("opus", 16000)
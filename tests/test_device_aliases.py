@@ -0,0 +1,65 @@
+"""Tests for resolving spoken device names to configured devices."""
+from backend.voice_agent_config.device_aliases import DeviceAliasIndex, alias_key
+
+DEVICES = ["Kitchen Light", "Hallway Light", "JJ's Lamp", "Office Lamp", "Light", "All Lights"]
+ALIASES = {"JJ's Lamp": ["the bedroom lamp"], "Kitchen Light": ["counter light"]}
+
+
+def make_index() -> DeviceAliasIndex:
+    return DeviceAliasIndex(DEVICES, ALIASES)
+
+
+def test_alias_key_normalizes_case_punctuation_and_plurals():
+    assert alias_key("JJ's Lamp") == alias_key("JJs lamp") == "jjs lamp"
+    assert alias_key("the Kitchen Lights") == alias_key("kitchen light")
+
+
+def test_all_is_kept_in_keys():
+    assert alias_key("all lights") == "all light"
+    assert alias_key("all lights") != alias_key("light")
+
+
+def test_exact_names_and_aliases_resolve():
+    index = make_index()
+    assert index.resolve("Kitchen Light").device == "Kitchen Light"
+    assert index.resolve("the kitchen lights").device == "Kitchen Light"
+    assert index.resolve("bedroom lamp").device == "JJ's Lamp"
+    assert index.resolve("Counter Light").device == "Kitchen Light"
+
+
+def test_all_lights_does_not_collapse_to_light():
+    index = make_index()
+    assert index.resolve("all lights").device == "All Lights"
+    assert index.resolve("lights").device == "Light"
+
+
+def test_variations_resolve_fuzzily():
+    index = make_index()
+    assert index.resolve("JJs lamp").device == "JJ's Lamp"
+    assert index.resolve("hallway").device == "Hallway Light"
+
+
+def test_ambiguous_name_returns_candidates():
+    match = make_index().resolve("lamp")
+    assert match.device is None
+    assert "JJ's Lamp" in match.candidates
+    assert "Office Lamp" in match.candidates
+    assert len(match.candidates) <= 3
+
+
+def test_unknown_name_has_no_candidates():
+    match = make_index().resolve("garage door")
+    assert match.device is None
+    assert match.candidates == []
+
+
+def test_alias_shared_by_two_devices_is_ambiguous():
+    index = DeviceAliasIndex(["Left Lamp", "Right Lamp"], {"Left Lamp": ["reading lamp"], "Right Lamp": ["reading lamp"]})
+    match = index.resolve("reading lamp")
+    assert match.device is None
+    assert match.candidates == ["Left Lamp", "Right Lamp"]
+
+
+def test_aliases_for_unknown_devices_are_ignored():
+    index = DeviceAliasIndex(["Office Lamp"], {"Garage Door": ["garage"]})
+    assert index.resolve("garage").device is None
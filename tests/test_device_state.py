@@ -0,0 +1,121 @@
+"""Tests for the device state cache."""
+import asyncio
+import time
+from backend.voice_agent_config.device_state import DeviceStateCache
+
+
+def brightness(device: str, value: str) -> dict:
+    return {"device": device, "action": "change brightness", "brightness": value}
+
+
+class TestRedundancy:
+    def test_repeat_of_recorded_state_is_redundant(self):
+        cache = DeviceStateCache(ttl=30)
+        cache.record({"device": "Kitchen Light", "action": "on"})
+        assert cache.is_redundant({"device": "kitchen light", "action": "on"})
+        assert not cache.is_redundant({"device": "Kitchen Light", "action": "off"})
+        assert cache.skipped == 1
+
+    def test_brightness_and_color_imply_power_on(self):
+        cache = DeviceStateCache(ttl=30)
+        cache.record(brightness("Lamp", "40"))
+        cache.record({"device": "Lamp", "action": "change color", "color": "blue"})
+        assert cache.is_redundant({"device": "Lamp", "action": "on"})
+        assert cache.is_redundant(brightness("Lamp", "40"))
+        assert not cache.is_redundant(brightness("Lamp", "50"))
+        assert cache.is_redundant({"device": "Lamp", "action": "change color", "color": "blue"})
+
+    def test_state_expires(self):
+        cache = DeviceStateCache(ttl=30)
+        cache.record({"device": "Lamp", "action": "on"})
+        cache.get("Lamp").updated_at = time.monotonic() - 31
+        assert cache.get("Lamp") is None
+        assert not cache.is_redundant({"device": "Lamp", "action": "on"})
+
+    def test_forget(self):
+        cache = DeviceStateCache(ttl=30)
+        cache.record({"device": "Lamp", "action": "on"})
+        cache.forget("LAMP")
+        assert not cache.is_redundant({"device": "Lamp", "action": "on"})
+
+
+class TestInFlight:
+    def test_first_command_is_not_delayed(self):
+        async def scenario():
+            cache = DeviceStateCache(ttl=30)
+            started = time.perf_counter()
+            command = await cache.begin(brightness("Lamp", "20"))
+            assert command is not None
+            assert time.perf_counter() - started < 0.05
+
+        asyncio.run(scenario())
+
+    def test_duplicate_of_in_flight_command_is_skipped(self):
+        async def scenario():
+            cache = DeviceStateCache(ttl=30)
+            first = await cache.begin({"device": "Lamp", "action": "on"})
+            assert await cache.begin({"device": "lamp", "action": "on"}) is None
+            assert cache.skipped == 1
+            cache.finish(first)
+            assert await cache.begin({"device": "Lamp", "action": "on"}) is not None
+
+        asyncio.run(scenario())
+
+    def test_brightness_coalesces_to_the_last_while_one_is_in_flight(self):
+        async def scenario():
+            cache = DeviceStateCache(ttl=30)
+            first = await cache.begin(brightness("Lamp", "10"))
+            waiting = [asyncio.create_task(cache.begin(brightness("Lamp", value))) for value in ("20", "30", "40")]
+            await asyncio.sleep(0)
+            cache.finish(first)
+            results = await asyncio.gather(*waiting)
+            assert [result is not None for result in results] == [False, False, True]
+            assert results[-1].parameters["brightness"] == "40"
+            assert cache.coalesced == 2
+
+        asyncio.run(scenario())
+
+    def test_newer_command_supersedes_waiting_brightness(self):
+        async def scenario():
+            cache = DeviceStateCache(ttl=30)
+            sent = []
+
+            async def send(parameters):
+                command = await cache.begin(parameters)
+                if command is None:
+                    return
+                sent.append(parameters.get("brightness") or parameters["action"])
+                await asyncio.sleep(0.01)
+                cache.finish(command)
+
+            first = asyncio.create_task(send(brightness("Lamp", "10")))
+            await asyncio.sleep(0)
+            waiting = asyncio.create_task(send(brightness("Lamp", "40")))
+            await asyncio.sleep(0)
+            off = asyncio.create_task(send({"device": "Lamp", "action": "off"}))
+            await asyncio.gather(first, waiting, off)
+            assert sent == ["10", "off"]
+            assert cache.coalesced == 1
+
+        asyncio.run(scenario())
+
+    def test_duplicate_of_in_flight_brightness_supersedes_waiting_one(self):
+        async def scenario():
+            cache = DeviceStateCache(ttl=30)
+            first = await cache.begin(brightness("Lamp", "10"))
+            waiting = asyncio.create_task(cache.begin(brightness("Lamp", "40")))
+            await asyncio.sleep(0)
+            assert await cache.begin(brightness("Lamp", "10")) is None
+            cache.finish(first)
+            assert await waiting is None
+
+        asyncio.run(scenario())
+
+    def test_other_devices_are_independent(self):
+        async def scenario():
+            cache = DeviceStateCache(ttl=30)
+            await cache.begin(brightness("Lamp", "10"))
+            command = await asyncio.wait_for(cache.begin(brightness("Desk Lamp", "10")), timeout=1)
+            assert command is not None
+
+        asyncio.run(scenario())
@@ -0,0 +1,196 @@
+"""Tests for command retries, hedging and the circuit breaker."""
+import asyncio
+import pytest
+from backend.dispatcher import CircuitOpenError, CommandDispatcher, QueueFullError
+from backend.voice_agent_config import smart_home_controller
+
+
+class Transient(Exception):
+    pass
+
+
+class Permanent(Exception):
+    pass
+
+
+def is_transient(error: Exception) -> bool:
+    return isinstance(error, Transient)
+
+
+class FlakySend:
+    """Fails with the given errors, then succeeds."""
+
+    def __init__(self, *errors: Exception, delay: float = 0.0):
+        self.errors = list(errors)
+        self.delay = delay
+        self.calls = 0
+
+    async def __call__(self) -> str:
+        self.calls += 1
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        if self.errors:
+            raise self.errors.pop(0)
+        return "ok"
+
+
+def make_dispatcher(**kwargs) -> CommandDispatcher:
+    options = dict(retries=2, retry_backoff=0.001, hedge_after=0, breaker_threshold=2, breaker_reset=0.05)
+    options.update(kwargs)
+    return CommandDispatcher("test", **options)
+
+
+def test_transient_failures_are_retried():
+    async def scenario():
+        dispatcher = make_dispatcher()
+        send = FlakySend(Transient(), Transient())
+        assert await dispatcher.submit(send, is_transient) == "ok"
+        assert send.calls == 3
+        assert dispatcher.retried == 2
+        assert dispatcher.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_retries_are_limited():
+    async def scenario():
+        dispatcher = make_dispatcher(breaker_threshold=5)
+        send = FlakySend(Transient(), Transient(), Transient())
+        with pytest.raises(Transient):
+            await dispatcher.submit(send, is_transient)
+        assert send.calls == 3
+
+    asyncio.run(scenario())
+
+
+def test_permanent_failure_is_not_retried_or_counted():
+    async def scenario():
+        dispatcher = make_dispatcher(breaker_threshold=1)
+        send = FlakySend(Permanent())
+        with pytest.raises(Permanent):
+            await dispatcher.submit(send, is_transient)
+        assert send.calls == 1
+        assert dispatcher.retried == 0
+        assert dispatcher.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_slow_attempt_is_hedged_and_first_success_wins():
+    async def scenario():
+        dispatcher = make_dispatcher(hedge_after=0.02)
+        delays = [1.0, 0.0]
+        calls = []
+
+        async def send():
+            delay = delays[len(calls)]
+            calls.append(delay)
+            await asyncio.sleep(delay)
+            return f"after {delay}"
+
+        started = asyncio.get_running_loop().time()
+        assert await dispatcher.submit(send, is_transient) == "after 0.0"
+        assert asyncio.get_running_loop().time() - started < 0.5
+        assert dispatcher.hedged == 1
+        assert len(calls) == 2
+
+    asyncio.run(scenario())
+
+
+def test_fast_attempt_is_not_hedged():
+    async def scenario():
+        dispatcher = make_dispatcher(hedge_after=0.5)
+        send = FlakySend()
+        assert await dispatcher.submit(send, is_transient) == "ok"
+        assert dispatcher.hedged == 0
+        assert send.calls == 1
+
+    asyncio.run(scenario())
+
+
+def test_breaker_opens_fails_fast_and_closes_after_a_trial():
+    async def scenario():
+        dispatcher = make_dispatcher(retries=0)
+        for _ in range(2):
+            with pytest.raises(Transient):
+                await dispatcher.submit(FlakySend(Transient()), is_transient)
+        assert dispatcher.state == "open"
+
+        send = FlakySend()
+        with pytest.raises(CircuitOpenError):
+            await dispatcher.submit(send, is_transient)
+        assert send.calls == 0
+        assert dispatcher.rejected == 1
+
+        await asyncio.sleep(0.06)
+        assert dispatcher.state == "half-open"
+        assert await dispatcher.submit(send, is_transient) == "ok"
+        assert dispatcher.state == "closed"
+        assert dispatcher.stats()["consecutive_failures"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_failed_trial_reopens_the_breaker():
+    async def scenario():
+        dispatcher = make_dispatcher(retries=0, breaker_threshold=1)
+        with pytest.raises(Transient):
+            await dispatcher.submit(FlakySend(Transient()), is_transient)
+        await asyncio.sleep(0.06)
+        assert dispatcher.state == "half-open"
+        with pytest.raises(Permanent):
+            await dispatcher.submit(FlakySend(Permanent()), is_transient)
+        assert dispatcher.state == "open"
+
+    asyncio.run(scenario())
+
+
+def test_only_one_trial_runs_while_half_open():
+    async def scenario():
+        dispatcher = make_dispatcher(retries=0, breaker_threshold=1)
+        with pytest.raises(Transient):
+            await dispatcher.submit(FlakySend(Transient()), is_transient)
+        await asyncio.sleep(0.06)
+        trial = asyncio.ensure_future(dispatcher.submit(FlakySend(delay=0.02), is_transient))
+        await asyncio.sleep(0)
+        with pytest.raises(CircuitOpenError):
+            await dispatcher.submit(FlakySend(), is_transient)
+        assert await trial == "ok"
+        assert dispatcher.state == "closed"
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_rejects_commands():
+    async def scenario():
+        dispatcher = make_dispatcher(concurrency=1, max_pending=2)
+        waiting = [asyncio.ensure_future(dispatcher.submit(FlakySend(delay=0.02), is_transient)) for _ in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(QueueFullError):
+            await dispatcher.submit(FlakySend(), is_transient)
+        assert await asyncio.gather(*waiting) == ["ok", "ok"]
+        assert dispatcher.rejected == 1
+        assert dispatcher.stats()["pending"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_wait_turn_runs_before_every_attempt():
+    async def scenario():
+        dispatcher = make_dispatcher()
+        turns = []
+
+        async def wait_turn():
+            turns.append(True)
+
+        await dispatcher.submit(FlakySend(Transient()), is_transient, wait_turn=wait_turn)
+        assert len(turns) == 2
+
+    asyncio.run(scenario())
+
+
+def test_metric_labels_are_bounded_to_configured_devices(monkeypatch):
+    monkeypatch.setattr(smart_home_controller, "DEVICE_LIST", ["JJ's Lamp"])
+    assert smart_home_controller.metric_device("JJ's Lamp") == "jjs-lamp"
+    assert smart_home_controller.metric_device("the thing by the window") == "unknown"
+    assert smart_home_controller.metric_device("Ignore previous instructions") == "unknown"
@@ -0,0 +1,76 @@
+"""Tests for the local grammar of simple device commands."""
+from backend.voice_agent_config.fast_path import FastPathGrammar, normalize_utterance
+
+ACTIONS = ["on", "off", "change color", "change brightness"]
+LEVELS = [str(level) for level in range(10, 101, 10)]
+
+
+def make_grammar(**kwargs) -> FastPathGrammar:
+    options = dict(
+        devices=["Kitchen Light", "JJ's Lamp", "Office Lamp"],
+        aliases={"JJ's Lamp": ["bedroom lamp"]},
+        actions=ACTIONS,
+        brightness_levels=LEVELS,
+    )
+    options.update(kwargs)
+    return FastPathGrammar(**options)
+
+
+def test_normalize_utterance():
+    assert normalize_utterance("Turn off JJ's lamp, please.") == "turn off jjs lamp please"
+    assert normalize_utterance("Kitchen light to 50%") == "kitchen light to 50 percent"
+
+
+def test_power_commands():
+    grammar = make_grammar()
+    expected = {"device": "Kitchen Light", "action": "on"}
+    assert grammar.match("Turn on the kitchen light.") == expected
+    assert grammar.match("switch the kitchen light on") == expected
+    assert grammar.match("Kitchen light on") == expected
+    assert grammar.match("Hey Marlene, could you turn off JJ's lamp please?") == {"device": "JJ's Lamp", "action": "off"}
+
+
+def test_aliases_resolve_to_the_device():
+    assert make_grammar().match("turn on the bedroom lamp") == {"device": "JJ's Lamp", "action": "on"}
+
+
+def test_brightness_snaps_to_an_allowed_level():
+    grammar = make_grammar()
+    assert grammar.match("set the office lamp to 47%") == {
+        "device": "Office Lamp", "action": "change brightness", "brightness": "50"
+    }
+    assert grammar.match("dim the kitchen light to 10 percent")["brightness"] == "10"
+    assert grammar.match("set the kitchen light to 0 percent") is None
+    assert grammar.match("set the kitchen light to 150 percent") is None
+
+
+def test_color_commands():
+    assert make_grammar().match("make the kitchen light warm white") == {
+        "device": "Kitchen Light", "action": "change color", "color": "warm white"
+    }
+    assert make_grammar().match("make the kitchen light plaid") is None
+
+
+def test_anything_more_than_a_single_command_goes_to_the_llm():
+    grammar = make_grammar()
+    assert grammar.match("turn on the kitchen light and the office lamp") is None
+    assert grammar.match("what time is it") is None
+    assert grammar.match("turn on the garage light") is None
+    assert grammar.match("turn on the lamp") is None
+
+
+def test_alias_shared_by_two_devices_is_left_out():
+    grammar = make_grammar(aliases={"JJ's Lamp": ["reading lamp"], "Office Lamp": ["reading lamp"]})
+    assert grammar.match("turn on the reading lamp") is None
+    assert grammar.match("turn on the office lamp") == {"device": "Office Lamp", "action": "on"}
+
+
+def test_only_schema_actions_are_recognised():
+    grammar = make_grammar(actions=["on", "off"])
+    assert grammar.match("turn on the kitchen light") is not None
+    assert grammar.match("set the kitchen light to 50 percent") is None
+    assert grammar.match("make the kitchen light blue") is None
+
+
+def test_no_devices_matches_nothing():
+    assert make_grammar(devices=[], aliases={}).match("turn on the kitchen light") is None
@@ -0,0 +1,77 @@
+"""Tests for the playback jitter buffer."""
+import threading
+from backend.jitter_buffer import JitterBuffer
+
+
+def read(buffer: JitterBuffer, timeout: float = 0.0):
+    out = bytearray(buffer.frame_size)
+    if not buffer.read_frame(memoryview(out), timeout=timeout):
+        return None
+    return bytes(out)
+
+
+def test_waits_for_prefill_before_playing():
+    buffer = JitterBuffer(capacity=100, frame_size=4, prefill=8)
+    buffer.write(b"abcd")
+    assert read(buffer) is None
+    buffer.write(b"efgh")
+    assert read(buffer) == b"abcd"
+    assert read(buffer) == b"efgh"
+
+
+def test_reassembles_frames_across_writes_and_wraparound():
+    buffer = JitterBuffer(capacity=10, frame_size=4, prefill=4)
+    received = b""
+    for chunk in (b"abc", b"defgh", b"ij", b"klmnop"):
+        buffer.write(chunk)
+        while buffer.buffered >= 4:
+            received += read(buffer)
+    assert received == b"abcdefghijklmnop"
+
+
+def test_underrun_restarts_prefill():
+    buffer = JitterBuffer(capacity=100, frame_size=4, prefill=8)
+    buffer.write(b"abcdefghij")
+    assert read(buffer) == b"abcd"
+    assert read(buffer) == b"efgh"
+    assert read(buffer) is None
+    assert buffer.underruns == 1
+    # Playback waits for a full prefill again, not just one frame
+    buffer.write(b"kl")
+    assert read(buffer) is None
+    buffer.write(b"mnop")
+    assert read(buffer) == b"ijkl"
+
+
+def test_end_of_stream_pads_last_frame_without_underrun():
+    buffer = JitterBuffer(capacity=100, frame_size=4, prefill=8)
+    buffer.write(b"abcdef")
+    buffer.mark_end_of_stream()
+    assert read(buffer) == b"abcd"
+    assert read(buffer) == b"ef\x00\x00"
+    assert read(buffer) is None
+    assert buffer.underruns == 0
+
+
+def test_full_buffer_drops_and_counts_overrun():
+    buffer = JitterBuffer(capacity=8, frame_size=4, prefill=4)
+    assert buffer.write(b"0123456789") == 8
+    assert buffer.overruns == 1
+    assert buffer.try_write(b"xy") == 0
+
+
+def test_blocked_writer_resumes_when_frame_is_read():
+    buffer = JitterBuffer(capacity=8, frame_size=4, prefill=4)
+    buffer.write(b"01234567")
+    threading.Timer(0.05, read, (buffer,)).start()
+    assert buffer.write(b"89ab", timeout=2) == 4
+    assert buffer.overruns == 0
+
+
+def test_clear_drops_audio_and_wakes_reader():
+    buffer = JitterBuffer(capacity=100, frame_size=4, prefill=8)
+    buffer.write(b"abcd")
+    threading.Timer(0.05, buffer.clear).start()
+    assert read(buffer, timeout=2) is None
+    assert buffer.buffered == 0
+    assert buffer.clear() == 0
@@ -0,0 +1,104 @@
+"""Tests for the JSON-lines protocol between LocalBridgeBackend and a bridge."""
+import asyncio
+import pytest
+from backend.voice_agent_config.backends import BridgeError, LocalBridgeBackend
+from benchmarks.local_bridge import LocalBridge
+
+
+class ScriptedBridge(LocalBridge):
+    """LocalBridge with per-device delays and a handle on its connections."""
+
+    def __init__(self, delays: dict = None, **kwargs):
+        super().__init__(**kwargs)
+        self.delays = delays or {}
+        self.writers = []
+        self.received = []
+
+    async def handle(self, request: dict) -> dict:
+        self.received.append(request)
+        await asyncio.sleep(self.delays.get(request.get("device"), 0))
+        return await super().handle(request)
+
+    async def serve_client(self, reader, writer):
+        self.writers.append(writer)
+        await super().serve_client(reader, writer)
+
+
+def run_with_bridge(bridge: LocalBridge, scenario):
+    """Run scenario(backend) against bridge listening on a free port."""
+    async def main():
+        server = await bridge.start("127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        backend = LocalBridgeBackend("127.0.0.1", port, timeout=2.0)
+        try:
+            async with server:
+                await scenario(backend)
+        finally:
+            await backend.close()
+
+    asyncio.run(main())
+
+
+def command(device: str, action: str = "on") -> dict:
+    return {"device": device, "action": action}
+
+
+def test_command_is_applied():
+    bridge = ScriptedBridge()
+
+    async def scenario(backend):
+        await backend.send("kitchen-light-off", command("Kitchen Light", "off"))
+        assert bridge.states == {"kitchen-light": {"power": "off"}}
+
+    run_with_bridge(bridge, scenario)
+
+
+def test_replies_are_matched_to_requests_by_id():
+    # The first request is answered last, so replies arrive out of order
+    bridge = ScriptedBridge(delays={"office-lamp": 0.05}, failing={"office-lamp"})
+
+    async def scenario(backend):
+        slow = asyncio.ensure_future(backend.send("office-lamp-on", command("Office Lamp")))
+        await asyncio.sleep(0.01)
+        await backend.send("kitchen-light-on", command("Kitchen Light"))
+        assert not slow.done()
+        with pytest.raises(BridgeError, match="office-lamp is offline"):
+            await slow
+        assert bridge.states == {"kitchen-light": {"power": "on"}}
+
+    run_with_bridge(bridge, scenario)
+
+
+def test_rejected_command_raises_bridge_error():
+    bridge = ScriptedBridge()
+
+    async def scenario(backend):
+        with pytest.raises(BridgeError, match="Bad command"):
+            await backend.send("kitchen-light-dance", command("Kitchen Light", "dance"))
+        # A rejection leaves the connection usable
+        await backend.send("kitchen-light-on", command("Kitchen Light"))
+        assert len(bridge.writers) == 1
+
+    run_with_bridge(bridge, scenario)
+
+
+def test_dropped_connection_fails_pending_commands():
+    bridge = ScriptedBridge(delays={"office-lamp": 10.0, "jjs-lamp": 10.0})
+
+    async def scenario(backend):
+        pending = [
+            asyncio.ensure_future(backend.send("office-lamp-on", command("Office Lamp"))),
+            asyncio.ensure_future(backend.send("jjs-lamp-on", command("JJ's Lamp"))),
+        ]
+        while len(bridge.received) < 2:
+            await asyncio.sleep(0.005)
+        bridge.writers[0].close()
+        results = await asyncio.wait_for(asyncio.gather(*pending, return_exceptions=True), timeout=1.0)
+        assert all(isinstance(result, ConnectionError) for result in results)
+        assert backend.is_transient(results[0])
+
+        # The next command reconnects
+        await backend.send("kitchen-light-on", command("Kitchen Light"))
+        assert len(bridge.writers) == 2
+
+    run_with_bridge(bridge, scenario)
@@ -0,0 +1,77 @@
+"""Tests for the per-host token buckets that pace device commands."""
+import asyncio
+import pytest
+from backend import rate_limiter
+from backend.rate_limiter import HostRateLimiter, TokenBucket
+
+
+class FakeClock:
+    """Monotonic time that only moves when the limiter sleeps or the test advances it."""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    async def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock.monotonic)
+    monkeypatch.setattr(rate_limiter.asyncio, "sleep", clock.sleep)
+    return clock
+
+
+def test_burst_up_to_capacity_does_not_wait(clock):
+    async def scenario():
+        bucket = TokenBucket(rate=2.0, capacity=3)
+        waits = [await bucket.acquire() for _ in range(3)]
+        assert waits == [0.0, 0.0, 0.0]
+        assert clock.sleeps == []
+
+    asyncio.run(scenario())
+
+
+def test_requests_past_the_burst_wait_for_the_rate(clock):
+    async def scenario():
+        bucket = TokenBucket(rate=2.0, capacity=2)
+        for _ in range(2):
+            await bucket.acquire()
+        assert await bucket.acquire() == pytest.approx(0.5)
+        assert await bucket.acquire() == pytest.approx(0.5)
+        assert clock.now == pytest.approx(1.0)
+
+    asyncio.run(scenario())
+
+
+def test_tokens_refill_over_time_up_to_capacity(clock):
+    async def scenario():
+        bucket = TokenBucket(rate=2.0, capacity=2)
+        for _ in range(2):
+            await bucket.acquire()
+        clock.now += 0.5
+        assert await bucket.acquire() == 0.0
+
+        # A long idle spell refills only up to the burst size
+        clock.now += 60
+        waits = [await bucket.acquire() for _ in range(3)]
+        assert waits[:2] == [0.0, 0.0]
+        assert waits[2] == pytest.approx(0.5)
+
+    asyncio.run(scenario())
+
+
+def test_each_host_has_its_own_bucket(clock):
+    async def scenario():
+        limiter = HostRateLimiter(rate=1.0, capacity=1)
+        assert await limiter.acquire("https://api.example.com/trigger?a") == 0.0
+        assert await limiter.acquire("https://other.example.com/trigger") == 0.0
+        assert await limiter.acquire("https://api.example.com/trigger?b") == pytest.approx(1.0)
+
+    asyncio.run(scenario())
@@ -0,0 +1,54 @@
+"""Tests for the streaming polyphase resampler."""
+import numpy as np
+import pytest
+from backend.resampler import PolyphaseResampler
+
+
+def sine(frequency: float, rate: int, seconds: float, amplitude: float = 10000) -> np.ndarray:
+    t = np.arange(int(rate * seconds)) / rate
+    return (amplitude * np.sin(2 * np.pi * frequency * t)).astype(np.int16)
+
+
+def resample(resampler: PolyphaseResampler, samples: np.ndarray, chunk: int) -> np.ndarray:
+    out = []
+    for start in range(0, len(samples), chunk):
+        out.append(np.frombuffer(bytes(resampler.process(samples[start:start + chunk].tobytes())), dtype=np.int16))
+    return np.concatenate(out)
+
+
+def dominant_frequency(samples: np.ndarray, rate: int) -> float:
+    spectrum = np.abs(np.fft.rfft(samples * np.hanning(len(samples))))
+    return np.argmax(spectrum) * rate / len(samples)
+
+
+@pytest.mark.parametrize("input_rate,output_rate", [(48000, 16000), (44100, 16000), (16000, 48000)])
+def test_output_length_follows_rate_ratio(input_rate, output_rate):
+    resampler = PolyphaseResampler(input_rate, output_rate, max_input_frames=1024)
+    out = resample(resampler, sine(440, input_rate, 1.0), 1024)
+    assert abs(len(out) - output_rate) <= 1
+
+
+def test_chunk_size_does_not_change_output():
+    samples = sine(1000, 48000, 0.5)
+    whole = resample(PolyphaseResampler(48000, 16000, max_input_frames=len(samples)), samples, len(samples))
+    chunked = resample(PolyphaseResampler(48000, 16000, max_input_frames=997), samples, 997)
+    np.testing.assert_array_equal(whole, chunked)
+
+
+def test_preserves_tone_and_level():
+    out = resample(PolyphaseResampler(48000, 16000, max_input_frames=960), sine(1000, 48000, 1.0), 960)
+    steady = out[1000:]
+    assert dominant_frequency(steady, 16000) == pytest.approx(1000, abs=5)
+    assert np.sqrt(np.mean(steady.astype(np.float64) ** 2)) == pytest.approx(10000 / np.sqrt(2), rel=0.05)
+
+
+def test_removes_content_above_output_nyquist():
+    # 12 kHz cannot be represented at 16 kHz and must not alias down to 4 kHz
+    out = resample(PolyphaseResampler(48000, 16000, max_input_frames=960), sine(12000, 48000, 1.0), 960)
+    assert np.abs(out[1000:]).max() < 200
+
+
+def test_rejects_oversized_chunk():
+    resampler = PolyphaseResampler(48000, 16000, max_input_frames=10)
+    with pytest.raises(ValueError):
+        resampler.process(bytes(22))
@@ -0,0 +1,73 @@
+"""Tests for expanding device groups and fanning commands out to them."""
+import asyncio
+import pytest
+from backend.config import settings
+from backend.voice_agent_config import smart_home_controller
+from backend.voice_agent_config.smart_home_controller import SmartHomeError, expand_device
+
+GROUPS = {
+    "Downstairs": ["Kitchen Light", "Living Room"],
+    "Living Room": ["Floor Lamp", "Kitchen Light"],
+    "Everything": ["Downstairs", "JJ's Lamp", "Everything"],
+    "Nowhere": [],
+    "Still Nowhere": ["Nowhere"],
+}
+
+
+@pytest.fixture(autouse=True)
+def groups(monkeypatch):
+    monkeypatch.setattr(settings, "smart_home_groups", GROUPS)
+
+
+def test_device_expands_to_itself():
+    assert expand_device("Office Lamp") == ["Office Lamp"]
+
+
+def test_nested_groups_expand_in_order_without_duplicates():
+    assert expand_device("Downstairs") == ["Kitchen Light", "Floor Lamp"]
+    assert expand_device("Everything") == ["Kitchen Light", "Floor Lamp", "JJ's Lamp"]
+
+
+def test_empty_group_is_rejected():
+    for group in ("Nowhere", "Still Nowhere"):
+        with pytest.raises(SmartHomeError):
+            expand_device(group)
+
+
+def test_empty_group_is_not_reported_as_done(monkeypatch):
+    sent = []
+
+    async def trigger(parameters):
+        sent.append(parameters["device"])
+
+    monkeypatch.setattr(smart_home_controller, "_trigger", trigger)
+    with pytest.raises(SmartHomeError):
+        asyncio.run(smart_home_controller.control_smart_home({"device": "Nowhere", "action": "on"}))
+    assert sent == []
+
+
+def test_fan_out_reports_every_failed_device(monkeypatch):
+    sent = []
+
+    async def trigger(parameters):
+        device = parameters["device"]
+        sent.append(device)
+        if device != "Floor Lamp":
+            raise SmartHomeError(f"Could not reach {device}")
+
+    monkeypatch.setattr(smart_home_controller, "_trigger", trigger)
+    commands = [{"device": device, "action": "on"} for device in expand_device("Everything")]
+    with pytest.raises(SmartHomeError) as error:
+        asyncio.run(smart_home_controller._fan_out(commands))
+    # The working device is still triggered; only the failures are named
+    assert sent == ["Kitchen Light", "Floor Lamp", "JJ's Lamp"]
+    assert str(error.value) == "Could not control Kitchen Light and JJ's Lamp"
+
+
+def test_fan_out_succeeds_when_every_device_does(monkeypatch):
+    async def trigger(parameters):
+        pass
+
+    monkeypatch.setattr(smart_home_controller, "_trigger", trigger)
+    commands = [{"device": device, "action": "off"} for device in expand_device("Downstairs")]
+    asyncio.run(smart_home_controller._fan_out(commands))
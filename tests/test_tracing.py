@@ -0,0 +1,98 @@
+"""Tests for pipeline stage timing and latency histograms."""
+import pytest
+from backend.metrics import Histogram
+from backend.tracing import Tracer
+
+
+class TestHistogram:
+    def test_samples_fall_into_their_buckets(self):
+        histogram = Histogram("test", buckets=(0.1, 0.5, 1.0))
+        for seconds in (0.05, 0.1, 0.3, 0.7, 2.0):
+            histogram.observe(seconds)
+        assert histogram.cumulative_counts() == [2, 3, 4, 5]
+        assert histogram.count == 5
+        assert histogram.sum == pytest.approx(3.15)
+        assert histogram.max == 2.0
+
+    def test_quantile_interpolates_within_a_bucket(self):
+        histogram = Histogram("test", buckets=(0.1, 0.2))
+        for _ in range(10):
+            histogram.observe(0.15)
+        # All samples are in (0.1, 0.2]; the median is estimated mid-bucket
+        assert histogram.quantile(0.5) == pytest.approx(0.15)
+        assert 0.1 < histogram.quantile(0.95) <= 0.15
+
+    def test_quantile_is_capped_at_the_largest_sample(self):
+        histogram = Histogram("test", buckets=(1.0,))
+        histogram.observe(0.2)
+        assert histogram.quantile(0.99) == pytest.approx(0.2)
+
+    def test_quantile_of_overflow_bucket_uses_max(self):
+        histogram = Histogram("test", buckets=(0.1,))
+        histogram.observe(0.05)
+        histogram.observe(3.0)
+        assert 0.1 < histogram.quantile(0.9) <= 3.0
+
+    def test_empty_histogram(self):
+        histogram = Histogram("test")
+        assert histogram.quantile(0.5) == 0.0
+        assert histogram.cumulative_counts()[-1] == 0
+
+
+class TestTracer:
+    def test_stage_is_timed_from_the_stage_it_follows(self):
+        tracer = Tracer()
+        tracer.mark("user_started_speaking", at=1.0)
+        tracer.mark("user_text", at=1.4)
+        summary = tracer.summary()
+        assert summary["user_text"]["count"] == 1
+        assert summary["user_text"]["max_ms"] == pytest.approx(400)
+
+    def test_stage_without_its_base_is_not_timed(self):
+        tracer = Tracer()
+        tracer.mark("user_text", at=1.0)
+        assert tracer.summary() == {}
+
+    def test_repeated_marks_within_a_turn_are_ignored(self):
+        tracer = Tracer()
+        tracer.mark("user_started_speaking", at=0.5)
+        tracer.mark("user_text", at=1.0)
+        tracer.mark("function_call", at=1.2)
+        tracer.mark("device_response", at=1.3)
+        tracer.mark("device_response", at=1.9)
+        assert tracer.histograms["device_response"].count == 1
+        assert tracer.histograms["device_response"].max == pytest.approx(0.1)
+
+        # A second call in the same turn is a repeat too
+        tracer.mark("function_call", at=2.0)
+        tracer.mark("device_response", at=2.5)
+        assert tracer.histograms["device_response"].count == 1
+
+        # The next turn is timed again
+        tracer.mark("user_started_speaking", at=2.8)
+        tracer.mark("user_text", at=3.0)
+        tracer.mark("function_call", at=3.2)
+        tracer.mark("device_response", at=3.5)
+        assert tracer.histograms["device_response"].count == 2
+        assert tracer.histograms["device_response"].max == pytest.approx(0.3)
+
+    def test_spans_cover_several_stages(self):
+        tracer = Tracer()
+        tracer.mark("user_text", at=1.0)
+        tracer.mark("agent_started_speaking", at=1.5)
+        tracer.mark("first_audio", at=1.7)
+        assert tracer.histograms["turn_latency"].max == pytest.approx(0.7)
+
+    def test_span_needs_its_start_in_the_same_turn(self):
+        tracer = Tracer()
+        tracer.mark("user_text", at=5.0)
+        tracer.mark("agent_started_speaking", at=1.0)
+        tracer.mark("first_audio", at=1.2)
+        assert "turn_latency" not in tracer.histograms
+
+    def test_observe_records_outside_the_pipeline(self):
+        tracer = Tracer()
+        tracer.observe("barge_in", 0.03)
+        tracer.observe("barge_in", 0.05)
+        assert tracer.summary()["barge_in"]["count"] == 2
+        assert 'stage="barge_in"' in tracer.render_prometheus()
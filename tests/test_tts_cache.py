@@ -0,0 +1,93 @@
+"""Tests for the on-disk cache of agent speech clips."""
+import os
+from backend.tts_cache import ClipRecorder, TTSClipCache, phrase_key
+
+VOICE = "aura-2-thalia-en"
+RATE = 24000
+
+
+def age(cache: TTSClipCache, text: str, seconds_ago: float):
+    """Backdate a clip's last use."""
+    path = cache._path(VOICE, text, RATE)
+    when = path.stat().st_mtime - seconds_ago
+    os.utime(path, (when, when))
+
+
+def test_phrase_key_ignores_case_and_punctuation():
+    assert phrase_key("You got it!") == phrase_key("you got it") == "you got it"
+    assert phrase_key("What's up dog?") == "whats up dog"
+
+
+def test_put_then_get(tmp_path):
+    cache = TTSClipCache(tmp_path, max_bytes=1000, phrases=["You got it!"])
+    assert cache.wants("you got it")
+    assert cache.get(VOICE, "You got it!", RATE) is None
+
+    cache.put(VOICE, "You got it!", RATE, b"\x01\x02" * 10)
+    assert cache.has(VOICE, "you got it", RATE)
+    assert cache.get(VOICE, "you got it", RATE) == b"\x01\x02" * 10
+    # Clips are per voice and sample rate
+    assert cache.get(VOICE, "You got it!", 16000) is None
+    assert cache.get("aura-2-other-en", "You got it!", RATE) is None
+
+
+def test_clips_larger_than_the_budget_are_not_stored(tmp_path):
+    cache = TTSClipCache(tmp_path, max_bytes=10)
+    cache.put(VOICE, "Hello", RATE, b"\x00" * 11)
+    assert not cache.has(VOICE, "Hello", RATE)
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_least_recently_used_clips_are_evicted(tmp_path):
+    cache = TTSClipCache(tmp_path, max_bytes=250)
+    cache.put(VOICE, "One", RATE, b"\x01" * 100)
+    cache.put(VOICE, "Two", RATE, b"\x02" * 100)
+    age(cache, "One", 20)
+    age(cache, "Two", 10)
+
+    # Playing "One" makes "Two" the least recently used
+    assert cache.get(VOICE, "One", RATE) is not None
+    cache.put(VOICE, "Three", RATE, b"\x03" * 100)
+    assert cache.has(VOICE, "One", RATE)
+    assert not cache.has(VOICE, "Two", RATE)
+    assert cache.has(VOICE, "Three", RATE)
+    assert sum(path.stat().st_size for path in tmp_path.glob("*.pcm")) <= 250
+
+
+def test_new_clip_is_kept_even_if_it_is_the_oldest(tmp_path):
+    cache = TTSClipCache(tmp_path, max_bytes=150)
+    cache.put(VOICE, "One", RATE, b"\x01" * 100)
+    cache.put(VOICE, "Two", RATE, b"\x02" * 100)
+    assert not cache.has(VOICE, "One", RATE)
+    assert cache.has(VOICE, "Two", RATE)
+
+
+def test_index_is_reloaded_from_disk(tmp_path):
+    TTSClipCache(tmp_path, max_bytes=1000).put(VOICE, "Done", RATE, b"\x05" * 40)
+    (tmp_path / "stray.tmp").write_bytes(b"partial")
+
+    reopened = TTSClipCache(tmp_path, max_bytes=1000)
+    assert reopened.get(VOICE, "Done", RATE) == b"\x05" * 40
+    assert reopened._index() == {reopened._path(VOICE, "Done", RATE): 40}
+
+
+def test_reloaded_index_counts_towards_the_budget(tmp_path):
+    first = TTSClipCache(tmp_path, max_bytes=150)
+    first.put(VOICE, "One", RATE, b"\x01" * 100)
+    age(first, "One", 10)
+
+    reopened = TTSClipCache(tmp_path, max_bytes=150)
+    reopened.put(VOICE, "Two", RATE, b"\x02" * 100)
+    assert not reopened.has(VOICE, "One", RATE)
+    assert not reopened._path(VOICE, "One", RATE).exists()
+
+
+def test_recorder_abandons_long_or_interrupted_turns():
+    recorder = ClipRecorder(max_bytes=4)
+    recorder.add_text("Hi")
+    recorder.add_audio(b"\x00\x01")
+    assert recorder.audio == b"\x00\x01"
+    recorder.add_audio(b"\x00\x01\x02")
+    assert recorder.abandoned
+    assert recorder.audio == b""
+    assert recorder.text == "Hi"